@@ -1,167 +1,252 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, has_request_context, request, jsonify
 from flask_cors import CORS
-import networkx as nx
-from collections import defaultdict
-import heapq
+import csv
+import hashlib
+import hmac
+import io
+import json
+import math
+import os
+import signal
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+try:
+    import msgpack
+except ImportError:  # optional: responses are JSON only
+    msgpack = None
+
+from crowding import NO_CROWDING, CrowdingTable, bucket_at, describe_bucket, parse_depart
+from disruptions import Disruption, DisruptionError, DisruptionSet, edge_key
+from fares import DEFAULT_TICKET_CLASS
+from geo_index import haversine_m
+from itinerary import plan_order
+from ksp import Budget, k_shortest_paths
+from line_routing import NO_LINE, LineModel
+from metrics import Registry
+from network import NetworkError, NetworkStore
+from od_matrix import MatrixEngine, exact_weights, tree_totals
+from pareto import label_path, pareto_search
+from reachability import REACH_WEIGHTS, reachable, reachable_fares
+from raptor import Timetable, format_time, load_gtfs, parse_time, synthetic_trips
+from route_cache import RouteCache
+from route_table import RouteTable, SearchTable
+from single_flight import SingleFlight
 
 app = Flask(__name__)
 CORS(app)
 
-# ===================== COMPREHENSIVE STATION & LINE DATA =====================
+IST = timezone(timedelta(hours=5, minutes=30))
 
-# WESTERN LINE STATIONS (Churchgate to Virar)
-western_line = [
-    "Churchgate", "Marine Lines", "Charni Road", "Grant Road", "Mumbai Central",
-    "Mahalakshmi", "Lower Parel", "Prabhadevi", "Dadar", "Matunga Road",
-    "Mahim Junction", "Bandra", "Khar Road", "Santacruz", "Vile Parle",
-    "Andheri", "Jogeshwari", "Ram Mandir", "Goregaon", "Malad",
-    "Kandivali", "Borivali", "Dahisar", "Mira Road", "Bhayander",
-    "Naigaon", "Vasai Road", "Nalla Sopara", "Virar"
-]
+# ===================== METRICS =====================
+# Stage latency histograms, outcome counters and in-flight gauges, served
+# in Prometheus text format on /metrics.  Stages nest: a find_* search
+# includes the calculate_path_metrics calls it makes.  METRICS_ENABLED=0
+# leaves every function undecorated.
 
-# CENTRAL LINE MAIN (CSMT to Kalyan)
-central_main = [
-    "CSMT", "Masjid", "Sandhurst Road", "Byculla", "Chinchpokli",
-    "Currey Road", "Parel", "Dadar", "Matunga", "Sion",
-    "Kurla", "Vidyavihar", "Ghatkopar", "Vikhroli", "Kanjur Marg",
-    "Bhandup", "Nahur", "Mulund", "Thane", "Kalva",
-    "Mumbra", "Diva Junction", "Kopar", "Dombivli", "Thakurli", "Kalyan"
-]
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
 
-# CENTRAL LINE - KASARA BRANCH (from Kalyan)
-central_kasara = [
-    "Kalyan", "Shahad", "Ambivli", "Titwala", "Khadavli",
-    "Vasind", "Asangaon", "Atgaon", "Thansit", "Khardi",
-    "Umbermali", "Kasara"
-]
+registry = Registry()
+STAGE_SECONDS = registry.histogram(
+    'journey_stage_seconds', 'Time spent in each route planning stage', ['stage'])
+REQUEST_SECONDS = registry.histogram(
+    'http_request_duration_seconds', 'Request handling time by endpoint', ['endpoint'])
+REQUEST_QUEUE_SECONDS = registry.histogram(
+    'http_request_queue_seconds',
+    'Wait between the proxy (X-Request-Start header) and this worker picking the request up')
+REQUESTS_TOTAL = registry.counter(
+    'http_requests_total', 'Requests by endpoint and status code', ['endpoint', 'status'])
+REQUESTS_IN_FLIGHT = registry.gauge(
+    'http_requests_in_flight', 'Requests currently being handled by this worker')
+ROUTE_NOT_FOUND = registry.counter(
+    'route_not_found_total', 'Searches that found no route, by profile', ['profile'])
 
-# CENTRAL LINE - KARJAT BRANCH (from Kalyan)
-central_karjat = [
-    "Kalyan", "Vithalwadi", "Ulhasnagar", "Ambarnath", "Badlapur",
-    "Vangani", "Shelu", "Neral", "Bhivpuri Road", "Karjat"
-]
+def stage(name):
+    """Decorator timing every call into journey_stage_seconds{stage=name}"""
+    if not METRICS_ENABLED:
+        return lambda fn: fn
+    return STAGE_SECONDS.labels(name).time()
 
-# HARBOUR LINE (CSMT to Panvel)
-harbour_line = [
-    "CSMT", "Masjid", "Sandhurst Road", "Dockyard Road", "Reay Road",
-    "Cotton Green", "Sewri", "Vadala Road", "GTB Nagar", "Chunabhatti",
-    "Kurla", "Tilak Nagar", "Chembur", "Govandi", "Mankhurd",
-    "Vashi", "Sanpada", "Juinagar", "Nerul", "Seawood Darave",
-    "Belapur CBD", "Kharghar", "Mansarovar", "Khandeshwar", "Panvel"
-]
 
-# TRANS-HARBOUR LINE (Thane to Panvel via Navi Mumbai)
-trans_harbour = [
-    "Thane", "Airoli", "Rabale", "Ghansoli", "Koparkhairane",
-    "Turbhe", "Juinagar", "Nerul", "Seawood Darave", "Belapur CBD",
-    "Kharghar", "Mansarovar", "Khandeshwar", "Panvel"
-]
+# ===================== NETWORK DATA =====================
+# Lines, stations, per-hop weights, interchanges and station aliases are
+# loaded from a versioned data file (see network.py) into a NetworkSnapshot.
+# A reload (admin endpoint or NETWORK_RELOAD_SIGNAL) builds the new snapshot
+# in full and swaps it in; requests already running finish on the old one.
 
-# METRO LINE 1 (Versova to Ghatkopar) - AC Metro
-metro_line_1 = [
-    "Versova", "D.N. Nagar", "Azad Nagar", "Andheri", "Western Express Highway",
-    "Chakala", "Airport Road", "Marol Naka", "Saki Naka", "Jagruti Nagar",
-    "Asalpha", "Ghatkopar"
-]
+NETWORK_FILE = os.environ.get(
+    'NETWORK_FILE',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'network.json')
+)
 
-# METRO LINE 2A (Dahisar East to D.N. Nagar) - AC Metro
-# Renamed to avoid conflicts with Western Line stations
-metro_line_2a = [
-    "Dahisar East", "Anand Nagar", "Dahisar West", "Ovaripada", "Magathane",
-    "Devipada", "Kandivali Metro", "Poisar", "Mandapeshwar", "Borivali Metro",
-    "Eksar", "Goregaon Metro", "Malad Metro", "Kurar Village", "Aarey",
-    "JVLR", "Jogeshwari Metro", "Vile Parle Metro", "D.N. Nagar"
-]
+# ===================== TIMETABLE (departAt ROUTING) =====================
+# Used by /api/journey/timetable. Loaded from a GTFS-like CSV bundle when
+# TIMETABLE_DIR is set, otherwise synthesized from the network's lines
+# with typical weekday headways.
 
-# METRO LINE 7 (Dahisar East to Andheri East) - AC Metro
-metro_line_7 = [
-    "Dahisar East", "Mahavir Nagar", "Pushpa Park", "Akurli Road",
-    "MTNL", "Andheri East"
+# Fast locals stop only at these stations (slow locals stop everywhere)
+western_fast = [
+    "Churchgate", "Marine Lines", "Charni Road", "Grant Road", "Mumbai Central",
+    "Dadar", "Bandra", "Andheri", "Borivali", "Bhayander", "Vasai Road",
+    "Nalla Sopara", "Virar"
+]
+central_fast = [
+    "CSMT", "Byculla", "Dadar", "Kurla", "Ghatkopar", "Vikhroli", "Bhandup",
+    "Mulund", "Thane", "Dombivli", "Kalyan"
 ]
 
-# ===================== BUILD COMPREHENSIVE GRAPH =====================
-
-G = nx.Graph()
-
-def add_line_edges(stations, mode, line_name, time_per_station, fare_per_station, comfort_rating):
-    """Add edges for a complete line with realistic parameters"""
-    for i in range(len(stations) - 1):
-        G.add_edge(
-            stations[i],
-            stations[i + 1],
-            time=time_per_station,
-            cost=fare_per_station,
-            comfort=comfort_rating,
-            mode=mode,
-            line=line_name,
-            distance=2.0,
-            is_metro=(mode == "Metro")
-        )
+# (start minute, end minute, headway minutes) for departures from each terminus
+LOCAL_SERVICE = [(270, 420, 8), (420, 660, 3), (660, 1020, 6), (1020, 1260, 3), (1260, 1500, 10)]
+FAST_SERVICE = [(300, 420, 15), (420, 660, 6), (660, 1020, 12), (1020, 1260, 6), (1260, 1440, 20)]
+BRANCH_SERVICE = [(270, 420, 30), (420, 660, 15), (660, 1020, 30), (1020, 1260, 15), (1260, 1440, 30)]
+METRO_SERVICE = [(330, 480, 8), (480, 660, 4), (660, 1020, 8), (1020, 1260, 4), (1260, 1410, 10)]
 
-# LOCAL TRAINS: Cheap (₹5), Moderate comfort (5), Standard speed (3 min/station)
-add_line_edges(western_line, "Local Train", "Western Line", 3, 5, 5)
-add_line_edges(central_main, "Local Train", "Central Line", 3, 5, 5)
-add_line_edges(central_kasara, "Local Train", "Central Line (Kasara)", 4, 5, 5)
-add_line_edges(central_karjat, "Local Train", "Central Line (Karjat)", 4, 5, 5)
-add_line_edges(harbour_line, "Local Train", "Harbour Line", 3, 5, 5)
-add_line_edges(trans_harbour, "Local Train", "Trans-Harbour Line", 3, 5, 5)
-
-# METRO: Expensive (₹20), High comfort (10 = AC), Fast (2 min/station)
-add_line_edges(metro_line_1, "Metro", "Metro Line 1", 2, 20, 10)
-add_line_edges(metro_line_2a, "Metro", "Metro Line 2A", 2, 20, 10)
-add_line_edges(metro_line_7, "Metro", "Metro Line 7", 2, 20, 10)
-
-# ===================== JUNCTION/INTERCHANGE CONNECTIONS =====================
-# CRITICAL: These enable multi-line journeys
-# Transfer time = walking + platform change + waiting
-
-junctions = [
-    # MAJOR RAILWAY JUNCTIONS (same physical location, different lines)
-    ("Dadar", "Dadar", 8, 0, 5, "Transfer", "Western-Central Junction"),
-    ("Kurla", "Kurla", 8, 0, 5, "Transfer", "Central-Harbour Junction"),
-    ("CSMT", "CSMT", 3, 0, 5, "Transfer", "Central-Harbour Junction"),
-    ("Thane", "Thane", 8, 0, 5, "Transfer", "Central-TransHarbour Junction"),
-    ("Kalyan", "Kalyan", 5, 0, 5, "Transfer", "Central Main-Branch Junction"),
-    
-    # METRO-RAILWAY INTERCHANGES (requires walking between stations)
-    ("Andheri", "Andheri", 12, 0, 4, "Transfer", "Western-Metro1 Interchange"),
-    ("Ghatkopar", "Ghatkopar", 10, 0, 4, "Transfer", "Central-Metro1 Interchange"),
-    ("D.N. Nagar", "D.N. Nagar", 5, 0, 5, "Transfer", "Metro1-Metro2A Junction"),
-    ("Dahisar East", "Dahisar East", 5, 0, 5, "Transfer", "Metro2A-Metro7 Junction"),
-    
-    # METRO 2A <-> WESTERN LINE (separate stations, require walking)
-    ("Borivali", "Borivali Metro", 10, 0, 4, "Transfer", "Western-Metro2A Interchange"),
-    ("Goregaon", "Goregaon Metro", 10, 0, 4, "Transfer", "Western-Metro2A Interchange"),
-    ("Jogeshwari", "Jogeshwari Metro", 10, 0, 4, "Transfer", "Western-Metro2A Interchange"),
-    ("Vile Parle", "Vile Parle Metro", 10, 0, 4, "Transfer", "Western-Metro2A Interchange"),
-    ("Kandivali", "Kandivali Metro", 10, 0, 4, "Transfer", "Western-Metro2A Interchange"),
-    ("Malad", "Malad Metro", 10, 0, 4, "Transfer", "Western-Metro2A Interchange"),
+# (stops served or None for all, full line, line name, mode, minutes per
+# station, service); full lines are taken from the network data
+timetable_lines = [
+    (None, "Western Line", "Western Line", "Local Train", 3, LOCAL_SERVICE),
+    (western_fast, "Western Line", "Western Line (Fast)", "Local Train", 2, FAST_SERVICE),
+    (None, "Central Line", "Central Line", "Local Train", 3, LOCAL_SERVICE),
+    (central_fast, "Central Line", "Central Line (Fast)", "Local Train", 2, FAST_SERVICE),
+    (None, "Central Line (Kasara)", "Central Line (Kasara)", "Local Train", 4, BRANCH_SERVICE),
+    (None, "Central Line (Karjat)", "Central Line (Karjat)", "Local Train", 4, BRANCH_SERVICE),
+    (None, "Harbour Line", "Harbour Line", "Local Train", 3, LOCAL_SERVICE),
+    (None, "Trans-Harbour Line", "Trans-Harbour Line", "Local Train", 3, LOCAL_SERVICE),
+    (None, "Metro Line 1", "Metro Line 1", "Metro", 2, METRO_SERVICE),
+    (None, "Metro Line 2A", "Metro Line 2A", "Metro", 2, METRO_SERVICE),
+    (None, "Metro Line 7", "Metro Line 7", "Metro", 2, METRO_SERVICE),
+]
+
+def build_timetable(net, service=None):
+    """Timetable from TIMETABLE_DIR, or synthesized from timetable_lines
+    (``service`` replaces every line's headways, e.g. for benchmarks)"""
+    timetable_dir = os.environ.get('TIMETABLE_DIR')
+    if timetable_dir:
+        return load_gtfs(timetable_dir)
     
-    # NAVI MUMBAI JUNCTIONS
-    ("Juinagar", "Juinagar", 8, 0, 5, "Transfer", "Harbour-TransHarbour Junction"),
-    ("Nerul", "Nerul", 8, 0, 5, "Transfer", "Harbour-TransHarbour Junction"),
-    ("Panvel", "Panvel", 8, 0, 5, "Transfer", "Multi-line Junction"),
+    trips = []
+    for pattern, full_name, line, mode, minutes, line_service in timetable_lines:
+        full_line = net.lines.get(full_name)
+        if full_line is None:
+            continue
+        pattern = [s for s in pattern if s in full_line] if pattern else full_line
+        trips.extend(synthetic_trips(pattern, full_line, line, mode, minutes,
+                                     service or line_service))
     
-    # ANDHERI EAST CONNECTION (Metro 7 to other lines)
-    ("Andheri", "Andheri East", 15, 0, 4, "Transfer", "Andheri-AndheriEast Interchange"),
-]
+    # Interchanges between different stations are walks; self-loops give
+    # the time needed to change trains at that station
+    footpaths = []
+    change_times = {}
+    for link in net.interchanges:
+        u, v, seconds = link['from'], link['to'], link['time'] * 60
+        if u == v:
+            change_times[u] = seconds
+        else:
+            footpaths.append((u, v, seconds))
+            footpaths.append((v, u, seconds))
+    return Timetable(trips, footpaths, change_times)
+
+def get_timetable():
+    """The current network's timetable, built on first use"""
+    net = current_network()
+    return net.memo('timetable', lambda: build_timetable(net))
 
-# Add all junction edges
-for u, v, time, cost, comfort, mode, line in junctions:
-    if u in G.nodes() and v in G.nodes():
-        G.add_edge(u, v, time=time, cost=cost, comfort=comfort, mode=mode, 
-                   line=line, distance=0, is_metro=False)
+@stage('find_timed_route')
+def find_timed_route(src, dest, depart_at):
+    """Earliest-arrival journey leaving src at or after depart_at (seconds)"""
+    return get_timetable().earliest_arrival(src, dest, depart_at)
 
 # ===================== ADVANCED ROUTING ALGORITHMS =====================
 
-def calculate_path_metrics(path):
-    """Calculate comprehensive metrics for a path"""
+# Non-dominated labels kept per station by the multi-criteria search
+PARETO_MAX_LABELS = 8
+
+# K-shortest alternatives (/api/journey with k): cap and per-request budget
+MAX_ALTERNATIVES = 5
+KSP_MAX_EXPANSIONS = 20000
+KSP_TIME_BUDGET = 0.05  # seconds
+
+# Profile -> (TransitGraph weight, route table giving its exact lower bound)
+PROFILE_SEARCH = {
+    'fastest': ('time', 'fastest'),
+    'cheapest': ('cost', 'fare'),
+    'comfortable': ('comfort', 'comfortable'),
+}
+
+# Minutes to change trains at a station where lines meet without a junction
+# entry in the network file (junction entries give their own time); the
+# fare and comfort of such a change are those of a junction
+LINE_CHANGE_MINUTES = int(os.environ.get('LINE_CHANGE_MINUTES', 5))
+
+def line_model(net):
+    """Line-aware routing model of net's all-modes view (one per snapshot)"""
+    def build():
+        change = {'time': LINE_CHANGE_MINUTES, 'cost': 0, 'comfort': 5, 'distance': 0,
+                  'mode': 'Transfer', 'line': 'Line change'}
+        default = {name: weight(None, None, change) if callable(weight) else change[weight]
+                   for name, weight in ROUTING_WEIGHTS.items()}
+        return LineModel(net.views.view('all').graph, net.segment_lines, default)
+    return net.memo('lines', build)
+
+# Crowding by time of day (see crowding.py): a query with departAt picks
+# its 15-minute bucket's variant, and each variant has its own comfort
+# weights, built once per snapshot when first asked for.  The comfortable
+# route searches (station, line) states on them; contraction-hierarchy
+# networks use a route table per variant instead.  Queries without
+# departAt use the static comfort weights.
+
+def crowding_model(net):
+    """Crowding factors of net's all-modes view per bucket (one per snapshot)"""
+    return net.memo('crowding', lambda: CrowdingTable(
+        net.views.view('all').graph, net.lines, net.spec.get('crowding'), net.segment_lines))
+
+def crowded_comfort(net, variant):
+    """Per-slot comfort weights of net's all-modes view under a crowding
+    variant (one array per variant and snapshot)"""
+    graph = net.views.view('all').graph
+    if variant == NO_CROWDING:
+        return graph.weights['comfort']
+    return net.memo(f'comfort_weights:{variant}',
+                    lambda: crowding_model(net).weights(graph.weights['comfort'], variant))
+
+def comfort_table(net, variant):
+    """The comfortable profile's route table under a crowding variant
+    (a search per query on networks routed on contraction hierarchies)"""
+    if variant == NO_CROWDING:
+        return net.route_tables.get('comfortable')
+    def build():
+        graph = net.views.view('all').graph
+        weights = dict(graph.weights)
+        weights['comfort'] = crowded_comfort(net, variant)
+        crowded = graph.with_weights(weights, graph.closed)
+        if net.hierarchical:
+            return SearchTable(crowded, 'comfort')
+        return RouteTable(crowded, 'comfort')
+    return net.memo(f'comfort:{variant}', build)
+
+def parse_crowding(value):
+    """departAt option -> (bucket, crowding variant); (None, NO_CROWDING)
+    without one, or when nothing is crowded in its bucket (the answer is
+    then the same as without it); ValueError if it is not a time"""
+    if not value:
+        return None, NO_CROWDING
+    bucket = bucket_at(parse_depart(value, IST))
+    variant = crowding_model(current_network()).variant(bucket)
+    if variant == NO_CROWDING:
+        return None, NO_CROWDING
+    return bucket, variant
+
+@stage('calculate_path_metrics')
+def calculate_path_metrics(path, ticket_class=DEFAULT_TICKET_CLASS):
+    """Calculate comprehensive metrics for a path (fare in ticket_class)"""
     if len(path) < 2:
         return None
     
     edges = []
     total_time = 0
-    total_cost = 0
     total_distance = 0
     comfort_scores = []
     transfers = []
@@ -171,9 +256,19 @@ def calculate_path_metrics(path):
     current_segment = None
     metro_time = 0
     travel_time = 0  # Excludes transfer time
+    tickets = []  # Segments per ticket: one continuous ride on one mode
+    ticket = None
     
+    net = current_network()
+    graph = net.graph
+    # Line ridden on each hop: a segment shared by two lines is attributed
+    # to the one the rider is already on, and each change of line is
+    # charged the station's change time
+    model = line_model(net)
+    ids = [model.graph.index[station] for station in path]
+    rides = model.ride(ids)
     for i in range(len(path) - 1):
-        edge_data = G.get_edge_data(path[i], path[i + 1])
+        edge_data = graph.get_edge_data(path[i], path[i + 1])
         if not edge_data:
             continue
             
@@ -184,7 +279,6 @@ def calculate_path_metrics(path):
         })
         
         total_time += edge_data['time']
-        total_cost += edge_data['cost']
         total_distance += edge_data['distance']
         comfort_scores.append(edge_data['comfort'])
         
@@ -208,9 +302,13 @@ def calculate_path_metrics(path):
                     'to_line': 'Transfer',
                     'time': edge_data['time']
                 })
+            # The walk is the change: the next train is boarded without one
+            current_line = None
+            ticket = None
         else:
+            line = model.lines[rides[i]] if rides[i] != NO_LINE else edge_data['line']
             # Regular travel segment
-            if current_segment and (current_segment['line'] == edge_data['line']):
+            if current_segment and (current_segment['line'] == line):
                 # Continue existing segment
                 current_segment['end'] = path[i + 1]
                 current_segment['stops'] += 1
@@ -221,29 +319,42 @@ def calculate_path_metrics(path):
                     segments.append(current_segment)
                 current_segment = {
                     'mode': edge_data['mode'],
-                    'line': edge_data['line'],
+                    'line': line,
                     'start': path[i],
                     'end': path[i + 1],
                     'stops': 1,
                     'time': edge_data['time']
                 }
+                if ticket is None or current_mode != edge_data['mode']:
+                    ticket = []
+                    tickets.append(ticket)
+                ticket.append(current_segment)
                 
                 # Detect line change (transfer)
-                if current_line and current_line != edge_data['line']:
+                if current_line and current_line != line:
+                    change_time = model.change['time'][ids[i]]
+                    if change_time.is_integer():
+                        change_time = int(change_time)
+                    total_time += change_time
                     transfers.append({
                         'station': path[i],
                         'from_line': current_line,
-                        'to_line': edge_data['line'],
-                        'time': 0
+                        'to_line': line,
+                        'time': change_time
                     })
             
-            current_line = edge_data['line']
+            current_line = line
             current_mode = edge_data['mode']
     
     # Add final segment
     if current_segment:
         segments.append(current_segment)
     
+    # Distance-slab fare of each ticket (see fares.py)
+    total_cost = net.fares.price(
+        [[(seg['line'], seg['start'], seg['end']) for seg in segs] for segs in tickets],
+        ticket_class)
+    
     avg_comfort = sum(comfort_scores) / len(comfort_scores) if comfort_scores else 0
     metro_percentage = (metro_time / travel_time * 100) if travel_time > 0 else 0
     
@@ -261,115 +372,341 @@ def calculate_path_metrics(path):
         'metro_percentage': round(metro_percentage, 1)
     }
 
-def find_fastest_route(src, dest):
+def comfort_weight(u, v, d):
+    """Comfort score for one edge (lower is better)"""
+    if d['mode'] == 'Metro':
+        # AC Metro: minimal weight (prefer this)
+        return d['time'] * 0.3
+    elif d['mode'] == 'Transfer':
+        # Transfers are inconvenient: heavy penalty
+        return 50 + d['time']
+    else:
+        # Local trains: higher weight (use only if necessary)
+        return d['time'] * 3.0
+
+# ===================== PRECOMPUTED ROUTE TABLES =====================
+# A snapshot's graph never changes once loaded, so it is compiled into
+# compact CSR TransitGraphs (one per mode-filtered view) and each profile's
+# shortest-path trees are computed once, before the snapshot goes live;
+# every query is a table lookup.
+
+# Per-edge weight arrays precomputed into every TransitGraph
+ROUTING_WEIGHTS = {
+    'time': 'time',
+    'cost': 'cost',
+    'comfort': comfort_weight,
+    'distance': 'distance',
+}
+
+# Route table per profile: (mode view, weight).  The cheapest route is a
+# slab-fare search (see fares.py); its table, per-hop fares over every
+# mode, is the lower bound for searches on fares
+ROUTE_PROFILES = {
+    'fastest': ('all', 'time'),
+    'comfortable': ('all', 'comfort'),
+    'fare': ('all', 'cost'),
+}
+
+# Per-instance working directory: named after the network file's path, so
+# two deployments (or a checkout and a test run) on one host never share it
+INSTANCE_DIR = os.path.join(
+    tempfile.gettempdir(),
+    'mumbai-journey-planner-' + hashlib.sha1(os.path.abspath(NETWORK_FILE).encode('utf-8')).hexdigest()[:12]
+)
+
+# Route tables and views are shared by every worker process through a
+# memory-mapped file in this directory (first worker writes it); set it
+# to an empty string to build them privately in each process instead
+ROUTING_SNAPSHOT_DIR = os.environ.get('ROUTING_SNAPSHOT_DIR', INSTANCE_DIR)
+
+# All-pairs tables are O(stations^2): above this many stations each profile
+# gets a contraction hierarchy instead, and /api/journey answers from the
+# per-profile routes rather than the multi-criteria search
+ROUTE_TABLE_MAX_STATIONS = int(os.environ.get('ROUTE_TABLE_MAX_STATIONS', 1500))
+
+# Live disruptions (closures, slowdowns, delays) are kept in this file so
+# every worker applies the same ones; each worker polls it at most every
+# DISRUPTIONS_POLL_SECONDS.  Defaults to the instance directory (not
+# ROUTING_SNAPSHOT_DIR, which may be shared); empty: this process only.
+DISRUPTIONS_FILE = os.environ.get('DISRUPTIONS_FILE', os.path.join(INSTANCE_DIR, 'disruptions.json'))
+DISRUPTIONS_POLL_SECONDS = float(os.environ.get('DISRUPTIONS_POLL_SECONDS', 1))
+
+def overlay_changed(snapshot, change):
+    """Drop the cached responses a disruption change can have made stale.
+    When edges only got slower (or closed), that is those whose routes use
+    a changed edge and those for pairs whose best route changed.  An edge
+    getting faster again (a disruption ending) can put it on routes no
+    cached response mentions, so that drops every entry once."""
+    tags = None
+    if change.pairs is not None and not change.lowered:
+        tags = {('edge',) + key for key in change.edges}
+        tags.update(('pair',) + pair for pair in change.pairs)
+    dropped = route_cache.revise(snapshot.cache_version, tags)
+    print(f"Disruption overlay revision {snapshot.revision}: {len(change.edges)} edges changed, "
+          f"{dropped} cached responses dropped")
+
+network_store = NetworkStore(NETWORK_FILE, ROUTING_WEIGHTS, ROUTE_PROFILES,
+                             shared_dir=ROUTING_SNAPSHOT_DIR or None,
+                             max_table_stations=ROUTE_TABLE_MAX_STATIONS,
+                             disruptions=DisruptionSet(DISRUPTIONS_FILE or None),
+                             poll_seconds=DISRUPTIONS_POLL_SECONDS,
+                             on_overlay=overlay_changed)
+network_store.reload()
+
+def current_network():
+    """The NetworkSnapshot this request routes on.
+
+    Pinned on first use within a request, so a reload that lands mid-request
+    does not mix two networks in one response.
+    """
+    if has_request_context():
+        net = g.get('network')
+        if net is None:
+            net = g.network = network_store.live()
+        return net
+    return network_store.live()
+
+# Reload triggers: POST /api/admin/network/reload (needs ADMIN_TOKEN) and,
+# per worker process, NETWORK_RELOAD_SIGNAL (`pkill -HUP -P <master pid>`
+# reaches every gunicorn worker; HUP to the master instead restarts them)
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN', '')
+NETWORK_RELOAD_SIGNAL = os.environ.get('NETWORK_RELOAD_SIGNAL', 'SIGHUP')
+
+def install_reload_signal():
+    """Rebuild the network in the background when the reload signal arrives"""
+    signum = getattr(signal, NETWORK_RELOAD_SIGNAL, None)
+    if signum is None or threading.current_thread() is not threading.main_thread():
+        return
+    signal.signal(signum, lambda *_: network_store.reload_in_background())
+
+install_reload_signal()
+
+@stage('find_fastest_route')
+def find_fastest_route(src, dest, ticket_class=DEFAULT_TICKET_CLASS):
     """
     FASTEST ROUTE LOGIC:
     - ONLY optimizes for TIME
     - Uses any combination of Metro/Local that minimizes total time
     - Ignores cost completely
-    - Considers transfer time accurately
+    - Considers transfer time accurately: searches (station, line) states,
+      charging each change of line the station's change time
+    - Contraction-hierarchy networks take the hierarchy's path as is
     """
     try:
-        # Pure time-based Dijkstra
-        path = nx.dijkstra_path(G, src, dest, weight='time')
-        return calculate_path_metrics(path)
-    except nx.NetworkXNoPath:
-        return None
+        net = current_network()
+        if net.hierarchical:
+            path = net.route_tables.path('fastest', src, dest)
+        else:
+            model = line_model(net)
+            graph = model.graph
+            if src not in graph or dest not in graph:
+                return None
+            # The plain time table never counts a change: an exact lower bound
+            heuristic = net.route_tables.get('fastest').row(dest)
+            _, ids, _ = model.search('time', graph.index[src], graph.index[dest], heuristic)
+            path = ids and [graph.stations[i] for i in ids]
+        if not path:
+            return None
+        return calculate_path_metrics(path, ticket_class)
     except Exception as e:
         print(f"Error in find_fastest_route: {e}")
         return None
 
-def find_cheapest_route(src, dest):
+@stage('find_min_fare_route')
+def find_min_fare_route(src, dest, ticket_class=DEFAULT_TICKET_CLASS, below=math.inf):
     """
-    CHEAPEST ROUTE LOGIC:
-    - ONLY uses LOCAL TRAINS (₹5/station)
-    - NEVER uses Metro (₹20/station)
-    - Creates subgraph excluding all Metro edges
-    - Ignores time completely, only minimizes cost
+    MINIMUM FARE LOGIC:
+    - Fares are per ticket by distance slab (see fares.py), not per stop
+    - One label search over (fare paid, open ticket, time) per query
+    - Least fare in ticket_class; the fastest route among equal fares
+    - below: only look for routes cheaper than that (None if there are none)
     """
     try:
-        # Create subgraph with LOCAL TRAINS ONLY (no Metro)
-        local_edges = [(u, v, d) for u, v, d in G.edges(data=True) 
-                       if d['mode'] in ['Local Train', 'Transfer']]
-        
-        if not local_edges:
+        net = current_network()
+        graph = net.views.view('all').graph
+        if src not in graph or dest not in graph:
             return None
-            
-        G_local = nx.Graph()
-        G_local.add_edges_from(local_edges)
-        
-        # Check if path exists in local-only network
-        if not nx.has_path(G_local, src, dest):
+        _, _, ids = net.fares.cheapest(graph, graph.index[src], graph.index[dest], ticket_class,
+                                       below=below)
+        if not ids:
             return None
-        
-        # Find cheapest path using only local trains
-        path = nx.dijkstra_path(G_local, src, dest, weight='cost')
-        return calculate_path_metrics(path)
-    except nx.NetworkXNoPath:
-        return None
+        return calculate_path_metrics([graph.stations[i] for i in ids], ticket_class)
     except Exception as e:
-        print(f"Error in find_cheapest_route: {e}")
+        print(f"Error in find_min_fare_route: {e}")
         return None
 
-def find_comfortable_route(src, dest):
+@stage('find_comfortable_route')
+def find_comfortable_route(src, dest, ticket_class=DEFAULT_TICKET_CLASS, variant=NO_CROWDING):
     """
     COMFORTABLE ROUTE LOGIC:
     - Prefers AC Metro (comfort=10) over crowded local trains (comfort=5)
     - Minimizes transfers (each transfer reduces comfort)
     - Must have significant Metro usage (20%+ of travel time)
     - Balances comfort with reasonable time
+    - variant: crowding at the departure time scales each hop's score
+    - Searches (station, line) states, so each change of line costs the
+      station's change comfort weight, as in find_fastest_route (with or
+      without crowding)
     
-    Scoring: Lower is better
+    Scoring (see comfort_weight): Lower is better
     - Metro travel: time × 0.3 (heavily prefer)
     - Local train: time × 3.0 (avoid if Metro available)
     - Transfer: +50 penalty per transfer (transfers are uncomfortable!)
     """
     try:
-        def comfort_weight(u, v, d):
-            if d['mode'] == 'Metro':
-                # AC Metro: minimal weight (prefer this)
-                return d['time'] * 0.3
-            elif d['mode'] == 'Transfer':
-                # Transfers are inconvenient: heavy penalty
-                return 50 + d['time']
-            else:
-                # Local trains: higher weight (use only if necessary)
-                return d['time'] * 3.0
-        
-        path = nx.dijkstra_path(G, src, dest, weight=comfort_weight)
-        metrics = calculate_path_metrics(path)
-        
-        if not metrics:
+        net = current_network()
+        if net.hierarchical:
+            path = comfort_table(net, variant).path(src, dest)
+        else:
+            model = line_model(net)
+            graph = model.graph
+            if src not in graph or dest not in graph:
+                return None
+            # The plain comfort table never counts a change: a lower bound.
+            # Crowding is per direction, so under a variant the static row
+            # is scaled by the smallest factor instead (as in find_k_routes)
+            heuristic = net.route_tables.get('comfortable').row(dest)
+            low = crowding_model(net).min_factor[variant]
+            if low < 1:
+                heuristic = [d * low for d in heuristic]
+            _, ids, _ = model.search('comfort', graph.index[src], graph.index[dest], heuristic,
+                                     crowded_comfort(net, variant))
+            path = ids and [graph.stations[i] for i in ids]
+        if not path:
             return None
+        metrics = calculate_path_metrics(path, ticket_class)
         
-        # Verify route qualifies as "comfortable"
-        # Must have at least 20% Metro usage or very few transfers
-        if metrics['metro_percentage'] < 20 and metrics['num_transfers'] > 2:
-            # Not comfortable enough: too many transfers and not enough Metro
+        if not metrics:
             return None
         
-        # If no Metro at all, reject (not comfortable)
-        if metrics['metro_time'] == 0:
+        if not is_comfortable(metrics):
             return None
             
         return metrics
         
-    except nx.NetworkXNoPath:
-        return None
     except Exception as e:
         print(f"Error in find_comfortable_route: {e}")
         return None
 
-def find_optimal_routes(src, dest):
-    """Find all three route types"""
-    routes = {}
+def is_comfortable(metrics):
+    """Verify a route qualifies as comfortable"""
+    # Must have at least 20% Metro usage or very few transfers
+    if metrics['metro_percentage'] < 20 and metrics['num_transfers'] > 2:
+        # Not comfortable enough: too many transfers and not enough Metro
+        return False
     
-    routes['fastest'] = find_fastest_route(src, dest)
-    routes['cheapest'] = find_cheapest_route(src, dest)
-    routes['comfortable'] = find_comfortable_route(src, dest)
+    # If no Metro at all, reject (not comfortable)
+    if metrics['metro_time'] == 0:
+        return False
     
+    return True
+
+def option_key(metrics):
+    """The metrics a trade-off option is compared on, all lower-is-better"""
+    return (metrics['total_time'], metrics['total_cost'], metrics['num_transfers'],
+            -metrics['avg_comfort'])
+
+def option_covers(a, b):
+    """True if route metrics a are at least as good as b on every shown metric"""
+    return all(x <= y for x, y in zip(option_key(a), option_key(b)))
+
+@stage('find_pareto_routes')
+def find_pareto_routes(src, dest, ticket_class=DEFAULT_TICKET_CLASS):
+    """
+    TRADE-OFF OPTIONS:
+    - One multi-criteria search over (time, cost, transfers)
+    - Returns every non-dominated journey as (label, metrics), fastest first
+    - A transfer is a change of line or a walk between stations
+    - Each change of line costs the station's change time (junction table)
+    - The search ranks on per-hop weights; an option is dropped when another
+      is as good on every shown metric (time, slab fare in ticket_class,
+      transfers, average comfort)
+    """
+    try:
+        net = current_network()
+        graph = net.views.view('all').graph
+        if dest not in graph:
+            return []
+        # The graph is undirected, so each table row from dest bounds the
+        # remaining time/fare/comfort from any station to dest
+        bounds = tuple(net.route_tables.get(profile).row(dest)
+                       for profile in ('fastest', 'fare', 'comfortable'))
+        options = []
+        for label in pareto_search(graph, src, dest, max_labels=PARETO_MAX_LABELS,
+                                   bounds=bounds, model=line_model(net)):
+            metrics = calculate_path_metrics(label_path(graph, label), ticket_class)
+            if metrics and not any(option_covers(kept, metrics) for _, kept in options):
+                options = [(l, m) for l, m in options if not option_covers(metrics, m)]
+                options.append((label, metrics))
+        options.sort(key=lambda option: option_key(option[1]))
+        return options
+    except Exception as e:
+        print(f"Error in find_pareto_routes: {e}")
+        return []
+
+@stage('find_k_routes')
+def find_k_routes(src, dest, route_type, k, ticket_class=DEFAULT_TICKET_CLASS,
+                  variant=NO_CROWDING):
+    """
+    K ALTERNATIVES for one profile:
+    - Yen's k-shortest loopless paths on the profile's weight
+    - Spur searches are A* guided by the profile's route table
+    - Bounded by KSP_MAX_EXPANSIONS settled nodes / KSP_TIME_BUDGET seconds
+    - Paths differing only in a transfer (walking) edge count once
+    - Comfortable alternatives use the crowding variant's comfort weights
+    - Ranked on plain edge weights (no line change); each route's metrics
+      then charge its changes, so the order can differ from total_time
+    Returns (list of path metrics, complete)
+    """
+    try:
+        weight, table = PROFILE_SEARCH[route_type]
+        net = current_network()
+        graph = net.views.view('all').graph
+        if dest not in graph:
+            return [], True
+        heuristic = net.route_tables.get(table).row(dest)
+        if route_type == 'comfortable' and variant != NO_CROWDING:
+            # Crowding is per direction, so the crowded table's row from
+            # dest is no bound on the way to it; the static row scaled by
+            # the smallest factor is
+            graph = comfort_table(net, variant).graph
+            low = crowding_model(net).min_factor[variant]
+            if low < 1:
+                heuristic = [d * low for d in heuristic]
+        budget = Budget(KSP_MAX_EXPANSIONS, KSP_TIME_BUDGET)
+        paths, complete = k_shortest_paths(graph, weight, src, dest, k, heuristic, budget)
+        return [calculate_path_metrics(path, ticket_class) for _, path in paths], complete
+    except Exception as e:
+        print(f"Error in find_k_routes: {e}")
+        return [], False
+
+@stage('find_optimal_routes')
+def find_optimal_routes(src, dest, ticket_class=DEFAULT_TICKET_CLASS, variant=NO_CROWDING):
+    """All three route types, one search each: fastest = least time,
+    cheapest = least fare over every mode, comfortable = best comfort
+    score if it qualifies as comfortable (under a crowding variant's
+    weights when given).  The trade-off options come from
+    find_pareto_routes, only when they are asked for."""
+    fastest = find_fastest_route(src, dest, ticket_class)
+    cheapest = fastest
+    if fastest is None:
+        cheapest = find_min_fare_route(src, dest, ticket_class)
+    elif fastest['total_cost'] > 0:
+        # The fastest route is the fastest at its own fare: only a cheaper
+        # one can beat it, so the fare search stops at that fare
+        cheapest = find_min_fare_route(src, dest, ticket_class,
+                                       below=fastest['total_cost']) or fastest
+    routes = {
+        'fastest': fastest,
+        'cheapest': cheapest,
+        'comfortable': find_comfortable_route(src, dest, ticket_class, variant),
+    }
+    for profile, route in routes.items():
+        if route is None:
+            ROUTE_NOT_FOUND.labels(profile).inc()
     return routes
 
+@stage('format_route_instructions')
 def format_route_instructions(route_data):
     """Format route into human-readable instructions"""
     if not route_data:
@@ -413,11 +750,605 @@ def format_route_instructions(route_data):
     
     return instructions
 
+def summarize_route(route_data):
+    """Compact summary of one route used for comparison"""
+    return {
+        'instructions': format_route_instructions(route_data),
+        'time': route_data['total_time'],
+        'cost': route_data['total_cost'],
+        'distance': route_data['total_distance'],
+        'transfers': route_data['num_transfers'],
+        'comfort': route_data['avg_comfort'],
+        'metro_percentage': route_data.get('metro_percentage', 0)
+    }
+
+def summarize_all_routes(routes):
+    """Compact per-profile summaries used for route comparison"""
+    result = {}
+    for route_type in ['fastest', 'cheapest', 'comfortable']:
+        route_data = routes.get(route_type)
+        if route_data:
+            result[route_type] = summarize_route(route_data)
+    return result
+
+def parse_include(value):
+    """Comma-separated include option -> frozenset of names"""
+    if not value:
+        return frozenset()
+    return frozenset(part.strip() for part in str(value).split(',') if part.strip())
+
+def parse_ticket_class(value):
+    """ticketClass option -> a fare class of the network (ValueError if unknown)"""
+    ticket_class = value or DEFAULT_TICKET_CLASS
+    classes = current_network().fares.classes
+    if ticket_class not in classes:
+        raise ValueError(f"ticketClass must be one of {', '.join(classes)}")
+    return ticket_class
+
+def format_timed_instructions(journey):
+    """Format a timetable journey into human-readable instructions"""
+    instructions = []
+    for leg in journey['legs']:
+        if leg['mode'] == 'Walk':
+            instructions.append(
+                f"🚶 Walk from {leg['from']} to {leg['to']}\n"
+                f"   ({(leg['arrive'] - leg['depart']) // 60} min)"
+            )
+            continue
+        mode_icon = "🚇" if leg['mode'] == "Metro" else "🚆"
+        instructions.append(
+            f"{mode_icon} Take {leg['mode']} - {leg['line']}\n"
+            f"   From: {leg['from']} → To: {leg['to']}\n"
+            f"   Departs {format_time(leg['depart'])} • Arrives {format_time(leg['arrive'])} ({leg['stops']} stops)"
+        )
+    
+    instructions.extend([
+        "",
+        "📊 Journey Summary:",
+        f"   🕐 Leave: {format_time(journey['depart_at'])}",
+        f"   🏁 Arrive: {format_time(journey['arrive_at'])}",
+        f"   ⏱️  Total Time: {journey['duration'] // 60} minutes",
+        f"   🔄 Transfers: {journey['transfers']}"
+    ])
+    return instructions
+
+# ===================== COMPACT RESPONSES =====================
+# format=compact journey responses refer to stations, lines and modes by
+# index into a station table the client fetches once from
+# /api/stations/table and keeps until the table version in a response
+# changes.  Routes are arrays (columns in COMPACT_COLUMNS), each distinct
+# route is sent once with profiles pointing at it, and per-hop edges come
+# only when asked for with fields=.
+
+ROUTE_FIELDS = ('path', 'segments', 'transfers', 'edges', 'instructions')
+DEFAULT_FIELDS = {
+    'full': frozenset(('path', 'segments', 'transfers', 'edges')),
+    'compact': frozenset(('path', 'segments', 'transfers')),
+}
+COMPACT_COLUMNS = {
+    'totals': ['time', 'cost', 'distance', 'comfort', 'transfers', 'metro_time', 'metro_percentage'],
+    'segments': ['mode', 'line', 'start', 'end', 'stops', 'time'],
+    'transfers': ['station', 'from_line', 'to_line', 'time'],
+    'edges': ['time', 'cost', 'distance', 'comfort', 'mode', 'line'],
+    'reachable': ['station', 'from', 'time', 'cost', 'transfers'],
+}
+MSGPACK_MIMETYPE = 'application/msgpack'
+
+def station_table(net):
+    """(table, (station ids, line ids, mode ids)) for a network snapshot;
+    the version changes whenever any of the three lists does"""
+    def build():
+        edges = net.graph.edges(data=True)
+        stations = sorted(net.graph.nodes())
+        lines = sorted({d['line'] for _, _, d in edges} | {'Transfer'})
+        modes = sorted({d['mode'] for _, _, d in edges})
+        digest = hashlib.sha1(json.dumps([stations, lines, modes]).encode('utf-8')).hexdigest()
+        table = {
+            'version': f"{net.version}-{digest[:10]}",
+            'stations': stations,
+            'lines': lines,
+            'modes': modes,
+            'columns': COMPACT_COLUMNS,
+        }
+        ids = tuple({name: i for i, name in enumerate(names)} for names in (stations, lines, modes))
+        return table, ids
+    return net.memo('station_table', build)
+
+def parse_fields(value, response_format):
+    """fields= option (comma-separated or list) -> frozenset of route parts;
+    raises ValueError on an unknown name"""
+    if not value:
+        return DEFAULT_FIELDS[response_format]
+    if isinstance(value, (list, tuple)):
+        value = ','.join(str(v) for v in value)
+    fields = parse_include(value)
+    unknown = fields - set(ROUTE_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))} (choose from {', '.join(ROUTE_FIELDS)})")
+    return fields
+
+def select_fields(route_data, fields):
+    """Full-format route metrics without the parts not in fields"""
+    if not route_data or fields >= DEFAULT_FIELDS['full']:
+        return route_data
+    return {key: value for key, value in route_data.items()
+            if key not in ROUTE_FIELDS or key in fields}
+
+def compact_route(route_data, fields, ids):
+    """One route as arrays of table indices"""
+    stations, lines, modes = ids
+    route = {'totals': [
+        route_data['total_time'], route_data['total_cost'], route_data['total_distance'],
+        route_data['avg_comfort'], route_data['num_transfers'], route_data['metro_time'],
+        route_data['metro_percentage'],
+    ]}
+    if 'path' in fields:
+        route['path'] = [stations[s] for s in route_data['path']]
+    if 'segments' in fields:
+        route['segments'] = [
+            [modes[seg['mode']], lines[seg['line']], stations[seg['start']], stations[seg['end']],
+             seg['stops'], seg['time']]
+            for seg in route_data['segments']
+        ]
+    if 'transfers' in fields:
+        route['transfers'] = [
+            [stations[t['station']], lines[t['from_line']], lines[t['to_line']], t['time']]
+            for t in route_data['transfers']
+        ]
+    if 'edges' in fields:
+        route['edges'] = [
+            [d['time'], d['cost'], d['distance'], d['comfort'], modes[d['mode']], lines[d['line']]]
+            for d in (edge['data'] for edge in route_data['edges'])
+        ]
+    if 'instructions' in fields:
+        route['instructions'] = format_route_instructions(route_data)
+    return route
+
+def compact_journey(route_type, routes, options, k_routes, fields):
+    """format=compact /api/journey body: every distinct route once in
+    'routes'; route, alternatives, options and k_shortest index into it"""
+    table, ids = station_table(current_network())
+    result = {'stationTable': table['version'], 'routes': []}
+    seen = {}
+
+    def ref(route_data):
+        if not route_data:
+            return None
+        key = tuple(route_data['path'])
+        if key not in seen:
+            seen[key] = len(result['routes'])
+            result['routes'].append(compact_route(route_data, fields, ids))
+        return seen[key]
+
+    result['route'] = ref(routes.get(route_type))
+    result['alternatives'] = {profile: ref(routes.get(profile))
+                              for profile in ('fastest', 'cheapest', 'comfortable')}
+    if options is not None:
+        result['options'] = [ref(metrics) for _, metrics in options]
+    if k_routes is not None:
+        paths, complete = k_routes
+        result['k_shortest'] = {'routes': [ref(metrics) for metrics in paths], 'complete': complete,
+                                'lineChangeTime': 'routes only'}
+    return result
+
+def response_mimetype():
+    """MessagePack when the client prefers it and msgpack is installed"""
+    if msgpack is None:
+        return 'application/json'
+    best = request.accept_mimetypes.best_match(
+        ['application/json', MSGPACK_MIMETYPE, 'application/x-msgpack'])
+    return MSGPACK_MIMETYPE if best in (MSGPACK_MIMETYPE, 'application/x-msgpack') else 'application/json'
+
+# ===================== RESPONSE CACHE =====================
+# Journey responses keyed on canonical station names + route type. With
+# ROUTE_CACHE_SERIALIZED the JSON body is kept as bytes, so a hit skips
+# jsonify entirely.
+
+ROUTE_CACHE_SIZE = int(os.environ.get('ROUTE_CACHE_SIZE', 4096))
+ROUTE_CACHE_SERIALIZED = os.environ.get('ROUTE_CACHE_SERIALIZED', '1') == '1'
+
+route_cache = RouteCache(ROUTE_CACHE_SIZE)
+
+# Identical journey queries arriving while the first is still computing
+# wait for its result (per worker process; most useful with gunicorn's
+# gthread workers) for up to SINGLE_FLIGHT_TIMEOUT seconds, then compute
+# their own.  SINGLE_FLIGHT=0 turns it off.
+SINGLE_FLIGHT = os.environ.get('SINGLE_FLIGHT', '1') == '1'
+SINGLE_FLIGHT_TIMEOUT = float(os.environ.get('SINGLE_FLIGHT_TIMEOUT', 10))
+
+single_flight = SingleFlight(SINGLE_FLIGHT_TIMEOUT)
+
+@stage('serialize_json')
+def serialize_json(payload):
+    """Response body bytes for payload (what jsonify would send)"""
+    return (app.json.dumps(payload) + "\n").encode('utf-8')
+
+@stage('serialize_msgpack')
+def serialize_msgpack(payload):
+    """MessagePack response body bytes for payload"""
+    return msgpack.packb(payload, use_bin_type=True)
+
+def serialize(payload, mimetype):
+    if mimetype == MSGPACK_MIMETYPE:
+        return serialize_msgpack(payload)
+    return serialize_json(payload)
+
+def cache_json(key, payload, status=200, mimetype='application/json', tags=None):
+    """Store a response in the route cache and return it (``tags``: see
+    route_tags; untagged entries are dropped by every disruption change)"""
+    body = serialize(payload, mimetype)
+    if ROUTE_CACHE_SERIALIZED:
+        route_cache.put(key, (body, status, mimetype), current_network().cache_version, tags)
+    else:
+        route_cache.put(key, (payload, status, mimetype), current_network().cache_version, tags)
+    return app.response_class(body, status=status, mimetype=mimetype)
+
+def route_tags(src, dest, routes):
+    """Cache tags of a response about src -> dest: the pair and every edge
+    of its routes (metrics dicts, None for a route not found)"""
+    tags = {('pair', src, dest)}
+    for route in routes:
+        if route:
+            path = route['path']
+            tags.update(('edge',) + edge_key(u, v) for u, v in zip(path, path[1:]))
+    return tags
+
+def coalesced(key, compute):
+    """compute() (returning a response) run once for identical concurrent
+    requests on the same network version; all of them get its body"""
+    if not SINGLE_FLIGHT:
+        return compute()
+    def entry():
+        response = compute()
+        return response.get_data(), response.status_code, response.mimetype
+    return cached_response(single_flight.do((key, current_network().cache_version), entry))
+
+def cached_response(entry):
+    """Rebuild a Flask response from a route cache entry"""
+    value, status, mimetype = entry
+    if not isinstance(value, bytes):
+        value = serialize(value, mimetype)
+    return app.response_class(value, status=status, mimetype=mimetype)
+
+# ===================== OD MATRIX =====================
+# /api/matrix answers many origin-destination pairs at once: each origin's
+# row of a route table is its whole shortest-path tree, so a matrix costs
+# one tree walk per origin, not one search per pair.  'cheapest' follows
+# the per-hop fare table's tree (the 'fare' table), which can cost more
+# than /api/journey's least-fare search on slab fares; 'comfortable' is the
+# comfort-weighted route without the is_comfortable() Metro filter.  Every
+# cost is the slab fare of the route, priced along the tree in one pass.
+
+MATRIX_PROFILES = {
+    'fastest': 'fastest',
+    'cheapest': 'fare',
+    'comfortable': 'comfortable',
+}
+MATRIX_COLUMNS = ('from', 'to', 'profile', 'time', 'cost', 'distance')
+# Matrix, reachability, k-shortest and itinerary-order searches run on the
+# plain station graph, which charges no line change: their times are lower
+# bounds on /api/journey's.  Each response says so in lineChangeTime
+# (the matrix in this header).
+LINE_CHANGE_HEADER = 'X-Line-Change-Time'
+MATRIX_MAX_WORKERS = int(os.environ.get('MATRIX_MAX_WORKERS', os.cpu_count() or 1))
+
+def matrix_engine(profiles, ticket_class=DEFAULT_TICKET_CLASS):
+    """MatrixEngine over the route tables of the given profiles, with fares
+    in ticket_class"""
+    net = current_network()
+    return MatrixEngine({p: net.route_tables.get(MATRIX_PROFILES[p]) for p in profiles},
+                        net.fares, ticket_class)
+
+def resolve_stations(names):
+    """Normalize a list of station names; returns (stations, unknown names)"""
+    if not names:
+        return sorted(current_network().graph.nodes()), []
+    stations = []
+    unknown = []
+    for name in names:
+        station = normalize_station(str(name))
+        if station in current_network().graph:
+            stations.append(station)
+        else:
+            unknown.append(name)
+    return stations, unknown
+
+MATRIX_NDJSON_ROW = '{"from": %s, "to": %s, "profile": %s, "time": %s, "cost": %s, "distance": %s}\n'
+
+def ndjson_rows(batches):
+    """One JSON object per line, one chunk per origin"""
+    # Rows have a fixed shape, so format them directly (json.dumps per row
+    # costs more than computing the matrix); names are encoded once
+    names = {}
+    def name(value):
+        encoded = names.get(value)
+        if encoded is None:
+            encoded = names[value] = json.dumps(value, ensure_ascii=False)
+        return encoded
+    
+    for rows in batches:
+        yield ''.join(
+            MATRIX_NDJSON_ROW % (name(src), name(dest), name(profile),
+                                 'null' if time is None else time,
+                                 'null' if cost is None else cost,
+                                 'null' if distance is None else distance)
+            for src, dest, profile, time, cost, distance in rows
+        )
+
+def csv_rows(batches):
+    """Header line, then one chunk of CSV rows per origin (blank = unreachable)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(MATRIX_COLUMNS)
+    for rows in batches:
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+# ===================== REACHABILITY =====================
+# /api/reachable: every station within a time and/or fare budget of one or
+# more origins, from one budget-bounded search over the profile's mode view
+# (see reachability.py).  Each station is reached by the profile's own
+# route, as in /api/journey: the least slab fare over every mode for
+# cheapest.
+
+REACH_BUDGETS = {'maxMinutes': 'time', 'maxFare': 'cost'}
+
+def reach_arrays(net, view):
+    """Per-edge time/fare values of a mode view (ints where whole)"""
+    graph = net.views.view(view).graph
+    return net.memo(f'reach:{view}', lambda: [exact_weights(graph, name) for name in REACH_WEIGHTS])
+
+@stage('find_reachable')
+def find_reachable(origins, profile, limits, ticket_class=DEFAULT_TICKET_CLASS):
+    """[(station, origin, time, cost, transfers)] nearest first; cost is
+    the slab fare in ticket_class"""
+    net = current_network()
+    if profile == 'cheapest':
+        graph = net.views.view('all').graph
+        sources = [graph.index[o] for o in origins if o in graph.index]
+        rows = reachable_fares(net.fares, graph, sources, limits, ticket_class)
+    else:
+        view, weight = ROUTE_PROFILES[profile]
+        graph = net.views.view(view).graph
+        sources = [graph.index[o] for o in origins if o in graph.index]
+        rows = reachable(graph, weight, sources, limits, reach_arrays(net, view),
+                         net.fares.edge_tables(ticket_class))
+    stations = graph.stations
+    return [(stations[v], stations[o], t, cost, transfers) for v, o, t, cost, transfers in rows]
+
+# ===================== NEARBY STATIONS =====================
+# Journeys from and to GPS coordinates: the k stations nearest each point
+# (grid index over the network's station coordinates, see geo_index.py)
+# become candidates, each with its walking time, and one multi-source
+# search picks the best origin/destination pair including the walks.
+
+# Walking speed (about 4.8 km/h) and street detour over the straight line
+WALK_METERS_PER_MINUTE = 80
+WALK_DETOUR = 1.3
+NEARBY_CANDIDATES = 3
+MAX_NEARBY_CANDIDATES = 10
+MAX_WALK_METERS = float(os.environ.get('MAX_WALK_METERS', 2000))
+
+# One walking minute in each search weight's units; for comfort it counts
+# like a local train minute (see comfort_weight).  Walking is free on
+# fares, so the cheapest plan breaks fare ties by door-to-door time.
+WALK_WEIGHT = {'time': 1, 'comfort': 3.0}
+
+def parse_point(value):
+    """(lat, lon) from {"lat": .., "lon": ..}; None if value is not an
+    object (a station name); ValueError if it is not a valid point"""
+    if not isinstance(value, dict):
+        return None
+    lat, lon = value.get('lat'), value.get('lon')
+    for v in (lat, lon):
+        if isinstance(v, bool) or not isinstance(v, (int, float)):
+            raise ValueError('lat and lon must be numbers')
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError('lat must be within ±90 and lon within ±180')
+    return float(lat), float(lon)
+
+def walk_minutes(meters):
+    """Whole minutes to walk a straight-line distance"""
+    return math.ceil(meters * WALK_DETOUR / WALK_METERS_PER_MINUTE)
+
+def nearby_candidates(point, k, max_meters):
+    """[{station, meters, minutes}] for the k stations nearest a point"""
+    lat, lon = point
+    return [{'station': station, 'meters': round(meters), 'minutes': walk_minutes(meters)}
+            for station, meters in current_network().geo_index.nearest(lat, lon, k, max_meters)]
+
+def least_fare_link(graph, sources, targets, ticket_class=DEFAULT_TICKET_CLASS):
+    """Station IDs of the least-fare journey from any of ``sources`` to
+    any of ``targets`` (both map a station ID to its walking minutes), the
+    fastest door to door among equal fares; None if there is none"""
+    best = None
+    for label in current_network().fares.labels(graph, sources, ticket_class):
+        if best is not None and label.fare > best[0]:
+            break
+        egress = targets.get(label.station)
+        if egress is not None and (best is None or label.time + egress < best[1]):
+            best = (label.fare, label.time + egress, label)
+    return best and best[2].path()
+
+@stage('find_nearby_route')
+def find_nearby_route(origins, destinations, route_type, ticket_class=DEFAULT_TICKET_CLASS):
+    """Best route over any origin/destination candidate pair.
+
+    Candidates are dicts with 'station' and walking 'minutes'.  Returns
+    (route metrics, board, alight); metrics is None if the best plan is
+    to board and alight at the same station; (None, None, None) if no
+    candidate pair is connected.  Cheapest is the least slab fare over
+    every mode in ticket_class, then the least door-to-door time.
+    """
+    net = current_network()
+    if route_type == 'cheapest':
+        graph = net.views.view('all').graph
+        factor = 1
+    else:
+        weight = PROFILE_SEARCH[route_type][0]
+        graph = net.views.view(ROUTE_PROFILES[route_type][0]).graph
+        factor = WALK_WEIGHT[weight]
+
+    def seeds(candidates):
+        ids = {}
+        for c in candidates:
+            v = graph.index.get(c['station'])
+            if v is not None and v not in ids:
+                ids[v] = c['minutes'] * factor
+        return ids
+
+    if route_type == 'cheapest':
+        path = least_fare_link(graph, seeds(origins), seeds(destinations), ticket_class)
+    else:
+        _, path = graph.best_link(weight, seeds(origins), seeds(destinations))
+    if path is None:
+        return None, None, None
+    names = [graph.stations[v] for v in path]
+    if len(names) == 1:
+        return None, names[0], names[0]
+    return calculate_path_metrics(names, ticket_class), names[0], names[-1]
+
+# ===================== ITINERARIES =====================
+# /api/itinerary visits several stops in the best order.  The leg costs
+# between the stops come from one shortest-path tree per stop (its route
+# table row, or one Dijkstra on contraction-hierarchy networks), never
+# from a search per pair.  itinerary.py picks the order from them.  Only
+# the legs of that order are then routed in full, each as /api/journey
+# routes the profile.  Leg costs are minutes (fastest), the comfort score
+# (comfortable) or the slab fare along the fare table's tree, ties broken
+# by time (cheapest; the legs then take the least-fare search).
+
+MAX_ITINERARY_STOPS = 16
+# Rupees per minute added to cheapest leg costs: breaks fare ties by time
+# and never adds up to a rupee over a day of travel
+FARE_TIE_BREAK = 1e-4
+
+def itinerary_costs(profile, sources, targets, ticket_class=DEFAULT_TICKET_CLASS):
+    """cost[i][j] of the profile's leg from sources[i] to targets[j]
+    (math.inf where there is none)"""
+    net = current_network()
+    table = net.route_tables.get(PROFILE_SEARCH[profile][1])
+    ids = [table.index[t] for t in targets]
+    costs = []
+    for src in sources:
+        if profile == 'cheapest':
+            s = table.index[src]
+            pred = table.tree(s)
+            edges = table.graph.tree_edges(pred, s)
+            fares = net.fares.tree_fares(table.graph, pred, s, ticket_class, edges)
+            times = tree_totals(table.graph, pred, s, ('time',), edges=edges)['time']
+            costs.append([math.inf if fares[t] is None else fares[t] + times[t] * FARE_TIE_BREAK
+                          for t in ids])
+        else:
+            dist = table.row(src)
+            costs.append([dist[t] for t in ids])
+    return costs
+
+def itinerary_leg(profile, src, dest, ticket_class=DEFAULT_TICKET_CLASS):
+    """One leg's metrics: the fastest route, the least fare over every
+    mode, or the comfort-weighted route without the Metro filter"""
+    if profile == 'fastest':
+        return find_fastest_route(src, dest, ticket_class)
+    if profile == 'cheapest':
+        return find_min_fare_route(src, dest, ticket_class)
+    path = current_network().route_tables.path('comfortable', src, dest)
+    return path and calculate_path_metrics(path, ticket_class)
+
+@stage('find_itinerary')
+def find_itinerary(start, stops, end, profile, ticket_class=DEFAULT_TICKET_CLASS):
+    """Visit every stop from start, finishing at end (None: at the last
+    stop; start: a round trip).
+
+    Returns (stations in visiting order, leg metrics, exact order); legs
+    is None and the stations are those that cannot be reached when no
+    order connects them all.
+    """
+    nodes = [start] + stops
+    if end is not None and end != start:
+        nodes.append(end)
+    last = None if end is None else nodes.index(end)
+    cost = itinerary_costs(profile, nodes[:len(stops) + 1], nodes, ticket_class)
+    total, order, exact = plan_order(cost, 0, list(range(1, len(stops) + 1)), last)
+    if total == math.inf:
+        return [nodes[j] for j in range(1, len(nodes)) if cost[0][j] == math.inf], None, exact
+
+    visits = [start] + [nodes[i] for i in order] + ([end] if end is not None else [])
+    legs = []
+    for src, dest in zip(visits, visits[1:]):
+        metrics = itinerary_leg(profile, src, dest, ticket_class)
+        if metrics is None:
+            return [dest], None, exact
+        legs.append(metrics)
+    return visits, legs, exact
+
+# ===================== REQUEST METRICS =====================
+
+registry.callback('route_cache_hits_total', 'Journey responses served from the route cache',
+                  'counter', lambda: route_cache.hits)
+registry.callback('route_cache_misses_total', 'Route cache lookups that missed',
+                  'counter', lambda: route_cache.misses)
+registry.callback('route_cache_entries', 'Responses currently cached', 'gauge',
+                  lambda: route_cache.stats()['size'])
+registry.callback('route_cache_invalidations_total',
+                  'Cached responses dropped because a disruption changed their routes',
+                  'counter', lambda: route_cache.invalidations)
+registry.callback('single_flight_coalesced_total',
+                  'Journey requests that shared an identical in-flight computation',
+                  'counter', lambda: single_flight.coalesced)
+registry.callback('single_flight_timeouts_total',
+                  'Coalesced journey requests that stopped waiting and computed their own',
+                  'counter', lambda: single_flight.timeouts)
+registry.callback('network_generation', 'Network snapshots loaded by this worker', 'gauge',
+                  lambda: network_store.current.generation)
+registry.callback('disruptions_active', 'Disruptions in force', 'gauge',
+                  lambda: len(network_store.disruptions.active(time.time())))
+
+def parse_request_start(value):
+    """Epoch seconds from an X-Request-Start header ("t=<s|ms|µs>"), or None"""
+    try:
+        start = float(value.strip().lstrip('t='))
+    except (AttributeError, ValueError):
+        return None
+    if start > 1e14:
+        return start / 1e6
+    if start > 1e11:
+        return start / 1e3
+    return start
+
+@app.before_request
+def start_request_metrics():
+    if not METRICS_ENABLED:
+        return
+    g.request_started = time.perf_counter()
+    REQUESTS_IN_FLIGHT.inc()
+    queued_since = parse_request_start(request.headers.get('X-Request-Start'))
+    if queued_since is not None:
+        wait = time.time() - queued_since
+        if wait >= 0:
+            REQUEST_QUEUE_SECONDS.observe(wait)
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.get('request_started')
+    if started is not None:
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        REQUEST_SECONDS.labels(endpoint).observe(time.perf_counter() - started)
+        REQUESTS_TOTAL.labels(endpoint, str(response.status_code)).inc()
+    return response
+
+@app.teardown_request
+def finish_request_metrics(exc):
+    if g.pop('request_started', None) is not None:
+        REQUESTS_IN_FLIGHT.dec()
+
 # ===================== API ENDPOINTS =====================
 
 @app.route('/')
 def home():
     """Root endpoint - API information"""
+    graph = current_network().graph
     return jsonify({
         'name': 'Mumbai Journey Planner API',
         'version': '2.0-perfect',
@@ -425,34 +1356,71 @@ def home():
         'endpoints': {
             'health': '/api/health',
             'stations': '/api/stations',
-            'journey': '/api/journey (POST)',
+            'station_search': '/api/stations/search?q=',
+            'station_table': '/api/stations/table (indices for format=compact)',
+            'journey': '/api/journey (POST, include=all,options for every profile / trade-off, k for alternatives, format=compact, fields=, departAt for crowding)',
             'all_routes': '/api/journey/all (POST)',
+            'timetable': '/api/journey/timetable (POST, departAt=HH:MM)',
+            'matrix': '/api/matrix (POST, origins/destinations/profile, NDJSON or CSV)',
+            'reachable': '/api/reachable (POST, from, maxMinutes/maxFare, profile)',
+            'itinerary': '/api/itinerary (POST, from, waypoints, to, profile)',
+            'reload_network': '/api/admin/network/reload (POST, X-Admin-Token)',
+            'metrics': '/metrics (Prometheus)',
             'debug': '/api/debug/path (POST)'
         },
-        'documentation': 'Send POST requests to /api/journey with {from, to, routeType}',
-        'stations': len(G.nodes()),
-        'connections': len(G.edges())
+        'documentation': 'Send POST requests to /api/journey with {from, to, routeType, include}',
+        'stations': len(graph.nodes()),
+        'connections': len(graph.edges())
     })
+@stage('normalize_station')
 def normalize_station(name):
-    """Case-insensitive station matching with fuzzy support"""
-    name_lower = name.lower().strip()
-    
-    # Exact match
-    for node in G.nodes():
-        if node.lower() == name_lower:
-            return node
+    """Case-insensitive station matching with alias and fuzzy support"""
+    canonical = current_network().station_index.resolve(name)
+    if canonical:
+        return canonical
     
-    # Partial match (for autocomplete)
-    for node in G.nodes():
-        if name_lower in node.lower():
-            return node
+    # Best ranked partial match (for autocomplete)
+    matches = current_network().station_index.search(name, limit=1)
+    if matches:
+        return matches[0]
             
     return name
 
 @app.route('/api/stations', methods=['GET'])
 def get_stations():
     """Return all station names for autocomplete"""
-    return jsonify(sorted(list(G.nodes())))
+    return jsonify(sorted(list(current_network().graph.nodes())))
+
+@app.route('/api/stations/search', methods=['GET'])
+def search_stations():
+    """Ranked station name matches for autocomplete (?q=...&limit=8)"""
+    query = request.args.get('q', '')
+    limit = min(request.args.get('limit', 8, type=int), 50)
+    return jsonify(current_network().station_index.search(query, limit))
+
+@app.route('/api/stations/table', methods=['GET'])
+def get_station_table():
+    """Versioned station/line/mode table that format=compact journeys
+    index into; revalidate with If-None-Match (ETag = version)"""
+    table, _ = station_table(current_network())
+    response = jsonify(table)
+    response.set_etag(table['version'])
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+@app.route('/api/stations/nearby', methods=['GET'])
+def get_nearby_stations():
+    """Stations nearest a point with walking times
+    (?lat=..&lon=..&k=5&maxWalkMeters=..)"""
+    lat = request.args.get('lat', type=float)
+    lon = request.args.get('lon', type=float)
+    try:
+        point = parse_point({'lat': lat, 'lon': lon})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    k = max(1, min(request.args.get('k', 5, type=int), 50))
+    max_meters = request.args.get('maxWalkMeters', MAX_WALK_METERS, type=float)
+    return jsonify(nearby_candidates(point, k, max_meters))
 
 @app.route('/api/journey', methods=['POST'])
 def find_journey():
@@ -466,53 +1434,186 @@ def find_journey():
         source = normalize_station(data.get('from', ''))
         dest = normalize_station(data.get('to', ''))
         route_type = data.get('routeType', 'fastest')
+        # include=all also returns every profile's summary (same shape as
+        # /api/journey/all), include=options every Pareto-optimal trade-off;
+        # both come from this one computation ("all,options" for both)
+        include = parse_include(data.get('include') or request.args.get('include'))
+        # k > 1 adds up to k alternative routes for the selected profile
+        try:
+            k = int(data.get('k') or request.args.get('k') or 1)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'k must be an integer'}), 400
+        k = max(1, min(k, MAX_ALTERNATIVES))
+        # format=compact: arrays indexed into /api/stations/table;
+        # fields= picks the route parts (path, segments, transfers, edges,
+        # instructions) in either format
+        response_format = data.get('format') or request.args.get('format') or 'full'
+        if response_format not in DEFAULT_FIELDS:
+            return jsonify({'error': 'format must be "full" or "compact"'}), 400
+        try:
+            fields = parse_fields(data.get('fields') or request.args.get('fields'), response_format)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        mimetype = response_mimetype()
+        # Fares of every route in this ticket class (second, first, ac, ...)
+        try:
+            ticket_class = parse_ticket_class(data.get('ticketClass') or request.args.get('ticketClass'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        # departAt (HH:MM IST, or ISO 8601) weighs comfort by the crowding
+        # of its 15-minute bucket; only the comfortable route type uses it,
+        # so other requests share one cache entry whatever their departAt
+        try:
+            bucket, variant = parse_crowding(data.get('departAt') or request.args.get('departAt'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if route_type != 'comfortable':
+            bucket, variant = None, NO_CROWDING
         
         # Validation
-        if source not in G.nodes():
+        graph = current_network().graph
+        if source not in graph:
             return jsonify({'error': f'Station "{data.get("from", "")}" not found'}), 404
         
-        if dest not in G.nodes():
+        if dest not in graph:
             return jsonify({'error': f'Station "{data.get("to", "")}" not found'}), 404
         
         if source == dest:
             return jsonify({'error': 'Source and destination cannot be the same'}), 400
         
-        # Find all route options
-        routes = find_optimal_routes(source, dest)
+        cache_key = ('journey', source, dest, route_type, include, k, response_format, fields, mimetype,
+                     ticket_class, bucket)
+        cached = route_cache.get(cache_key, current_network().cache_version)
+        if cached is not None:
+            return cached_response(cached)
+        
+        # Identical concurrent misses wait for one computation
+        def compute():
+            # One search per profile; the multi-criteria search only for
+            # include=options (never on networks routed on contraction
+            # hierarchies, where it is too slow)
+            routes = find_optimal_routes(source, dest, ticket_class, variant)
+            options = []
+            if 'options' in include and not current_network().hierarchical:
+                options = find_pareto_routes(source, dest, ticket_class)
+            tags = route_tags(source, dest, list(routes.values()) + [m for _, m in options])
+            
+            if response_format == 'compact':
+                k_routes = None
+                if k > 1 and route_type in PROFILE_SEARCH:
+                    k_routes = find_k_routes(source, dest, route_type, k, ticket_class, variant)
+                    tags |= route_tags(source, dest, k_routes[0])
+                result = compact_journey(route_type, routes,
+                                         options if 'options' in include else None, k_routes, fields)
+                if bucket is not None:
+                    result['crowding'] = describe_bucket(bucket)
+                if result['route'] is None:
+                    result['error'] = f'No {route_type} route found'
+                    return cache_json(cache_key, result, 404, mimetype, tags)
+                return cache_json(cache_key, result, mimetype=mimetype, tags=tags)
+            
+            extras = {}
+            if bucket is not None:
+                extras['crowding'] = describe_bucket(bucket)
+            if 'all' in include:
+                extras['all_routes'] = summarize_all_routes(routes)
+            if 'options' in include:
+                extras['options'] = [summarize_route(metrics) for _, metrics in options]
+            if k > 1 and route_type in PROFILE_SEARCH:
+                k_routes, complete = find_k_routes(source, dest, route_type, k, ticket_class, variant)
+                tags |= route_tags(source, dest, k_routes)
+                extras['k_shortest'] = {'routes': [select_fields(r, fields) for r in k_routes],
+                                        'complete': complete, 'lineChangeTime': 'routes only'}
+            
+            # Select requested route type
+            selected_route = routes.get(route_type)
+            
+            if not selected_route:
+                if route_type == 'comfortable':
+                    error = 'No comfortable AC Metro route available. This journey requires local trains only. Try "Fastest" or "Cheapest" options.'
+                elif route_type == 'cheapest':
+                    error = 'No route available between these stations.'
+                else:
+                    error = f'No {route_type} route found'
+                result = {'error': error}
+                result.update(extras)
+                return cache_json(cache_key, result, 404, mimetype, tags)
+            
+            # Format instructions
+            instructions = format_route_instructions(selected_route)
+            
+            result = {
+                'route': instructions,
+                'time': f"{selected_route['total_time']} min",
+                'cost': f"₹{selected_route['total_cost']}",
+                'distance': f"{selected_route['total_distance']} km",
+                'transfers': selected_route['num_transfers'],
+                'comfort': selected_route['avg_comfort'],
+                'metro_percentage': selected_route.get('metro_percentage', 0),
+                'alternatives': {
+                    'fastest': select_fields(routes.get('fastest'), fields),
+                    'cheapest': select_fields(routes.get('cheapest'), fields),
+                    'comfortable': select_fields(routes.get('comfortable'), fields)
+                }
+            }
+            result.update(extras)
+            
+            return cache_json(cache_key, result, mimetype=mimetype, tags=tags)
+
+        return coalesced(cache_key, compute)
+    except Exception as e:
+        print(f"Error in find_journey: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
+
+@app.route('/api/journey/timetable', methods=['POST'])
+def find_timed_journey():
+    """Earliest-arrival journey for a departure time (departAt, HH:MM IST)"""
+    try:
+        data = request.get_json()
+        
+        if not data:
+            return jsonify({'error': 'No data provided'}), 400
         
-        # Select requested route type
-        selected_route = routes.get(route_type)
+        source = normalize_station(data.get('from', ''))
+        dest = normalize_station(data.get('to', ''))
         
-        if not selected_route:
-            if route_type == 'comfortable':
-                return jsonify({
-                    'error': 'No comfortable AC Metro route available. This journey requires local trains only. Try "Fastest" or "Cheapest" options.'
-                }), 404
-            elif route_type == 'cheapest':
-                return jsonify({
-                    'error': 'No local train route available. This journey may require Metro connections.'
-                }), 404
-            return jsonify({'error': f'No {route_type} route found'}), 404
+        graph = current_network().graph
+        if source not in graph or dest not in graph:
+            return jsonify({'error': 'Station not found'}), 404
         
-        # Format instructions
-        instructions = format_route_instructions(selected_route)
+        if source == dest:
+            return jsonify({'error': 'Source and destination cannot be the same'}), 400
+        
+        depart_at = data.get('departAt')
+        if depart_at:
+            try:
+                depart_at = parse_time(depart_at)
+            except ValueError:
+                return jsonify({'error': 'departAt must be HH:MM'}), 400
+        else:
+            now = datetime.now(IST)
+            depart_at = now.hour * 3600 + now.minute * 60 + now.second
+        
+        journey = find_timed_route(source, dest, depart_at)
+        if not journey:
+            ROUTE_NOT_FOUND.labels('timetable').inc()
+            return jsonify({'error': 'No train reaches this destination after the requested time'}), 404
         
         return jsonify({
-            'route': instructions,
-            'time': f"{selected_route['total_time']} min",
-            'cost': f"₹{selected_route['total_cost']}",
-            'distance': f"{selected_route['total_distance']} km",
-            'transfers': selected_route['num_transfers'],
-            'comfort': selected_route['avg_comfort'],
-            'metro_percentage': selected_route.get('metro_percentage', 0),
-            'alternatives': {
-                'fastest': routes.get('fastest'),
-                'cheapest': routes.get('cheapest'),
-                'comfortable': routes.get('comfortable')
-            }
+            'route': format_timed_instructions(journey),
+            'depart': format_time(journey['depart_at']),
+            'arrive': format_time(journey['arrive_at']),
+            'time': f"{journey['duration'] // 60} min",
+            'transfers': journey['transfers'],
+            'legs': [
+                dict(leg, depart=format_time(leg['depart']), arrive=format_time(leg['arrive']))
+                for leg in journey['legs']
+            ]
         })
     except Exception as e:
-        print(f"Error in find_journey: {str(e)}")
+        print(f"Error in find_timed_journey: {str(e)}")
         import traceback
         traceback.print_exc()
         return jsonify({'error': f'Server error: {str(e)}'}), 500
@@ -525,45 +1626,529 @@ def find_all_routes():
         source = normalize_station(data.get('from', ''))
         dest = normalize_station(data.get('to', ''))
         
-        if source not in G.nodes() or dest not in G.nodes():
+        graph = current_network().graph
+        if source not in graph or dest not in graph:
             return jsonify({'error': 'Station not found'}), 404
         
         if source == dest:
             return jsonify({'error': 'Source and destination cannot be the same'}), 400
         
-        routes = find_optimal_routes(source, dest)
-        
-        result = {}
-        for route_type in ['fastest', 'cheapest', 'comfortable']:
-            route_data = routes.get(route_type)
-            if route_data:
-                result[route_type] = {
-                    'instructions': format_route_instructions(route_data),
-                    'time': route_data['total_time'],
-                    'cost': route_data['total_cost'],
-                    'distance': route_data['total_distance'],
-                    'transfers': route_data['num_transfers'],
-                    'comfort': route_data['avg_comfort'],
-                    'metro_percentage': route_data.get('metro_percentage', 0)
-                }
+        try:
+            ticket_class = parse_ticket_class(data.get('ticketClass'))
+            bucket, variant = parse_crowding(data.get('departAt'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        return jsonify(result)
+        cache_key = ('all', source, dest, ticket_class, bucket)
+        cached = route_cache.get(cache_key, current_network().cache_version)
+        if cached is not None:
+            return cached_response(cached)
+        
+        def compute():
+            routes = find_optimal_routes(source, dest, ticket_class=ticket_class, variant=variant)
+            result = summarize_all_routes(routes)
+            return cache_json(cache_key, result, tags=route_tags(source, dest, routes.values()))
+        
+        return coalesced(cache_key, compute)
     except Exception as e:
         print(f"Error in find_all_routes: {str(e)}")
         import traceback
         traceback.print_exc()
         return jsonify({'error': f'Server error: {str(e)}'}), 500
 
+@app.route('/api/journey/nearby', methods=['POST'])
+def find_nearby_journey():
+    """Journey from and/or to GPS coordinates
+
+    NEARBY JOURNEY LOGIC:
+    - from / to: a station name or {"lat": .., "lon": ..}
+    - A point resolves to its nearest stations (candidates, default 3)
+      within maxWalkMeters, each with its walking time
+    - One multi-source search over every candidate pair, walks included,
+      never one search per pair
+    - routeType picks the profile (fastest, cheapest or comfortable)
+    - Fares are slab fares in ticketClass, as in /api/journey
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+
+        route_type = data.get('routeType', 'fastest')
+        if route_type not in PROFILE_SEARCH:
+            return jsonify({'error': f'Unknown routeType "{route_type}"'}), 400
+        try:
+            ticket_class = parse_ticket_class(data.get('ticketClass') or request.args.get('ticketClass'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        try:
+            k = int(data.get('candidates') or NEARBY_CANDIDATES)
+            max_meters = float(data.get('maxWalkMeters', MAX_WALK_METERS))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'candidates and maxWalkMeters must be numbers'}), 400
+        if not max_meters >= 0:
+            return jsonify({'error': 'maxWalkMeters must not be negative'}), 400
+        k = max(1, min(k, MAX_NEARBY_CANDIDATES))
+        max_meters = min(max_meters, MAX_WALK_METERS)
+        try:
+            fields = parse_fields(data.get('fields') or request.args.get('fields'), 'full')
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        ends = {}
+        for end in ('from', 'to'):
+            value = data.get(end)
+            try:
+                point = parse_point(value)
+            except ValueError as e:
+                return jsonify({'error': f'{end}: {e}'}), 400
+            if point is None:
+                station = normalize_station(str(value or ''))
+                if station not in current_network().graph:
+                    return jsonify({'error': f'Station "{value or ""}" not found'}), 404
+                ends[end] = (None, [{'station': station, 'meters': 0, 'minutes': 0}])
+                continue
+            candidates = nearby_candidates(point, k, max_meters)
+            if not candidates:
+                return jsonify({'error': f'No station within {max_meters:g} m of {end}'}), 404
+            ends[end] = (point, candidates)
+
+        (origin, origins), (destination, destinations) = ends['from'], ends['to']
+        if origin is None and destination is None and origins == destinations:
+            return jsonify({'error': 'Source and destination cannot be the same'}), 400
+        route_data, board, alight = find_nearby_route(origins, destinations, route_type,
+                                                      ticket_class)
+        if board is None:
+            return jsonify({'error': f'No {route_type} route found'}), 404
+        if route_data is not None and route_type == 'comfortable' and not is_comfortable(route_data):
+            return jsonify({'error': 'No comfortable AC Metro route available. '
+                                     'Try "Fastest" or "Cheapest" options.'}), 404
+
+        access = next(c for c in origins if c['station'] == board)
+        egress = next(c for c in destinations if c['station'] == alight)
+        ride = route_data['total_time'] if route_data else 0
+        walk = access['minutes'] + egress['minutes']
+
+        # Two points close together: walking straight there may beat any ride
+        if origin is not None and destination is not None:
+            meters = haversine_m(*origin, *destination)
+            minutes = walk_minutes(meters)
+            if meters <= max_meters and (route_data is None or minutes <= ride + walk):
+                direct = {'meters': round(meters), 'minutes': minutes}
+                return jsonify({
+                    'routeType': route_type,
+                    'ticketClass': ticket_class,
+                    'board': None,
+                    'alight': None,
+                    'walk': {'access': None, 'egress': None, 'direct': direct},
+                    'route': [f"🚶 Walk to your destination\n   ({direct['meters']} m, ~{minutes} min)"],
+                    'time': f"{minutes} min",
+                    'ride_time': "0 min",
+                    'cost': "₹0",
+                    'details': None,
+                    'candidates': {'from': origins, 'to': destinations},
+                })
+        # Walks around the ride's segments, before its transfers and summary
+        ride_lines = format_route_instructions(route_data)
+        segments = len(route_data['segments']) if route_data else 0
+        instructions = []
+        if origin is not None:
+            instructions.append(f"🚶 Walk to {board}\n   ({access['meters']} m, ~{access['minutes']} min)")
+        instructions.extend(ride_lines[:segments])
+        if destination is not None:
+            instructions.append(f"🚶 Walk from {alight}\n   ({egress['meters']} m, ~{egress['minutes']} min)")
+        instructions.extend(ride_lines[segments:])
+        if walk:
+            instructions.append(f"   🚶 Walking: {walk} min (door to door: {ride + walk} min)")
+
+        result = {
+            'routeType': route_type,
+            'ticketClass': ticket_class,
+            'board': board,
+            'alight': alight,
+            'walk': {
+                'access': access if origin is not None else None,
+                'egress': egress if destination is not None else None,
+                'direct': None,
+            },
+            'route': instructions,
+            'time': f"{ride + walk} min",
+            'ride_time': f"{ride} min",
+            'cost': f"₹{route_data['total_cost'] if route_data else 0}",
+            'details': select_fields(route_data, fields),
+            'candidates': {
+                'from': origins if origin is not None else None,
+                'to': destinations if destination is not None else None,
+            },
+        }
+        return jsonify(result)
+    except Exception as e:
+        print(f"Error in find_nearby_journey: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
+
+@app.route('/api/matrix', methods=['POST'])
+def od_matrix():
+    """Stream an origin-destination matrix as NDJSON or CSV
+
+    MATRIX LOGIC:
+    - origins/destinations default to every station
+    - profile: fastest, cheapest, comfortable or all (one row per profile)
+    - One shortest-path tree per origin (route table row), never per pair
+    - workers > 1 fans origins out across a forked process pool
+    - Rows: from, to, profile, time, cost, distance (null if unreachable)
+    - cost is the distance-slab fare in ticketClass, priced per tree
+    - time leaves out line changes (X-Line-Change-Time: excluded), so it
+      can be below /api/journey's time for the same pair
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        
+        profile = data.get('profile', 'fastest')
+        profiles = list(MATRIX_PROFILES) if profile == 'all' else [profile]
+        if profile != 'all' and profile not in MATRIX_PROFILES:
+            return jsonify({'error': f'Unknown profile "{profile}"'}), 400
+        
+        fmt = data.get('format') or request.args.get('format', 'ndjson')
+        if fmt not in ('ndjson', 'csv'):
+            return jsonify({'error': 'format must be ndjson or csv'}), 400
+        
+        try:
+            workers = int(data.get('workers', 1))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'workers must be an integer'}), 400
+        workers = max(1, min(workers, MATRIX_MAX_WORKERS))
+        
+        try:
+            ticket_class = parse_ticket_class(data.get('ticketClass'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        origins, unknown_origins = resolve_stations(data.get('origins'))
+        destinations, unknown_destinations = resolve_stations(data.get('destinations'))
+        if unknown_origins or unknown_destinations:
+            return jsonify({
+                'error': 'Station not found',
+                'unknown': unknown_origins + unknown_destinations
+            }), 404
+        
+        # Tables are built (if needed) here, before the response starts
+        engine = matrix_engine(profiles, ticket_class)
+        batches = engine.rows(profiles, origins, destinations, workers)
+        headers = {LINE_CHANGE_HEADER: 'excluded'}
+        if fmt == 'csv':
+            return Response(csv_rows(batches), mimetype='text/csv', headers=headers)
+        return Response(ndjson_rows(batches), mimetype='application/x-ndjson', headers=headers)
+    except Exception as e:
+        print(f"Error in od_matrix: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
+
+@app.route('/api/reachable', methods=['POST'])
+def reachable_stations():
+    """Every station reachable within a time and/or fare budget
+
+    REACHABILITY LOGIC:
+    - from: one station or a list (reachable from ANY of them)
+    - maxMinutes and/or maxFare (₹, slab fare in ticketClass) bound the journey
+    - profile picks the route each station is reached by (default fastest)
+    - One multi-source search that stops at the budget, never per station
+    - Per station: nearest origin, time, fare and line changes
+    - time and maxMinutes leave out line-change time (lineChangeTime:
+      excluded), so times can be below /api/journey's
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        
+        profile = data.get('profile', 'fastest')
+        if profile not in PROFILE_SEARCH:
+            return jsonify({'error': f'Unknown profile "{profile}"'}), 400
+        
+        response_format = data.get('format') or request.args.get('format') or 'full'
+        if response_format not in DEFAULT_FIELDS:
+            return jsonify({'error': 'format must be "full" or "compact"'}), 400
+        
+        try:
+            ticket_class = parse_ticket_class(data.get('ticketClass'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        limits = {}
+        for key, weight in REACH_BUDGETS.items():
+            value = data.get(key)
+            if value is None:
+                continue
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+                return jsonify({'error': f'{key} must be a non-negative number'}), 400
+            limits[weight] = value
+        if not limits:
+            return jsonify({'error': 'Give a budget: maxMinutes and/or maxFare'}), 400
+        
+        names = data.get('from')
+        if isinstance(names, str):
+            names = [names]
+        if not names:
+            return jsonify({'error': 'No origin provided'}), 400
+        origins, unknown = resolve_stations(names)
+        if unknown:
+            return jsonify({'error': 'Station not found', 'unknown': unknown}), 404
+        origins = sorted(set(origins))
+        
+        mimetype = response_mimetype()
+        budget = tuple(sorted(limits.items()))
+        cache_key = ('reachable', tuple(origins), profile, budget, ticket_class,
+                     response_format, mimetype)
+        cached = route_cache.get(cache_key, current_network().cache_version)
+        if cached is not None:
+            return cached_response(cached)
+        
+        rows = find_reachable(origins, profile, limits, ticket_class)
+        result = {
+            'profile': profile,
+            'ticketClass': ticket_class,
+            'budget': {key: data.get(key) for key in REACH_BUDGETS},
+            'lineChangeTime': 'excluded',
+            'count': len(rows),
+        }
+        if response_format == 'compact':
+            table, (station_ids, _, _) = station_table(current_network())
+            result['stationTable'] = table['version']
+            result['origins'] = [station_ids[o] for o in origins]
+            result['rows'] = [[station_ids[station], station_ids[origin], t, cost, transfers]
+                              for station, origin, t, cost, transfers in rows]
+        else:
+            result['origins'] = origins
+            result['stations'] = [
+                {'station': station, 'from': origin, 'time': t, 'cost': cost, 'transfers': transfers}
+                for station, origin, t, cost, transfers in rows
+            ]
+        return cache_json(cache_key, result, mimetype=mimetype)
+    except Exception as e:
+        print(f"Error in reachable_stations: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
+
+@app.route('/api/itinerary', methods=['POST'])
+def plan_itinerary():
+    """Visit several stations in the best order
+
+    ITINERARY LOGIC:
+    - from: start station; waypoints: up to MAX_ITINERARY_STOPS to visit
+    - to: optional end station (from again for a round trip); without it
+      the itinerary ends at whichever waypoint is visited last
+    - profile (fastest, cheapest or comfortable) is what the order minimizes
+    - One shortest-path tree per stop gives every leg's cost
+    - Exact order for up to 10 waypoints, a time-boxed local search beyond
+    - The order's leg costs leave out line changes; the legs and totals
+      returned include them (lineChangeTime: legs only)
+    - Returns each leg's full route and the itinerary's totals
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        
+        profile = data.get('profile', 'fastest')
+        if profile not in PROFILE_SEARCH:
+            return jsonify({'error': f'Unknown profile "{profile}"'}), 400
+        
+        waypoints = data.get('waypoints')
+        if not isinstance(waypoints, list) or not waypoints:
+            return jsonify({'error': 'waypoints must be a list of stations'}), 400
+        if len(waypoints) > MAX_ITINERARY_STOPS:
+            return jsonify({'error': f'At most {MAX_ITINERARY_STOPS} waypoints'}), 400
+        
+        try:
+            ticket_class = parse_ticket_class(data.get('ticketClass'))
+            fields = parse_fields(data.get('fields'), 'full')
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        if not data.get('from'):
+            return jsonify({'error': 'No start station provided'}), 400
+        names = [data['from']] + waypoints + ([data['to']] if data.get('to') else [])
+        stations, unknown = resolve_stations(names)
+        if unknown:
+            return jsonify({'error': 'Station not found', 'unknown': unknown}), 404
+        start = stations[0]
+        end = stations[-1] if data.get('to') else None
+        # Each waypoint once; the start and end are visited anyway
+        stops = sorted(set(stations[1:len(waypoints) + 1]) - {start, end})
+        if not stops and end in (None, start):
+            return jsonify({'error': 'Nothing to visit besides the start station'}), 400
+
+        cache_key = ('itinerary', start, tuple(stops), end, profile, ticket_class, fields)
+        cached = route_cache.get(cache_key, current_network().cache_version)
+        if cached is not None:
+            return cached_response(cached)
+        
+        def compute():
+            # The order depends on the route between every two stops
+            nodes = [start] + stops + ([end] if end else [])
+            tags = {('pair', a, b) for a in nodes for b in nodes if a != b}
+            visits, legs, exact = find_itinerary(start, stops, end, profile, ticket_class)
+            if legs is None:
+                result = {'error': 'No route visits every stop', 'unreachable': visits}
+                return cache_json(cache_key, result, 404, tags=tags)
+            
+            for src, dest, leg in zip(visits, visits[1:], legs):
+                tags |= route_tags(src, dest, [leg])
+            result = {
+                'profile': profile,
+                'ticketClass': ticket_class,
+                'order': visits,
+                'optimal': exact,
+                'lineChangeTime': 'legs only',
+                'total_time': sum(leg['total_time'] for leg in legs),
+                'total_cost': sum(leg['total_cost'] for leg in legs),
+                'total_distance': round(sum(leg['total_distance'] for leg in legs), 1),
+                'num_transfers': sum(leg['num_transfers'] for leg in legs),
+                'legs': [{'from': src, 'to': dest,
+                          'instructions': format_route_instructions(leg),
+                          **select_fields(leg, fields)}
+                         for src, dest, leg in zip(visits, visits[1:], legs)],
+            }
+            return cache_json(cache_key, result, tags=tags)
+        
+        return coalesced(cache_key, compute)
+    except Exception as e:
+        print(f"Error in plan_itinerary: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
+    net = current_network()
     return jsonify({
         'status': 'healthy',
-        'stations': len(G.nodes()),
-        'connections': len(G.edges()),
-        'version': '2.0-perfect'
+        'stations': len(net.graph.nodes()),
+        'connections': len(net.graph.edges()),
+        'version': '2.0-perfect',
+        'network_version': net.version,
+        'network': network_store.status(),
+        'route_cache': route_cache.stats(),
+        'single_flight': single_flight.stats()
+    })
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Stage latencies, request counts and cache/network gauges (Prometheus text)"""
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+def admin_denied():
+    """Error response unless the request carries ADMIN_TOKEN, else None"""
+    if not ADMIN_TOKEN:
+        return jsonify({'error': 'Admin endpoints are disabled (ADMIN_TOKEN not set)'}), 403
+    token = request.headers.get('X-Admin-Token', '')
+    if not hmac.compare_digest(token.encode('utf-8'), ADMIN_TOKEN.encode('utf-8')):
+        return jsonify({'error': 'Invalid admin token'}), 403
+    return None
+
+@app.route('/api/admin/network/reload', methods=['POST'])
+def reload_network():
+    """
+    HOT RELOAD of the network data file:
+    - Requires the X-Admin-Token header to match ADMIN_TOKEN (disabled if unset)
+    - Loads and validates NETWORK_FILE, builds every route table, then swaps
+    - Invalid data returns 422 and leaves the live network untouched
+    - Reloads this worker only; signal workers to reload all of them
+    - Disruptions in force are applied to the new network
+    """
+    denied = admin_denied()
+    if denied:
+        return denied
+    
+    try:
+        previous = network_store.current
+        snapshot = network_store.reload()
+        return jsonify({
+            'status': 'reloaded',
+            'previous_version': previous.version if previous else None,
+            'network': network_store.status(),
+            'stations': len(snapshot.graph.nodes()),
+            'connections': len(snapshot.graph.edges())
+        })
+    except NetworkError as e:
+        return jsonify({
+            'error': 'Network data rejected, keeping current network',
+            'details': e.errors,
+            'network': network_store.status()
+        }), 422
+
+@app.route('/api/disruptions', methods=['GET'])
+def list_disruptions():
+    """Disruptions in force (closures, slowdowns, delays)"""
+    network_store.live()
+    return jsonify({
+        'disruptions': [d.to_dict() for d in network_store.disruptions.active(time.time())],
+        'revision': network_store.current.revision,
     })
 
+def overlay_summary(change):
+    return {
+        'edges_changed': len(change.edges),
+        'routes_changed': len(change.pairs) if change.pairs is not None else None,
+        'revision': network_store.current.revision,
+    }
+
+@app.route('/api/admin/disruptions', methods=['POST'])
+def add_disruption():
+    """
+    LIVE DISRUPTION (admin):
+    - type: close, slow (time × factor) or delay (+ minutes)
+    - line alone: the whole line; line + from/to: the stretch between
+      them; from/to alone: one direct connection
+    - Expiry: durationMinutes, or until (ISO 8601, IST if no offset)
+    - Applied without rebuilding the network: only route-table rows and
+      cached journeys whose routes it can change are recomputed / dropped
+    - Every worker picks it up through DISRUPTIONS_FILE
+    """
+    denied = admin_denied()
+    if denied:
+        return denied
+    
+    try:
+        data = dict(request.get_json(silent=True) or {})
+        for end in ('from', 'to'):
+            if isinstance(data.get(end), str):
+                data[end] = normalize_station(data[end])
+        try:
+            disruption = Disruption.from_request(data, time.time(), IST)
+            edges = disruption.edges(network_store.base)
+        except DisruptionError as e:
+            return jsonify({'error': 'Invalid disruption', 'details': e.errors}), 400
+        
+        change = network_store.disrupt(disruption)
+        result = {'disruption': disruption.to_dict(), 'edges': len(edges)}
+        result.update(overlay_summary(change))
+        return jsonify(result), 201
+    except Exception as e:
+        print(f"Error in add_disruption: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
+
+@app.route('/api/admin/disruptions/<disruption_id>', methods=['DELETE'])
+def end_disruption(disruption_id):
+    """End a disruption before it expires (admin)"""
+    denied = admin_denied()
+    if denied:
+        return denied
+    
+    try:
+        removed, change = network_store.end_disruption(disruption_id)
+        if removed is None:
+            return jsonify({'error': f'No disruption "{disruption_id}" in force'}), 404
+        result = {'status': 'ended', 'disruption': removed.to_dict()}
+        result.update(overlay_summary(change))
+        return jsonify(result)
+    except Exception as e:
+        print(f"Error in end_disruption: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
+
 @app.route('/api/debug/path', methods=['POST'])
 def debug_path():
     """Debug endpoint to verify connectivity"""
@@ -572,7 +2157,7 @@ def debug_path():
     dest = normalize_station(data.get('to', ''))
     
     try:
-        has_path = nx.has_path(G, source, dest)
+        has_path = current_network().views.view('all').connected(source, dest)
         
         result = {
             'has_path': has_path,
@@ -593,19 +2178,32 @@ def debug_path():
             if routes.get('fastest'):
                 result['fastest_path'] = routes['fastest']['path']
         else:
-            result['source_neighbors'] = list(G.neighbors(source))[:5]
-            result['dest_neighbors'] = list(G.neighbors(dest))[:5]
+            result['source_neighbors'] = list(current_network().graph.neighbors(source))[:5]
+            result['dest_neighbors'] = list(current_network().graph.neighbors(dest))[:5]
         
         return jsonify(result)
     except Exception as e:
         return jsonify({'error': str(e)})
 
 if __name__ == '__main__':
+    if sys.argv[1:] == ['precompute']:
+        # Offline step (e.g. at deploy time): importing this module has
+        # already built the routing snapshot (route tables or contraction
+        # hierarchies) for NETWORK_FILE in ROUTING_SNAPSHOT_DIR, so workers
+        # that start afterwards only map it
+        status = network_store.status()
+        if not status['routing_file']:
+            print("ROUTING_SNAPSHOT_DIR is not set: nothing to precompute")
+            sys.exit(1)
+        print(f"Network {status['version']} ({status['routing']}): {status['routing_file']}")
+        sys.exit(0)
     print("=" * 70)
     print("🚆 MUMBAI JOURNEY PLANNER - PERFECT EDITION")
     print("=" * 70)
-    print(f"📍 Total Stations: {len(G.nodes())}")
-    print(f"🛤️  Total Connections: {len(G.edges())}")
+    net = current_network()
+    print(f"📍 Total Stations: {len(net.graph.nodes())}")
+    print(f"🛤️  Total Connections: {len(net.graph.edges())}")
+    print(f"🗂️  Network data: {net.source} (version {net.version})")
     print()
     print("🎯 ROUTE OPTIMIZATION LOGIC:")
     print()
@@ -615,9 +2213,9 @@ if __name__ == '__main__':
     print("     • Ignores cost completely")
     print()
     print("  💰 CHEAPEST Route:")
-    print("     • Uses LOCAL TRAINS ONLY (₹5/station)")
-    print("     • NEVER touches Metro (₹20/station)")
-    print("     • Ignores time completely")
+    print("     • Minimizes the ticket fare (distance slabs per ticket)")
+    print("     • Any Metro/Local combination, one ticket per ride")
+    print("     • Fastest route among equal fares")
     print()
     print("  🪑 COMFORTABLE Route:")
     print("     • Prefers AC Metro (comfort=10)")
@@ -0,0 +1,142 @@
+"""
+Benchmark: contraction hierarchies vs plain Dijkstra on large networks.
+
+First checks the hierarchies of every profile on the real network against
+the all-pairs route tables, for every pair.  Distances must match, and
+each unpacked path must be a real path with that total (exits non-zero
+otherwise).  Then, for synthetic grids of each requested size, it builds
+the hierarchy and times random queries against TransitGraph.dijkstra with
+early exit.  Distances are checked on a sample.  The grids are rows of
+local lines crossed by columns of metro lines, with seeded random
+per-hop times.
+
+Usage (from backend/):
+    python benchmarks/bench_contraction.py [sizes] [queries]
+    (sizes: comma-separated station counts, default 10000,30000,100000)
+"""
+import contextlib
+import io
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import app
+from contraction import ContractionHierarchy
+from transit_graph import INF, TransitGraph
+
+network = app.current_network()
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    k = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def path_total(graph, weight, path):
+    total = 0
+    for u, v in zip(path, path[1:]):
+        e = graph.edge_slot(graph.index[u], graph.index[v])
+        if e < 0:
+            return None
+        total += graph.weights[weight][e]
+    return total
+
+
+def check_network():
+    mismatches = 0
+    for profile, (view, weight) in app.ROUTE_PROFILES.items():
+        graph = network.views.view(view).graph
+        hierarchy = ContractionHierarchy(graph, weight)
+        table = network.route_tables.get(profile)
+        for src in graph.stations:
+            row = table.row(src)
+            for dest in graph.stations:
+                expected = row[graph.index[dest]]
+                path = hierarchy.path(src, dest)
+                if path is None:
+                    mismatches += expected != INF
+                    continue
+                total = path_total(graph, weight, path)
+                if total is None or abs(total - expected) > 1e-9 \
+                        or path[0] != src or path[-1] != dest:
+                    mismatches += 1
+    return mismatches
+
+
+def grid(stations, seed=1):
+    size = max(2, round(math.sqrt(stations)))
+    rng = random.Random(seed)
+    name = lambda r, c: f"R{r:03d}C{c:03d}"
+    edges = []
+    for r in range(size):
+        for c in range(size):
+            if c + 1 < size:
+                edges.append((name(r, c), name(r, c + 1), {
+                    'mode': 'Local Train', 'line': f'Row {r}', 'time': rng.randint(2, 4)}))
+            if r + 1 < size:
+                edges.append((name(r, c), name(r + 1, c), {
+                    'mode': 'Metro', 'line': f'Column {c}', 'time': rng.randint(1, 5)}))
+    return TransitGraph.from_edges(edges, {'time': 'time'})
+
+
+def array_bytes(*arrays):
+    return sum(a.itemsize * len(a) for a in arrays)
+
+
+def main():
+    sizes = [int(s) for s in sys.argv[1].split(',')] if len(sys.argv) > 1 else [10000, 30000, 100000]
+    queries = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+
+    mismatches = check_network()
+    print(f"Real network ({network.graph.number_of_nodes()} stations, "
+          f"{len(app.ROUTE_PROFILES)} profiles, all pairs): {mismatches} mismatches")
+    print()
+    print(f"{'stations':>9}{'edges':>9}{'build (s)':>11}{'shortcuts':>11}{'CH (MiB)':>10}"
+          f"{'table (MiB)':>13}{'CH p50 (ms)':>13}{'CH p99 (ms)':>13}"
+          f"{'Dijkstra p50 (ms)':>19}{'speed-up':>10}")
+
+    for stations in sizes:
+        graph = grid(stations)
+        start = time.perf_counter()
+        hierarchy = ContractionHierarchy(graph, 'time')
+        build = time.perf_counter() - start
+
+        rng = random.Random(stations)
+        pairs = [tuple(rng.sample(graph.stations, 2)) for _ in range(queries)]
+        ch_ms = []
+        for src, dest in pairs:
+            start = time.perf_counter()
+            hierarchy.path(src, dest)
+            ch_ms.append((time.perf_counter() - start) * 1000)
+        dijkstra_ms = []
+        for src, dest in pairs[:max(10, queries // 10)]:
+            s, t = graph.index[src], graph.index[dest]
+            start = time.perf_counter()
+            dist, _ = graph.dijkstra('time', s, t)
+            dijkstra_ms.append((time.perf_counter() - start) * 1000)
+            if abs(dist[t] - hierarchy.distance(src, dest)) > 1e-9:
+                mismatches += 1
+
+        ch_mib = array_bytes(hierarchy.rank, hierarchy.offsets, hierarchy.targets,
+                             hierarchy.weight, hierarchy.middle) / 2 ** 20
+        # What one all-pairs RouteTable (int pred + double dist) would take
+        table_mib = graph.size ** 2 * 12 / 2 ** 20
+        print(f"{graph.size:>9}{len(graph.targets) // 2:>9}{build:>11.1f}{hierarchy.shortcuts:>11}"
+              f"{ch_mib:>10.1f}{table_mib:>13.0f}{percentile(ch_ms, 50):>13.2f}"
+              f"{percentile(ch_ms, 99):>13.2f}{percentile(dijkstra_ms, 50):>19.1f}"
+              f"{percentile(dijkstra_ms, 50) / percentile(ch_ms, 50):>9.0f}x")
+
+    print()
+    print(f"Total mismatches: {mismatches}")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+"""
+Benchmark: time-of-day crowding on the comfortable route.
+
+Checks, for every crowding variant and a sample of station pairs, that
+the line-aware comfortable search on the crowded weights (A* guided by
+the static table) gives the same total as an unguided one, that the
+variant's route table (used on contraction-hierarchy networks) gives the
+same comfort total as a Dijkstra on the crowded weights, and that the
+best k-shortest comfortable path is no worse than the table's.  Exits
+non-zero on any mismatch.  Then reports how many sampled pairs change
+route in the busiest bucket, the table build time per variant, and
+per-query times of the comfortable route with and without departAt next
+to the fastest route.
+
+Usage (from backend/):
+    python benchmarks/bench_crowding.py [pairs]
+"""
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+
+os.environ['DISRUPTIONS_FILE'] = ''
+os.environ['ROUTE_CACHE_SIZE'] = '0'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import app
+from crowding import BUCKET_MINUTES, NO_CROWDING, describe_bucket
+
+network = app.current_network()
+EPSILON = 1e-9
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    k = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def weight_of(graph, path):
+    w = graph.weights['comfort']
+    return sum(w[graph.edge_slot(graph.index[u], graph.index[v])] for u, v in zip(path, path[1:]))
+
+
+def busiest(model):
+    """Bucket whose variant crowds the most edge slots"""
+    def crowded(bucket):
+        factors = model.factors[model.variant(bucket)]
+        return 0 if factors is None else sum(f > 1 for f in factors)
+    return max(range(len(model.bucket_variant)), key=crowded)
+
+
+def line_aware(src, dest, variant, guided=True):
+    """(total, path) of the line-aware comfortable search on a variant's
+    weights, as find_comfortable_route runs it (or unguided)"""
+    lines = app.line_model(network)
+    graph = lines.graph
+    heuristic = None
+    if guided:
+        low = app.crowding_model(network).min_factor[variant]
+        heuristic = [d * low for d in network.route_tables.get('comfortable').row(dest)]
+    total, ids, _ = lines.search('comfort', graph.index[src], graph.index[dest], heuristic,
+                                 app.crowded_comfort(network, variant))
+    return total, ids and [graph.stations[i] for i in ids]
+
+
+def check(model, pairs):
+    mismatches = 0
+    for variant in range(1, model.variants):
+        for src, dest in pairs:
+            guided, _ = line_aware(src, dest, variant)
+            unguided, _ = line_aware(src, dest, variant, guided=False)
+            if abs(guided - unguided) > EPSILON:
+                mismatches += 1
+                print(f"MISMATCH variant {variant} {src} -> {dest}: line-aware A* "
+                      f"{guided}, unguided {unguided}")
+        table = app.comfort_table(network, variant)
+        graph = table.graph
+        for src, dest in pairs:
+            s, t = graph.index[src], graph.index[dest]
+            dist, _ = graph.dijkstra('comfort', s, t)
+            path = table.path(src, dest)
+            if abs(weight_of(graph, path) - dist[t]) > EPSILON:
+                mismatches += 1
+                print(f"MISMATCH variant {variant} {src} -> {dest}: table "
+                      f"{weight_of(graph, path)}, dijkstra {dist[t]}")
+        for src, dest in pairs[:50]:
+            k_routes, _ = app.find_k_routes(src, dest, 'comfortable', 1, variant=variant)
+            best = app.comfort_table(network, variant).path(src, dest)
+            if k_routes and weight_of(graph, k_routes[0]['path']) > weight_of(graph, best) + EPSILON:
+                mismatches += 1
+                print(f"MISMATCH variant {variant} {src} -> {dest}: k-shortest "
+                      f"{weight_of(graph, k_routes[0]['path'])} > {weight_of(graph, best)}")
+    return mismatches
+
+
+def main():
+    model = app.crowding_model(network)
+    stations = list(network.views.view('all').graph.stations)
+    pairs = [(s, t) for s in stations for t in stations if s != t]
+    rng = random.Random(24)
+    sample = rng.sample(pairs, min(len(pairs), int(sys.argv[1]) if len(sys.argv) > 1 else 1000))
+
+    builds = []
+    for variant in range(1, model.variants):
+        start = time.perf_counter()
+        app.comfort_table(network, variant)
+        builds.append((time.perf_counter() - start) * 1e3)
+
+    with app.app.test_request_context():
+        mismatches = check(model, sample)
+
+    peak = busiest(model)
+    variant = model.variant(peak)
+    changed = sum(line_aware(s, t, NO_CROWDING)[1] != line_aware(s, t, variant)[1]
+                  for s, t in sample)
+    crowded_buckets = sum(v != NO_CROWDING for v in model.bucket_variant)
+
+    print(f"Buckets: {len(model.bucket_variant)} of {BUCKET_MINUTES} min, {crowded_buckets} crowded, "
+          f"{model.variants - 1} distinct variants  mismatches: {mismatches}")
+    print(f"Variant table build: p50 {percentile(builds, 50):.1f} ms, "
+          f"all {sum(builds):.0f} ms")
+    print(f"Busiest bucket {describe_bucket(peak)}: comfortable route differs for "
+          f"{changed} of {len(sample)} pairs")
+    print()
+
+    # A Monday or a Saturday, so the request lands in the peak bucket
+    day, window = describe_bucket(peak).split()
+    depart_at = f"{'2024-05-06' if day == 'weekday' else '2024-05-04'}T{window[:5]}"
+    client = app.app.test_client()
+    timings = {name: [] for name in ('fastest route', 'comfortable route (static)',
+                                     'comfortable route (departAt)', '/api/journey comfortable',
+                                     '/api/journey comfortable, departAt')}
+    with app.app.test_request_context():
+        for src, dest in sample:
+            for name, call in (('fastest route', lambda: app.find_fastest_route(src, dest)),
+                               ('comfortable route (static)',
+                                lambda: app.find_comfortable_route(src, dest)),
+                               ('comfortable route (departAt)',
+                                lambda: app.find_comfortable_route(src, dest, variant=variant))):
+                start = time.perf_counter()
+                call()
+                timings[name].append((time.perf_counter() - start) * 1e6)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for src, dest in sample[:500]:
+            for name, extra in (('/api/journey comfortable', {}),
+                                ('/api/journey comfortable, departAt', {'departAt': depart_at})):
+                body = {'from': src, 'to': dest, 'routeType': 'comfortable', **extra}
+                start = time.perf_counter()
+                client.post('/api/journey', json=body)
+                timings[name].append((time.perf_counter() - start) * 1e6)
+
+    print(f"{'query':<38}{'p50 (us)':>12}{'p99 (us)':>12}")
+    for name, samples in timings.items():
+        print(f"{name:<38}{percentile(samples, 50):>12.1f}{percentile(samples, 99):>12.1f}")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
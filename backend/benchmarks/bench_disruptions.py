@@ -0,0 +1,146 @@
+"""
+Benchmark: live disruptions, incremental table updates and selective cache
+invalidation.
+
+Warms the route cache with a skewed journey trace, then starts and ends a
+few disruptions.  For each step it checks that:
+- every route table matches one rebuilt from scratch on the disrupted
+  weights (distances, all pairs);
+- every journey the cache serves matches one computed with the cache off.
+It exits non-zero on any mismatch.  After the last disruption ends, the
+answers must match the undisrupted network's exactly.
+
+It reports the time to apply each step and how many cached responses were
+dropped.  It then replays the trace once and reports cache misses and mean
+latency, next to the same replay after flushing the whole cache (what a
+reload would do).
+
+Usage (from backend/):
+    python benchmarks/bench_disruptions.py [requests]
+"""
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+
+os.environ['DISRUPTIONS_FILE'] = ''
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import app
+from disruptions import Disruption
+from route_cache import RouteCache
+from route_table import RouteTable
+
+store = app.network_store
+
+STEPS = [
+    ('close Harbour Kurla-Vadala Road', {'type': 'close', 'line': 'Harbour Line',
+                                         'from': 'Kurla', 'to': 'Vadala Road'}),
+    ('delay Thane-Mulund +20 min', {'type': 'delay', 'from': 'Thane', 'to': 'Mulund', 'minutes': 20}),
+    ('slow Western Line x1.5', {'type': 'slow', 'line': 'Western Line', 'factor': 1.5}),
+]
+
+
+def trace(stations, n, seed=7):
+    """Journey pairs with Zipf-like popularity"""
+    rng = random.Random(seed)
+    pairs = [tuple(rng.sample(stations, 2)) for _ in range(300)]
+    weights = [1 / (i + 1) for i in range(len(pairs))]
+    return rng.choices(pairs, weights, k=n)
+
+
+def replay(client, pairs):
+    """(latency ms per request, {pair: (status, body)})"""
+    latencies, answers = [], {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        for src, dest in pairs:
+            start = time.perf_counter()
+            response = client.post('/api/journey', json={'from': src, 'to': dest,
+                                                         'include': 'all,options', 'k': 3})
+            latencies.append((time.perf_counter() - start) * 1000)
+            answers[(src, dest)] = (response.status_code, response.get_json())
+    return latencies, answers
+
+
+def uncached(client, pairs):
+    live = app.route_cache
+    app.route_cache = RouteCache(0)
+    try:
+        return replay(client, sorted(set(pairs)))[1]
+    finally:
+        app.route_cache = live
+
+
+def table_mismatches():
+    net = app.current_network()
+    bad = 0
+    for profile, (view, weight) in app.ROUTE_PROFILES.items():
+        graph = net.views.view(view).graph
+        table = net.route_tables.get(profile)
+        rebuilt = RouteTable(graph, weight)
+        bad += sum(a != b for a, b in zip(table.dist, rebuilt.dist))
+    return bad
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    client = app.app.test_client()
+    stations = sorted(app.current_network().graph.nodes())
+    pairs = trace(stations, requests)
+    baseline = uncached(client, pairs)
+    replay(client, pairs)
+
+    print(f"Stations: {len(stations)}  Requests per step: {requests}  "
+          f"Distinct pairs: {len(set(pairs))}")
+    print()
+    print(f"{'step':<38}{'apply (ms)':>11}{'edges':>7}{'pairs':>7}{'dropped':>9}"
+          f"{'misses':>8}{'mean (ms)':>11}{'flush misses':>14}{'flush mean (ms)':>17}")
+
+    mismatches = 0
+    started = []
+    steps = [(name, 'start', body) for name, body in STEPS] + \
+            [(f'end: {name}', 'end', None) for name, _ in STEPS]
+    for i, (name, action, body) in enumerate(steps):
+        cached = app.route_cache.stats()['size']
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            if action == 'start':
+                disruption = Disruption.from_request(dict(body, durationMinutes=60), time.time())
+                change = store.disrupt(disruption)
+                started.append(disruption.id)
+            else:
+                _, change = store.end_disruption(started[i - len(STEPS)])
+        apply_ms = (time.perf_counter() - start) * 1000
+        dropped = cached - app.route_cache.stats()['size']
+
+        misses = app.route_cache.misses
+        latencies, served = replay(client, pairs)
+        misses = app.route_cache.misses - misses
+        fresh = uncached(client, pairs)
+        mismatches += table_mismatches()
+        mismatches += sum(served[pair] != fresh[pair] for pair in served)
+
+        # The same trace after dropping every cached response instead
+        app.route_cache.clear()
+        flush_misses = app.route_cache.misses
+        flushed, _ = replay(client, pairs)
+        flush_misses = app.route_cache.misses - flush_misses
+
+        print(f"{name:<38}{apply_ms:>11.1f}{len(change.edges):>7}"
+              f"{len(change.pairs) if change.pairs is not None else '-':>7}{dropped:>9}"
+              f"{misses:>8}{sum(latencies) / len(latencies):>11.3f}"
+              f"{flush_misses:>14}{sum(flushed) / len(flushed):>17.3f}")
+
+    restored = sum(answer != baseline[pair] for pair, answer in uncached(client, pairs).items())
+    print()
+    print(f"Mismatches (tables vs rebuild, cache vs uncached): {mismatches}  "
+          f"Differences from the undisrupted network after all ended: {restored}")
+    if mismatches or restored:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""
+Benchmark: distance-slab fares.
+
+Checks, for every station pair and ticket class:
+- the fare of the fastest table route priced per journey (segments and
+  cumulative line distances) equals the same route priced along the
+  origin's whole shortest-path tree (as /api/matrix does);
+- the least-fare search with capped station bags finds the same fare as
+  an uncapped one, and no Pareto option is cheaper.
+Exits non-zero on any mismatch.  Then times pricing one journey, pricing
+a whole tree, the least-fare search and a full /api/journey with five
+alternatives, next to calculate_path_metrics.
+
+Usage (from backend/):
+    python benchmarks/bench_fares.py [pairs]
+"""
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+
+os.environ['DISRUPTIONS_FILE'] = ''
+os.environ['ROUTE_CACHE_SIZE'] = '0'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import app
+from transit_graph import INF
+
+network = app.current_network()
+fares = network.fares
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    k = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def tickets(metrics):
+    """A journey's segments as fares.price takes them, one ticket per run
+    of one mode (timing only: walks between segments are ignored)"""
+    legs = []
+    for segment in metrics['segments']:
+        if not legs or legs[-1][0] != segment['mode']:
+            legs.append((segment['mode'], []))
+        legs[-1][1].append((segment['line'], segment['start'], segment['end']))
+    return [segments for _, segments in legs]
+
+
+def check(pairs):
+    graph = network.views.view('all').graph
+    fastest = network.route_tables.get('fastest')
+    mismatches = 0
+    with app.app.test_request_context():
+        for ticket_class in fares.classes:
+            for origin in sorted({src for src, _ in pairs}):
+                s = fastest.index[origin]
+                row = fares.tree_fares(fastest.graph, fastest.tree(s), s, ticket_class)
+                for dest in graph.stations:
+                    if dest == origin:
+                        continue
+                    metrics = app.calculate_path_metrics(fastest.path(origin, dest), ticket_class)
+                    if metrics['total_cost'] != row[fastest.index[dest]]:
+                        mismatches += 1
+                        print(f"MISMATCH {ticket_class} {origin} -> {dest}: journey "
+                              f"{metrics['total_cost']} != tree {row[fastest.index[dest]]}")
+
+            for src, dest in pairs:
+                s, t = graph.index[src], graph.index[dest]
+                fare, _, _ = fares.cheapest(graph, s, t, ticket_class)
+                exact, _, _ = fares.cheapest(graph, s, t, ticket_class, max_labels=None)
+                options = app.find_pareto_routes(src, dest, ticket_class)
+                cheaper = [m['total_cost'] for _, m in options if m['total_cost'] < fare]
+                if fare != exact or cheaper or fare == INF:
+                    mismatches += 1
+                    print(f"MISMATCH {ticket_class} {src} -> {dest}: least fare {fare}, "
+                          f"uncapped {exact}, cheaper options {cheaper}")
+    return mismatches
+
+
+def timings(pairs):
+    graph = network.views.view('all').graph
+    fastest = network.route_tables.get('fastest')
+    client = app.app.test_client()
+    price, tree, search, metrics_us, journey = [], [], [], [], []
+    with app.app.test_request_context():
+        for src, dest in pairs:
+            metrics = app.calculate_path_metrics(fastest.path(src, dest))
+            legs = tickets(metrics)
+
+            start = time.perf_counter()
+            fares.price(legs)
+            price.append((time.perf_counter() - start) * 1e6)
+
+            start = time.perf_counter()
+            app.calculate_path_metrics(metrics['path'])
+            metrics_us.append((time.perf_counter() - start) * 1e6)
+
+            s = fastest.index[src]
+            pred = fastest.tree(s)
+            start = time.perf_counter()
+            fares.tree_fares(fastest.graph, pred, s)
+            tree.append((time.perf_counter() - start) * 1e6)
+
+            start = time.perf_counter()
+            fares.cheapest(graph, graph.index[src], graph.index[dest])
+            search.append((time.perf_counter() - start) * 1e6)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        for src, dest in pairs[:500]:
+            start = time.perf_counter()
+            client.post('/api/journey', json={'from': src, 'to': dest, 'k': 5, 'include': 'all,options'})
+            journey.append((time.perf_counter() - start) * 1e6)
+    return [('price one journey', price), ('calculate_path_metrics', metrics_us),
+            (f'price a tree ({graph.size} fares)', tree), ('least-fare search', search),
+            ('/api/journey, k=5, options', journey)]
+
+
+def main():
+    stations = list(network.graph.nodes())
+    pairs = [(s, t) for s in stations for t in stations if s != t]
+    rng = random.Random(22)
+    sample = rng.sample(pairs, min(len(pairs), int(sys.argv[1]) if len(sys.argv) > 1 else 2000))
+
+    mismatches = check(sample)
+    print(f"Ticket classes: {', '.join(fares.classes)}  pairs: {len(sample)}  mismatches: {mismatches}")
+    print()
+    print(f"{'operation':<32}{'p50 (us)':>12}{'p99 (us)':>12}")
+    for name, samples in timings(sample):
+        print(f"{name:<32}{percentile(samples, 50):>12.1f}{percentile(samples, 99):>12.1f}")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
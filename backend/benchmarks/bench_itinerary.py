@@ -0,0 +1,145 @@
+"""
+Benchmark: /api/itinerary from 3 to 12 waypoints.
+
+For random itineraries of each size (round trips and open-ended ones),
+checks on the leg cost matrix that the exact order is as good as every
+permutation (up to 8 waypoints), and that the response visits every stop
+once with legs matching its order.  Exits non-zero on any mismatch.  Above
+itinerary.EXACT_MAX_STOPS the local search's order is compared with the
+exact one (Held-Karp run here, without a time limit) and the gap reported.
+Then times the request per size, split into leg costs and ordering, next
+to answering the same trip with one /api/journey call per stop pair.
+
+Usage (from backend/):
+    python benchmarks/bench_itinerary.py [trips per size]
+"""
+import contextlib
+import io
+import itertools
+import os
+import random
+import sys
+import time
+
+os.environ['DISRUPTIONS_FILE'] = ''
+os.environ['ROUTE_CACHE_SIZE'] = '0'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import app
+import itinerary
+
+network = app.current_network()
+EPSILON = 1e-9
+SIZES = range(3, 13)
+BRUTE_FORCE_MAX = 8
+PAIRWISE_TRIPS = 3
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    k = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def trips(stations, size, count, rng):
+    for i in range(count):
+        start, *stops = rng.sample(stations, size + 1)
+        profile = ('fastest', 'cheapest', 'comfortable')[i % 3]
+        yield start, sorted(stops), start if i % 2 else None, profile
+
+
+def check_order(start, stops, end, profile):
+    """Mismatches of the exact order on this trip's cost matrix, and the
+    local search's gap to it (None where the order is exact anyway)"""
+    nodes = [start] + stops + ([end] if end not in (None, start) else [])
+    last = None if end is None else nodes.index(end)
+    cost = app.itinerary_costs(profile, nodes[:len(stops) + 1], nodes)
+    indices = list(range(1, len(stops) + 1))
+    best, order = itinerary.held_karp(cost, 0, indices, last)
+    mismatches = 0
+    if abs(itinerary.order_cost(cost, 0, order, last) - best) > EPSILON:
+        mismatches += 1
+        print(f"MISMATCH {start} {stops}: order costs "
+              f"{itinerary.order_cost(cost, 0, order, last)}, reported {best}")
+    if len(stops) <= BRUTE_FORCE_MAX:
+        brute = min(itinerary.order_cost(cost, 0, list(p), last)
+                    for p in itertools.permutations(indices))
+        if abs(brute - best) > EPSILON:
+            mismatches += 1
+            print(f"MISMATCH {start} {stops}: Held-Karp {best}, brute force {brute}")
+    gap = None
+    if len(stops) > itinerary.EXACT_MAX_STOPS:
+        found, _ = itinerary.local_search(cost, 0, indices, last)
+        gap = found / best - 1 if best else 0.0
+    return mismatches, gap
+
+
+def check_response(body, start, stops, end):
+    order = body['order']
+    legs = body['legs']
+    ok = (order[0] == start and sorted(order[1:len(stops) + 1]) == stops
+          and (end is None or order[-1] == end) and len(order) == len(stops) + 1 + (end is not None)
+          and [(leg['from'], leg['to']) for leg in legs] == list(zip(order, order[1:]))
+          and body['total_time'] == sum(leg['total_time'] for leg in legs))
+    if not ok:
+        print(f"MISMATCH {start} {stops} -> {end}: order {order}")
+    return 0 if ok else 1
+
+
+def main():
+    stations = sorted(network.graph.nodes())
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 12
+    rng = random.Random(25)
+    client = app.app.test_client()
+
+    mismatches = 0
+    print(f"{'stops':>5}{'order':>9}{'p50 (ms)':>10}{'p99 (ms)':>10}{'costs':>8}"
+          f"{'order':>8}{'gap':>8}{'pairwise /api/journey':>24}")
+    for size in SIZES:
+        request_ms, costs_ms, order_ms, pairwise_ms, gaps = [], [], [], [], []
+        for i, (start, stops, end, profile) in enumerate(trips(stations, size, count, rng)):
+            with app.app.test_request_context():
+                bad, gap = check_order(start, stops, end, profile)
+                mismatches += bad
+                if gap is not None:
+                    gaps.append(gap)
+
+                nodes = [start] + stops + ([end] if end not in (None, start) else [])
+                t0 = time.perf_counter()
+                cost = app.itinerary_costs(profile, nodes[:size + 1], nodes)
+                t1 = time.perf_counter()
+                itinerary.plan_order(cost, 0, list(range(1, size + 1)),
+                                     None if end is None else nodes.index(end))
+                t2 = time.perf_counter()
+                costs_ms.append((t1 - t0) * 1e3)
+                order_ms.append((t2 - t1) * 1e3)
+
+            body = {'from': start, 'waypoints': stops, 'profile': profile}
+            if end is not None:
+                body['to'] = end
+            with contextlib.redirect_stdout(io.StringIO()):
+                start_t = time.perf_counter()
+                response = client.post('/api/itinerary', json=body)
+                request_ms.append((time.perf_counter() - start_t) * 1e3)
+                if i < PAIRWISE_TRIPS:
+                    start_t = time.perf_counter()
+                    for a, b in itertools.permutations(nodes, 2):
+                        client.post('/api/journey', json={'from': a, 'to': b, 'routeType': profile})
+                    pairwise_ms.append((time.perf_counter() - start_t) * 1e3)
+            mismatches += check_response(response.get_json(), start, stops, end)
+
+        exact = size <= itinerary.EXACT_MAX_STOPS
+        gap = f"{max(gaps):.1%}" if gaps else '-'
+        print(f"{size:>5}{'exact' if exact else 'search':>9}{percentile(request_ms, 50):>10.1f}"
+              f"{percentile(request_ms, 99):>10.1f}{percentile(costs_ms, 50):>8.1f}"
+              f"{percentile(order_ms, 50):>8.1f}{gap:>8}{percentile(pairwise_ms, 50):>21.0f} ms")
+
+    print()
+    print(f"Trips: {count} per size ({len(SIZES) * count} in all)  mismatches: {mismatches}")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
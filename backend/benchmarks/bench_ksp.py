@@ -0,0 +1,82 @@
+"""
+Benchmark: k-shortest alternatives, nx.shortest_simple_paths vs ksp.py.
+
+Runs both on long cross-network pairs (Virar <-> Kasara, Versova <-> Panvel,
+...) plus a random sample of pairs, checks that both return the same path
+costs when de-duplication is off (exits non-zero otherwise), and prints
+p50/p99 latency.
+
+Usage (from backend/):
+    python benchmarks/bench_ksp.py [k] [sample_pairs]
+"""
+from itertools import islice
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import networkx as nx
+
+import app
+from ksp import Budget, k_shortest_paths
+
+network = app.current_network()
+
+LONG_PAIRS = [
+    ("Virar", "Kasara"), ("Kasara", "Virar"), ("Versova", "Panvel"),
+    ("Virar", "Karjat"), ("Dahisar East", "Panvel"), ("Churchgate", "Kasara"),
+]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    k = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def nx_k_shortest(src, dest, k):
+    paths = islice(nx.shortest_simple_paths(network.graph, src, dest, weight='time'), k)
+    return [nx.path_weight(network.graph, path, 'time') for path in paths]
+
+
+def main():
+    k = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    sample = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    graph = network.views.view('all').graph
+    table = network.route_tables.get('fastest')
+    stations = list(network.graph.nodes())
+    rng = random.Random(7)
+    pairs = LONG_PAIRS + [tuple(rng.sample(stations, 2)) for _ in range(sample)]
+
+    def ours(src, dest, dedupe):
+        paths, _ = k_shortest_paths(graph, 'time', src, dest, k, table.row(dest),
+                                    Budget(10 ** 9, 60), dedupe=dedupe)
+        return [cost for cost, _ in paths]
+
+    mismatches = 0
+    for src, dest in pairs:
+        if ours(src, dest, False) != nx_k_shortest(src, dest, k):
+            mismatches += 1
+            print(f"MISMATCH {src} -> {dest}")
+
+    print(f"k={k}  pairs: {len(pairs)} ({len(LONG_PAIRS)} long)  cost mismatches: {mismatches}")
+    print()
+    print(f"{'method':<30}{'p50 (ms)':>10}{'p99 (ms)':>10}{'long max (ms)':>15}")
+    for name, fn in (('nx.shortest_simple_paths', lambda s, t: nx_k_shortest(s, t, k)),
+                     ('yen + table A* (deduped)', lambda s, t: ours(s, t, True))):
+        samples = []
+        for src, dest in pairs:
+            start = time.perf_counter()
+            fn(src, dest)
+            samples.append((time.perf_counter() - start) * 1000)
+        long_max = max(samples[:len(LONG_PAIRS)])
+        print(f"{name:<30}{percentile(samples, 50):>10.2f}{percentile(samples, 99):>10.2f}{long_max:>15.2f}")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""
+Benchmark: line-aware (station, line) routing with charged interchanges.
+
+For every station pair, checks that the A* search guided by the plain
+time table finds the same total as an unguided Dijkstra over the same
+(station, line) states, that the fastest Pareto option and the metrics
+of the route found agree with it, and counts the pairs whose fastest
+route changed once interchanges cost their junction time.  Exits non-zero
+on any mismatch.  Then times a plain table lookup, a plain CSR Dijkstra
+and the line-aware searches per query, and prints a few routes through
+the busiest interchanges.
+
+Usage (from backend/):
+    python benchmarks/bench_line_routing.py [pairs]
+"""
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+
+os.environ['DISRUPTIONS_FILE'] = ''
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import app
+from pareto import pareto_search
+from transit_graph import INF
+
+network = app.current_network()
+EXAMPLES = [('Borivali', 'CSMT'), ('Churchgate', 'Kalyan'), ('Dadar', 'Vashi'),
+            ('Andheri', 'Thane'), ('Kurla', 'Panvel')]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    k = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def state_count(model):
+    """(station, line) states a search can reach: one per line serving each
+    station, plus one for arriving on foot"""
+    graph = model.graph
+    total = 0
+    for v in range(graph.size):
+        lines = set()
+        for e in range(graph.offsets[v], graph.offsets[v + 1]):
+            lines.update(model.edge_lines[e])
+        total += len(lines) + 1
+    return total
+
+
+def bounds(dest):
+    """Lower bounds find_pareto_routes guides the label search with"""
+    return tuple(network.route_tables.get(p).row(dest) for p in ('fastest', 'fare', 'comfortable'))
+
+
+def check(model, fastest, pairs):
+    graph = model.graph
+    mismatches = changed_time = changed_path = 0
+    for src, dest in pairs:
+        s, t = graph.index[src], graph.index[dest]
+        row = fastest.row(dest)
+        total, ids, _ = model.search('time', s, t, row)
+        plain, _, _ = model.search('time', s, t)
+        front = pareto_search(graph, src, dest, app.PARETO_MAX_LABELS, bounds(dest), model)
+        with app.app.test_request_context():
+            metrics = app.calculate_path_metrics([graph.stations[i] for i in ids]) if ids else None
+        ok = (total == plain
+              and (front[0].time if front else INF) == total
+              and (metrics['total_time'] if metrics else INF) == total)
+        if not ok:
+            mismatches += 1
+            print(f"MISMATCH {src} -> {dest}: A* {total}, Dijkstra {plain}, "
+                  f"pareto {front[0].time if front else None}, "
+                  f"metrics {metrics['total_time'] if metrics else None}")
+        if total > row[s]:
+            changed_time += 1
+            if [graph.stations[i] for i in ids] != fastest.path(src, dest):
+                changed_path += 1
+    return mismatches, changed_time, changed_path
+
+
+def timings(model, fastest, pairs):
+    graph = model.graph
+    lookup, dijkstra, astar, states, pareto = [], [], [], [], []
+    for src, dest in pairs:
+        s, t = graph.index[src], graph.index[dest]
+
+        start = time.perf_counter()
+        fastest.path(src, dest)
+        lookup.append((time.perf_counter() - start) * 1e6)
+
+        start = time.perf_counter()
+        graph.dijkstra('time', s, t)
+        dijkstra.append((time.perf_counter() - start) * 1e6)
+
+        start = time.perf_counter()
+        model.search('time', s, t, fastest.row(dest))
+        astar.append((time.perf_counter() - start) * 1e6)
+
+        start = time.perf_counter()
+        model.search('time', s, t)
+        states.append((time.perf_counter() - start) * 1e6)
+
+        start = time.perf_counter()
+        pareto_search(graph, src, dest, app.PARETO_MAX_LABELS, bounds(dest), model)
+        pareto.append((time.perf_counter() - start) * 1e6)
+    return [('table lookup (plain)', lookup), ('csr dijkstra (plain)', dijkstra),
+            ('line-aware dijkstra', states), ('line-aware A*', astar),
+            ('line-aware pareto', pareto)]
+
+
+def main():
+    with app.app.test_request_context():
+        model = app.line_model(network)
+    fastest = network.route_tables.get('fastest')
+    graph = model.graph
+    stations = list(graph.stations)
+    pairs = [(s, t) for s in stations for t in stations if s != t]
+    if len(sys.argv) > 1:
+        pairs = random.Random(21).sample(pairs, min(len(pairs), int(sys.argv[1])))
+
+    print(f"Stations: {graph.size}  lines: {len(model.lines)}  "
+          f"(station, line) states: {state_count(model)}")
+    mismatches, changed_time, changed_path = check(model, fastest, pairs)
+    print(f"Pairs: {len(pairs)}  mismatches: {mismatches}")
+    print(f"Fastest time raised by interchange charges: {changed_time} pairs, "
+          f"{changed_path} of them on a different route")
+    print()
+
+    print(f"{'method':<26}{'p50 (us)':>12}{'p99 (us)':>12}")
+    for name, samples in timings(model, fastest, pairs[:5000]):
+        print(f"{name:<26}{percentile(samples, 50):>12.1f}{percentile(samples, 99):>12.1f}")
+
+    print()
+    with app.app.test_request_context():
+        for src, dest in EXAMPLES:
+            route = app.find_fastest_route(src, dest)
+            if not route:
+                continue
+            legs = ', '.join(f"{seg['line']} x{seg['stops']}" for seg in route['segments'])
+            changes = ', '.join(f"{t['station']} +{t['time']}" for t in route['transfers'])
+            print(f"{src} -> {dest}: {route['total_time']} min ({legs}; changes: {changes or 'none'})")
+
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark: full origin-destination matrix through /api/matrix.
+
+Requests the every-station x every-station matrix for all profiles as
+NDJSON and CSV (serial and with a process pool), checks every row against
+calculate_path_metrics on the same profile's table path (exits non-zero on
+any mismatch; matrix times are ride and walk time, without the line-change
+time journeys are charged), and prints wall time per request including streaming the
+body.
+
+Usage (from backend/):
+    python benchmarks/bench_matrix.py [workers] [repeats]
+"""
+import gc
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app
+from route_table import RouteTables
+
+network = app.current_network()
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    k = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def ride_time(metrics):
+    """Journey time without the time charged for changing lines"""
+    return metrics['total_time'] - sum(t['time'] for t in metrics['transfers']
+                                       if t['to_line'] != 'Transfer')
+
+
+def check(client):
+    """Compare every matrix row with calculate_path_metrics on its route"""
+    body = client.post('/api/matrix', json={'profile': 'all'}).get_data(as_text=True)
+    mismatches = 0
+    rows = 0
+    for line in body.splitlines():
+        row = json.loads(line)
+        rows += 1
+        src, dest = row['from'], row['to']
+        if src == dest:
+            continue
+        path = network.route_tables.path(app.MATRIX_PROFILES[row['profile']], src, dest)
+        metrics = app.calculate_path_metrics(path) if path else None
+        if metrics is None:
+            ok = row['time'] is None
+        else:
+            ok = (row['time'], row['cost'], row['distance']) == \
+                (ride_time(metrics), metrics['total_cost'], metrics['total_distance'])
+        if not ok:
+            mismatches += 1
+            print(f"MISMATCH {row}")
+    return rows, mismatches
+
+
+def main():
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else os.cpu_count() or 1
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    client = app.app.test_client()
+    # Tables of the snapshot are already built; time building fresh ones
+    fresh = RouteTables(network.route_tables.profiles, network.route_tables.hierarchical)
+    start = time.perf_counter()
+    fresh.build_all()
+    print(f"Route tables built in {time.perf_counter() - start:.2f}s")
+
+    rows, mismatches = check(client)
+    # The check leaves thousands of request objects for the collector;
+    # left in place they make every timed request pay for scanning them
+    gc.collect()
+    n = network.graph.number_of_nodes()
+    print(f"Stations: {n}  rows: {rows}  mismatches: {mismatches}")
+    print()
+    print(f"{'request':<32}{'p50 (ms)':>10}{'max (ms)':>10}{'rows/s':>12}")
+    for fmt in ('ndjson', 'csv'):
+        for w in sorted({1, workers}):
+            samples = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                client.post('/api/matrix', json={'profile': 'all', 'format': fmt, 'workers': w}).get_data()
+                samples.append((time.perf_counter() - start) * 1000)
+            p50 = percentile(samples, 50)
+            name = f"all profiles, {fmt}, workers={w}"
+            print(f"{name:<32}{p50:>10.1f}{max(samples):>10.1f}{rows / p50 * 1000:>12.0f}")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark: cost of the /metrics instrumentation.
+
+1. Micro: nanoseconds per histogram observe() and per call through a
+   timed decorator, against a bare function call.
+2. End to end: the same seeded mix of uncached /api/journey requests
+   (ROUTE_CACHE_SIZE=0, so every request runs every stage) through the
+   Flask test client in two fresh processes, METRICS_ENABLED=1 and =0,
+   interleaved over several rounds.
+
+Usage (from backend/):
+    python benchmarks/bench_metrics.py [requests] [rounds]
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+from metrics import Histogram
+
+LOAD = r'''
+import io, contextlib, json, random, sys, time
+with contextlib.redirect_stdout(io.StringIO()):
+    import app
+client = app.app.test_client()
+stations = sorted(app.current_network().graph.nodes())
+rng = random.Random(11)
+pairs = [tuple(rng.sample(stations, 2)) for _ in range(int(sys.argv[1]))]
+for src, dest in pairs[:50]:  # warm up (timetable, code paths)
+    client.post('/api/journey', json={'from': src, 'to': dest})
+samples = []
+for src, dest in pairs:
+    start = time.perf_counter()
+    client.post('/api/journey', json={'from': src, 'to': dest, 'include': 'all'})
+    samples.append(time.perf_counter() - start)
+print(json.dumps(samples))
+'''
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    k = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def per_call_ns(fn, n=200000):
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - start) / n * 1e9
+
+
+def micro():
+    child = Histogram('bench_seconds', 'bench', ['stage']).labels('x')
+
+    def bare():
+        return None
+
+    timed = child.time()(bare)
+    loop = per_call_ns(lambda: None)
+    print(f"{'operation':<32}{'ns/call':>10}")
+    print(f"{'bare function call':<32}{per_call_ns(bare) - loop:>10.0f}")
+    print(f"{'histogram observe()':<32}{per_call_ns(lambda: child.observe(0.0003)) - loop:>10.0f}")
+    print(f"{'call through timed decorator':<32}{per_call_ns(timed) - loop:>10.0f}")
+
+
+def load(requests, enabled):
+    env = dict(os.environ, METRICS_ENABLED=enabled, ROUTE_CACHE_SIZE='0', ROUTING_SNAPSHOT_DIR='')
+    out = subprocess.run([sys.executable, '-c', LOAD, str(requests)], cwd=BACKEND, env=env,
+                         capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    micro()
+    print()
+    results = {'1': [], '0': []}
+    for _ in range(rounds):
+        for enabled in ('1', '0'):
+            results[enabled].extend(load(requests, enabled))
+
+    print(f"Uncached /api/journey requests: {requests} x {rounds} rounds per mode")
+    print(f"{'metrics':<10}{'mean (ms)':>11}{'p50 (ms)':>10}{'p95 (ms)':>10}{'p99 (ms)':>10}")
+    means = {}
+    for enabled, label in (('0', 'off'), ('1', 'on')):
+        samples = results[enabled]
+        means[enabled] = sum(samples) / len(samples)
+        print(f"{label:<10}{means[enabled] * 1000:>11.3f}"
+              + ''.join(f"{percentile(samples, p) * 1000:>10.3f}" for p in (50, 95, 99)))
+    overhead = (means['1'] - means['0']) / means['0'] * 100
+    print(f"\nMean overhead: {(means['1'] - means['0']) * 1e6:.1f} us/request ({overhead:+.1f}%)")
+
+
+if __name__ == '__main__':
+    main()
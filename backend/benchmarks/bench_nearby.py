@@ -0,0 +1,176 @@
+"""
+Benchmark: nearest-station lookup and multi-source journeys from coordinates.
+
+Lookup: for the real stations plus synthetic bus stops scattered over the
+same area (each requested count), times GeoIndex.nearest on random points
+and checks the first 200 answers against a brute-force scan.
+
+Routing: for random origin/destination points near real stations, picks
+the k nearest stations at each end.  The one-search answer
+(TransitGraph.best_link, walks included; the least-fare label search for
+cheapest) is checked against the best of the k x k per-pair searches,
+and both are timed.  The script exits
+non-zero on any mismatch.
+
+Usage (from backend/):
+    python benchmarks/bench_nearby.py [stops] [queries]
+    (stops: comma-separated synthetic stop counts, default 1000,5000,20000)
+"""
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+
+os.environ['DISRUPTIONS_FILE'] = ''
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import app
+from geo_index import GeoIndex
+from transit_graph import INF
+
+network = app.current_network()
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    k = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def area():
+    lats = [lat for lat, _ in network.coordinates.values()]
+    lons = [lon for _, lon in network.coordinates.values()]
+    return min(lats), max(lats), min(lons), max(lons)
+
+
+def random_point(rng, bounds):
+    lat0, lat1, lon0, lon1 = bounds
+    return rng.uniform(lat0, lat1), rng.uniform(lon0, lon1)
+
+
+def near_station(rng, meters=1500):
+    """A random point within about ``meters`` of a random station"""
+    lat, lon = rng.choice(list(network.coordinates.values()))
+    offset = meters / 111320
+    return lat + rng.uniform(-offset, offset), lon + rng.uniform(-offset, offset)
+
+
+def brute_force(index, lat, lon, k, max_meters):
+    ranked = sorted((index.distance(lat, lon, s), s) for s in index.coordinates)
+    return [(s, d) for d, s in ranked if max_meters is None or d <= max_meters][:k]
+
+
+def check_lookup(stops, queries, rng):
+    bounds = area()
+    coordinates = dict(network.coordinates)
+    for i in range(stops):
+        coordinates[f'Bus Stop {i}'] = list(random_point(rng, bounds))
+    index = GeoIndex(coordinates)
+
+    mismatches = 0
+    timings = []
+    for i in range(queries):
+        lat, lon = random_point(rng, bounds)
+        k = rng.choice((1, 3, 5, 10))
+        max_meters = rng.choice((None, 500, app.MAX_WALK_METERS))
+        start = time.perf_counter()
+        found = index.nearest(lat, lon, k, max_meters)
+        timings.append((time.perf_counter() - start) * 1000)
+        if i < 200:
+            mismatches += found != brute_force(index, lat, lon, k, max_meters)
+    return len(coordinates), timings, mismatches
+
+
+def seeds(graph, candidates, factor):
+    return {graph.index[c['station']]: c['minutes'] * factor for c in candidates}
+
+
+def fare_of(graph, path):
+    if path is None:
+        return INF
+    if len(path) == 1:
+        return 0
+    return app.calculate_path_metrics([graph.stations[v] for v in path])['total_cost']
+
+
+def check_fares(graph, starts, ends):
+    """(one search ms, k x k searches ms, mismatch) for the cheapest plan"""
+    start = time.perf_counter()
+    found = fare_of(graph, app.least_fare_link(graph, starts, ends))
+    one = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    best = min(0 if s == t else network.fares.cheapest(graph, s, t)[0]
+               for s in starts for t in ends)
+    pairs = (time.perf_counter() - start) * 1000
+    return one, pairs, found != best
+
+
+def check_routing(queries, k, rng):
+    mismatches = 0
+    one, pairs = [], []
+    with app.app.test_request_context():
+        for _ in range(queries):
+            route_type = rng.choice(tuple(app.PROFILE_SEARCH))
+            graph = network.views.view('all').graph
+            weight = app.PROFILE_SEARCH[route_type][0]
+            factor = app.WALK_WEIGHT.get(weight, 1)
+            origins = app.nearby_candidates(near_station(rng), k, app.MAX_WALK_METERS)
+            destinations = app.nearby_candidates(near_station(rng), k, app.MAX_WALK_METERS)
+            starts = seeds(graph, [c for c in origins if c['station'] in graph.index], factor)
+            ends = seeds(graph, [c for c in destinations if c['station'] in graph.index], factor)
+            if not starts or not ends:
+                continue
+            if route_type == 'cheapest':
+                t_one, t_pairs, bad = check_fares(graph, starts, ends)
+                one.append(t_one)
+                pairs.append(t_pairs)
+                mismatches += bad
+                continue
+
+            start = time.perf_counter()
+            total, _ = graph.best_link(weight, starts, ends)
+            one.append((time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            best = INF
+            for s, walk in starts.items():
+                for t, egress in ends.items():
+                    dist, _ = graph.dijkstra(weight, s, t)
+                    best = min(best, walk + dist[t] + egress)
+            pairs.append((time.perf_counter() - start) * 1000)
+            mismatches += abs(total - best) > 1e-9 if best < INF else total != INF
+    return one, pairs, mismatches
+
+
+def main():
+    sizes = [int(s) for s in sys.argv[1].split(',')] if len(sys.argv) > 1 else [1000, 5000, 20000]
+    queries = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    rng = random.Random(19)
+
+    print(f"{'stops':>8}{'p50 (ms)':>10}{'p99 (ms)':>10}{'max (ms)':>10}{'mismatches':>12}")
+    mismatches = 0
+    for stops in [0] + sizes:
+        total, timings, bad = check_lookup(stops, queries, rng)
+        mismatches += bad
+        print(f"{total:>8}{percentile(timings, 50):>10.3f}{percentile(timings, 99):>10.3f}"
+              f"{max(timings):>10.3f}{bad:>12}")
+
+    print()
+    k = app.NEARBY_CANDIDATES
+    one, pairs, bad = check_routing(max(50, queries // 10), k, rng)
+    mismatches += bad
+    print(f"Journeys from points ({k} candidates per end, {len(one)} queries): "
+          f"one search p50 {percentile(one, 50):.2f} ms, "
+          f"{k}x{k} searches p50 {percentile(pairs, 50):.2f} ms, {bad} mismatches")
+
+    print()
+    print(f"Total mismatches: {mismatches}")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark: one Pareto label search vs the three profile searches.
+
+Checks that the fastest option in every Pareto set matches the
+line-aware fastest search exactly, interchanges charged (exits non-zero
+otherwise), then reports per-pair search time for both approaches and
+the Pareto front sizes.  The three searches are those find_optimal_routes
+runs (line-aware fastest and comfortable A*, capped least-fare search),
+timed with their path metrics, next to the bare Pareto search that
+include=options adds to a /api/journey request.  The Pareto search is
+timed the way find_pareto_routes runs it, with route-table lower bounds.
+
+Usage (from backend/):
+    python benchmarks/bench_pareto.py [max_labels]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app
+from pareto import pareto_search
+
+network = app.current_network()
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    k = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def main():
+    max_labels = int(sys.argv[1]) if len(sys.argv) > 1 else app.PARETO_MAX_LABELS
+    graph = network.views.view('all').graph
+    model = app.line_model(network)
+
+    stations = list(network.graph.nodes())
+    pairs = [(s, t) for s in stations for t in stations if s != t]
+
+    pareto_us = []
+    profiles_us = []
+    front_sizes = []
+    mismatches = 0
+    for src, dest in pairs:
+        start = time.perf_counter()
+        bounds = tuple(network.route_tables.get(p).row(dest)
+                       for p in ('fastest', 'fare', 'comfortable'))
+        front = pareto_search(graph, src, dest, max_labels, bounds, model)
+        pareto_us.append((time.perf_counter() - start) * 1e6)
+        front_sizes.append(len(front))
+
+        start = time.perf_counter()
+        with app.app.test_request_context():
+            app.find_optimal_routes(src, dest)
+        profiles_us.append((time.perf_counter() - start) * 1e6)
+
+        s, t = graph.index[src], graph.index[dest]
+        best, _, _ = model.search('time', s, t, bounds[0])
+
+        if front and front[0].time != best:
+            mismatches += 1
+            print(f"MISMATCH {src} -> {dest}: pareto {front[0].time} != line-aware search {best}")
+
+    print(f"Pairs: {len(pairs)}  max_labels: {max_labels}  fastest-time mismatches: {mismatches}")
+    print(f"Pareto front size: mean {sum(front_sizes) / len(front_sizes):.2f}, max {max(front_sizes)}")
+    print()
+    print(f"{'method':<26}{'p50 (us)':>12}{'p99 (us)':>12}")
+    for name, samples in (('find_optimal_routes', profiles_us), ('1x pareto search', pareto_us)):
+        print(f"{name:<26}{percentile(samples, 50):>12.1f}{percentile(samples, 99):>12.1f}")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
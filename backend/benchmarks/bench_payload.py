@@ -0,0 +1,109 @@
+"""
+Benchmark: /api/journey response size, server time and client parse time,
+full vs compact (JSON, and MessagePack when msgpack is installed).
+
+Runs the same sample of pairs (include=all, the app's own request)
+through the test client with the route cache off, so every request
+computes and serializes its response.  Compact responses are decoded
+against /api/stations/table and checked against the full response
+(same path and totals for every profile; exits non-zero otherwise).
+
+Usage (from backend/):
+    python benchmarks/bench_payload.py [sample_pairs]
+"""
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import time
+
+os.environ['ROUTE_CACHE_SIZE'] = '0'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import app
+
+network = app.current_network()
+
+TOTALS = ('total_time', 'total_cost', 'total_distance', 'avg_comfort', 'num_transfers',
+          'metro_time', 'metro_percentage')
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    k = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def check(full, compact, table):
+    """Compact alternatives decode to the full response's routes"""
+    for profile, route in full['alternatives'].items():
+        index = compact['alternatives'][profile]
+        if route is None or index is None:
+            if route is not index:
+                return False
+            continue
+        row = compact['routes'][index]
+        if [table['stations'][i] for i in row['path']] != route['path']:
+            return False
+        if row['totals'] != [route[key] for key in TOTALS]:
+            return False
+    return True
+
+
+def main():
+    sample = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    stations = sorted(network.graph.nodes())
+    rng = random.Random(3)
+    pairs = [tuple(rng.sample(stations, 2)) for _ in range(sample)]
+    client = app.app.test_client()
+    table = client.get('/api/stations/table').get_json()
+
+    modes = [
+        ('full json', {}, None, json.loads),
+        ('compact json', {'format': 'compact'}, None, json.loads),
+    ]
+    if app.msgpack is not None:
+        modes.append(('compact msgpack', {'format': 'compact'},
+                      {'Accept': app.MSGPACK_MIMETYPE}, app.msgpack.unpackb))
+
+    results, bodies = {}, {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        for name, extra, headers, decode in modes:
+            sizes, server, parse = [], [], []
+            for src, dest in pairs:
+                start = time.perf_counter()
+                response = client.post('/api/journey', headers=headers,
+                                       json={'from': src, 'to': dest, 'include': 'all', **extra})
+                data = response.get_data()
+                server.append((time.perf_counter() - start) * 1000)
+                start = time.perf_counter()
+                body = decode(data)
+                parse.append((time.perf_counter() - start) * 1e6)
+                sizes.append(len(data))
+                bodies.setdefault(name, []).append(body)
+            results[name] = (sizes, server, parse)
+
+    mismatches = sum(
+        not check(full, compact, table)
+        for full, compact in zip(bodies['full json'], bodies['compact json'])
+    )
+
+    print(f"Pairs: {sample}  Station table: {len(json.dumps(table))} bytes "
+          f"(fetched once, version {table['version']})")
+    print()
+    print(f"{'format':<18}{'mean bytes':>12}{'p99 bytes':>11}{'request p50 (ms)':>18}"
+          f"{'parse p50 (us)':>16}")
+    for name, (sizes, server, parse) in results.items():
+        print(f"{name:<18}{sum(sizes) / len(sizes):>12.0f}{percentile(sizes, 99):>11}"
+              f"{percentile(server, 50):>18.3f}{percentile(parse, 50):>16.1f}")
+    print()
+    print(f"Compact vs full mismatches: {mismatches}")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Benchmark: RAPTOR earliest-arrival queries on a dense synthetic timetable.
+
+Every line in app.timetable_lines runs a train every HEADWAY minutes in
+each direction from 05:00 to 01:00 (1,200 trips per direction per pattern
+at the default 1-minute headway), then random station pairs are queried at
+random departure times.
+
+Usage (from backend/):
+    python benchmarks/bench_raptor.py [headway_minutes] [queries]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    k = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def build(headway):
+    return app.build_timetable(app.current_network(), [(300, 1500, headway)])
+
+
+def main():
+    headway = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+    num_queries = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+
+    start = time.perf_counter()
+    timetable = build(headway)
+    build_s = time.perf_counter() - start
+
+    rng = random.Random(42)
+    stations = timetable.stations
+    queries = []
+    while len(queries) < num_queries:
+        src, dest = rng.sample(stations, 2)
+        queries.append((src, dest, rng.randrange(5 * 3600, 22 * 3600)))
+
+    samples = []
+    found = 0
+    for src, dest, depart_at in queries:
+        start = time.perf_counter()
+        journey = timetable.earliest_arrival(src, dest, depart_at)
+        samples.append((time.perf_counter() - start) * 1000)
+        found += journey is not None
+
+    print(f"Headway: {headway} min  Routes: {timetable.num_routes}  Trips: {timetable.num_trips}")
+    print(f"Timetable build: {build_s:.2f} s")
+    print(f"Queries: {num_queries} ({found} reachable)")
+    print(f"p50: {percentile(samples, 50):.2f} ms  p99: {percentile(samples, 99):.2f} ms  "
+          f"max: {max(samples):.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""
+Benchmark: /api/reachable budget-bounded search.
+
+Checks, for every profile and every origin, that an unbounded search
+reports each station with the ride time, fare and line changes of the
+profile's route-table path, or of the least-fare route for cheapest
+(exits non-zero on any mismatch).  Also
+checks that a multi-origin search gives each station its best origin.
+Then times single- and multi-origin searches at several budgets, both the
+search alone and the whole request (route cache off).
+
+Usage (from backend/):
+    python benchmarks/bench_reachable.py [queries]
+"""
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+
+os.environ['ROUTE_CACHE_SIZE'] = '0'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import app
+
+network = app.current_network()
+INF = float('inf')
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    k = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def ride_time(metrics):
+    """Journey time without the time charged for changing lines"""
+    return metrics['total_time'] - sum(t['time'] for t in metrics['transfers']
+                                       if t['to_line'] != 'Transfer')
+
+
+def line_changes(metrics):
+    """Changes of each edge's own line, walking links skipped"""
+    riding, changes = None, 0
+    for edge in metrics['edges']:
+        data = edge['data']
+        if data['mode'] == 'Transfer':
+            continue
+        changes += riding is not None and riding != data['line']
+        riding = data['line']
+    return changes
+
+
+def check(stations):
+    mismatches = 0
+    graph = network.views.view('all').graph
+    for profile in app.PROFILE_SEARCH:
+        table = network.route_tables.get(app.PROFILE_SEARCH[profile][1])
+        for origin in stations:
+            rows = app.find_reachable([origin], profile, {'time': INF})
+            if len(rows) != sum(table.has_path(origin, s) for s in graph.stations):
+                mismatches += 1
+            for station, _, t, cost, transfers in rows:
+                if station == origin:
+                    continue
+                if profile == 'cheapest':
+                    metrics = app.find_min_fare_route(origin, station)
+                else:
+                    metrics = app.calculate_path_metrics(table.path(origin, station))
+                if (t, cost, transfers) != (ride_time(metrics), metrics['total_cost'],
+                                            line_changes(metrics)):
+                    mismatches += 1
+
+    rng = random.Random(5)
+    for _ in range(200):
+        origins = rng.sample(stations, 3)
+        best = {}
+        for origin in origins:
+            for station, _, t, _, _ in app.find_reachable([origin], 'fastest', {'time': 60}):
+                best[station] = min(best.get(station, INF), t)
+        multi = {station: t for station, _, t, _, _ in
+                 app.find_reachable(origins, 'fastest', {'time': 60})}
+        if multi != best:
+            mismatches += 1
+    return mismatches
+
+
+def main():
+    queries = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    stations = sorted(network.graph.nodes())
+    client = app.app.test_client()
+
+    mismatches = check(stations)
+    print(f"Stations: {len(stations)}  Mismatches vs route tables: {mismatches}")
+    print()
+
+    rng = random.Random(9)
+    cases = [
+        ('1 origin, 15 min', 1, {'maxMinutes': 15}),
+        ('1 origin, 45 min', 1, {'maxMinutes': 45}),
+        ('1 origin, 120 min', 1, {'maxMinutes': 120}),
+        ('1 origin, Rs 30 (fare)', 1, {'maxFare': 30}),
+        ('3 origins, 45 min', 3, {'maxMinutes': 45}),
+        ('all origins, 45 min', len(stations), {'maxMinutes': 45}),
+    ]
+    print(f"{'query':<26}{'stations':>10}{'search p50 (us)':>17}{'search p99 (us)':>17}"
+          f"{'request p50 (ms)':>18}")
+    for name, n_origins, budget in cases:
+        profile = 'cheapest' if 'maxFare' in budget else 'fastest'
+        limits = {app.REACH_BUDGETS[k]: v for k, v in budget.items()}
+        search, request, found = [], [], []
+        for _ in range(queries):
+            origins = rng.sample(stations, n_origins)
+            start = time.perf_counter()
+            rows = app.find_reachable(origins, profile, limits)
+            search.append((time.perf_counter() - start) * 1e6)
+            found.append(len(rows))
+            start = time.perf_counter()
+            client.post('/api/reachable', json={'from': origins, 'profile': profile, **budget})
+            request.append((time.perf_counter() - start) * 1000)
+        print(f"{name:<26}{sum(found) / len(found):>10.0f}{percentile(search, 50):>17.1f}"
+              f"{percentile(search, 99):>17.1f}{percentile(request, 50):>18.3f}")
+
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
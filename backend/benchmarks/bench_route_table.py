@@ -0,0 +1,94 @@
+"""
+Benchmark: per-request Dijkstra vs find_optimal_routes.
+
+Runs the three route profiles for every station pair, once the old way
+(three fresh nx.dijkstra_path searches, rebuilding the local-only subgraph
+for the cheapest route, each path priced with calculate_path_metrics) and
+once through find_optimal_routes, the search /api/journey runs (A* on
+route-table bounds and the least-fare search).  Prints p50/p99 latency
+per request and the time to build fresh route tables.  The two do not
+answer the same question: find_optimal_routes also charges line changes
+and searches slab fares over every mode, which the old searches ignored.
+
+Usage (from backend/):
+    python benchmarks/bench_route_table.py
+"""
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ['DISRUPTIONS_FILE'] = ''
+
+import networkx as nx
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import app
+from route_table import RouteTables
+
+network = app.current_network()
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    k = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def dijkstra_per_request(src, dest):
+    """The three searches find_optimal_routes used to run per request"""
+    paths = []
+    try:
+        paths.append(nx.dijkstra_path(network.graph, src, dest, weight='time'))
+    except nx.NetworkXNoPath:
+        paths.append(None)
+    local_edges = [(u, v, d) for u, v, d in network.graph.edges(data=True)
+                   if d['mode'] in ['Local Train', 'Transfer']]
+    G_local = nx.Graph()
+    G_local.add_edges_from(local_edges)
+    try:
+        paths.append(nx.dijkstra_path(G_local, src, dest, weight='cost'))
+    except (nx.NetworkXNoPath, nx.NodeNotFound):
+        paths.append(None)
+    try:
+        paths.append(nx.dijkstra_path(network.graph, src, dest, weight=app.comfort_weight))
+    except nx.NetworkXNoPath:
+        paths.append(None)
+    return [path and app.calculate_path_metrics(path) for path in paths]
+
+
+def run(fn, pairs):
+    samples = []
+    with app.app.test_request_context():
+        for src, dest in pairs:
+            start = time.perf_counter()
+            fn(src, dest)
+            samples.append((time.perf_counter() - start) * 1e6)
+    return samples
+
+
+def main():
+    stations = list(network.graph.nodes())
+    pairs = [(s, t) for s in stations for t in stations if s != t]
+
+    # The import already built the snapshot's tables (or mapped them from
+    # the shared file): time a build of fresh ones over the same graphs
+    fresh = RouteTables(network.route_tables.profiles, network.route_tables.hierarchical)
+    start = time.perf_counter()
+    fresh.build_all()
+    build_ms = (time.perf_counter() - start) * 1000
+
+    print(f"Stations: {len(stations)}  Pairs: {len(pairs)}")
+    print(f"Route table build ({len(fresh.profiles)} profiles): {build_ms:.1f} ms")
+    print()
+    print(f"{'method':<24}{'p50 (us)':>12}{'p99 (us)':>12}")
+    for name, fn in (('dijkstra per request', dijkstra_per_request),
+                     ('find_optimal_routes', app.find_optimal_routes)):
+        samples = run(fn, pairs)
+        print(f"{name:<24}{percentile(samples, 50):>12.1f}{percentile(samples, 99):>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
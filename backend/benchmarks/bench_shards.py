@@ -0,0 +1,100 @@
+"""
+Benchmark: precomputed route shards against /api/journey/all.
+
+Exports the shards of a sample of origins (export_shards.py) and checks
+that every journey a shard resolves matches /api/journey/all field for
+field, and that no destination is missing (exits non-zero on any
+mismatch).  Then reports shard sizes, raw and gzipped as a static host
+serves them, and times resolving a journey from a loaded shard next to an
+uncached /api/journey/all request.
+
+Usage (from backend/):
+    python benchmarks/bench_shards.py [origins]
+"""
+import contextlib
+import gzip
+import io
+import json
+import os
+import random
+import sys
+import time
+
+os.environ['DISRUPTIONS_FILE'] = ''
+os.environ['ROUTE_CACHE_SIZE'] = '0'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import app
+import export_shards
+
+network = app.current_network()
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    k = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def resolve(shard, dest):
+    """A shard's /api/journey/all body for one destination (as shards.js
+    in the client builds it)"""
+    refs = shard['journeys'].get(dest)
+    if refs is None:
+        return None
+    return {profile: dict(zip(export_shards.COLUMNS, shard['routes'][ref]))
+            for profile, ref in zip(export_shards.PROFILES, refs) if ref is not None}
+
+
+def main():
+    stations = app.station_table(network)[0]['stations']
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    origins = random.Random(23).sample(stations, min(len(stations), count))
+    client = app.app.test_client()
+
+    mismatches = 0
+    raw, packed, export_s = [], [], []
+    shard_us, api_us = [], []
+    for origin in origins:
+        start = time.perf_counter()
+        with app.app.test_request_context():
+            shard = export_shards.export_origin(origin, stations)
+        export_s.append(time.perf_counter() - start)
+        shard = {'version': network.version, 'origin': origin, **shard}
+        body = json.dumps(shard, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        raw.append(len(body))
+        packed.append(len(gzip.compress(body)))
+        shard = json.loads(body)
+
+        for dest in stations:
+            if dest == origin:
+                continue
+            start = time.perf_counter()
+            local = resolve(shard, dest)
+            shard_us.append((time.perf_counter() - start) * 1e6)
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                response = client.post('/api/journey/all', json={'from': origin, 'to': dest})
+                api_us.append((time.perf_counter() - start) * 1e6)
+            expected = response.get_json() if response.status_code == 200 else None
+            if local != (expected or None):
+                mismatches += 1
+                print(f"MISMATCH {origin} -> {dest}: shard {local}, api {expected}")
+
+    print(f"Origins: {len(origins)} of {len(stations)}  journeys: {len(shard_us)}  "
+          f"mismatches: {mismatches}")
+    print(f"Shard size: p50 {percentile(raw, 50) / 1024:.0f} KiB raw, "
+          f"{percentile(packed, 50) / 1024:.1f} KiB gzipped (max {max(packed) / 1024:.1f} KiB); "
+          f"full export ~{sum(export_s) / len(export_s) * len(stations):.0f}s")
+    print()
+    print(f"{'journey from':<28}{'p50 (us)':>12}{'p99 (us)':>12}")
+    for name, samples in (('loaded shard', shard_us), ('/api/journey/all', api_us)):
+        print(f"{name:<28}{percentile(samples, 50):>12.1f}{percentile(samples, 99):>12.1f}")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+"""
+Benchmark: single-flight coalescing of identical concurrent journey queries.
+
+Fires bursts of identical /api/journey requests from many threads at once
+(as after a push notification), each burst on a pair the route cache does
+not hold yet.  It runs with single-flight on and off and reports the CPU
+time per burst, the burst's wall time, how many requests were coalesced
+and how many route searches each burst ran.
+Every response in a burst must match the one computed alone, or the script
+exits non-zero.  It also checks that a leader's error reaches every waiter
+and that a waiter past the timeout computes its own result.
+
+Usage (from backend/):
+    python benchmarks/bench_single_flight.py [threads] [bursts]
+"""
+import contextlib
+import io
+import os
+import random
+import sys
+import threading
+import time
+
+os.environ['DISRUPTIONS_FILE'] = ''
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import app
+from route_cache import RouteCache
+from single_flight import SingleFlight
+
+# Duplicate searches running side by side each take longer, and can run out
+# of the k-shortest wall-clock budget and return fewer alternatives.  Lift
+# it (the expansion cap still applies) so bodies can be compared.
+app.KSP_TIME_BUDGET = 60
+QUERY = {'include': 'all,options', 'k': 5}
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    k = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def burst(client, src, dest, threads):
+    """Bodies of ``threads`` identical requests released together"""
+    barrier = threading.Barrier(threads)
+    bodies = [None] * threads
+
+    def run(i):
+        barrier.wait()
+        response = client.post('/api/journey', json=dict(QUERY, **{'from': src, 'to': dest}))
+        bodies[i] = (response.status_code, response.get_data())
+
+    workers = [threading.Thread(target=run, args=(i,)) for i in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return bodies
+
+
+def run_bursts(client, pairs, threads, enabled, expected):
+    app.SINGLE_FLIGHT = enabled
+    before = app.single_flight.stats()
+    misses = app.route_cache.misses
+    cpu, wall, mismatches = [], [], 0
+    for src, dest in pairs:
+        app.route_cache.clear()
+        start_cpu, start = time.process_time(), time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            bodies = burst(client, src, dest, threads)
+        cpu.append((time.process_time() - start_cpu) * 1000)
+        wall.append((time.perf_counter() - start) * 1000)
+        mismatches += sum(body != expected[(src, dest)] for body in bodies)
+    coalesced = app.single_flight.stats()['coalesced'] - before['coalesced']
+    # Cache misses that did not wait for a leader ran the search themselves
+    computed = app.route_cache.misses - misses - coalesced
+    return cpu, wall, coalesced, computed / len(pairs), mismatches
+
+
+def check_semantics():
+    """Errors reach every waiter; a waiter past the timeout computes alone"""
+    problems = 0
+    flight = SingleFlight(timeout=5)
+    release = threading.Event()
+    outcomes = []
+
+    def failing():
+        release.wait()
+        raise ValueError('boom')
+
+    def call():
+        try:
+            flight.do('key', failing)
+            outcomes.append('ok')
+        except ValueError:
+            outcomes.append('error')
+
+    workers = [threading.Thread(target=call) for _ in range(5)]
+    for t in workers:
+        t.start()
+    while flight.stats()['waiting'] < 4:
+        time.sleep(0.001)
+    release.set()
+    for t in workers:
+        t.join()
+    problems += outcomes != ['error'] * 5 or flight.stats()['errors'] != 4
+
+    flight = SingleFlight(timeout=0.05)
+    release.clear()
+    slow = threading.Thread(target=lambda: flight.do('key', lambda: release.wait() and 'leader'))
+    slow.start()
+    while flight.stats()['in_flight'] < 1:
+        time.sleep(0.001)
+    problems += flight.do('key', lambda: 'own') != 'own' or flight.stats()['timeouts'] != 1
+    release.set()
+    slow.join()
+    return problems
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    bursts = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    client = app.app.test_client()
+    rng = random.Random(20)
+    stations = sorted(app.current_network().graph.nodes())
+    pairs = [tuple(rng.sample(stations, 2)) for _ in range(bursts)]
+
+    # Each pair computed alone, with no cache
+    live = app.route_cache
+    app.route_cache = RouteCache(0)
+    expected = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        for src, dest in pairs:
+            response = client.post('/api/journey', json=dict(QUERY, **{'from': src, 'to': dest}))
+            expected[(src, dest)] = (response.status_code, response.get_data())
+    app.route_cache = live
+
+    print(f"Bursts: {bursts} x {threads} identical requests (cache cold per burst)")
+    print()
+    print(f"{'single-flight':<15}{'CPU p50 (ms)':>14}{'CPU p99 (ms)':>14}"
+          f"{'wall p50 (ms)':>15}{'coalesced':>11}{'searches/burst':>16}{'mismatches':>12}")
+    mismatches = 0
+    for enabled in (False, True):
+        cpu, wall, coalesced, computed, bad = run_bursts(client, pairs, threads, enabled, expected)
+        mismatches += bad
+        print(f"{'on' if enabled else 'off':<15}{percentile(cpu, 50):>14.1f}{percentile(cpu, 99):>14.1f}"
+              f"{percentile(wall, 50):>15.1f}{coalesced:>11}{computed:>16.1f}{bad:>12}")
+
+    problems = check_semantics()
+    print()
+    print(f"Mismatches: {mismatches}  Error/timeout semantics problems: {problems}")
+    if mismatches or problems:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
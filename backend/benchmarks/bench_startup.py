@@ -0,0 +1,127 @@
+"""
+Benchmark: worker boot time and memory, private vs memory-mapped routing.
+
+Starts WORKERS processes at once, each importing app the way a gunicorn
+worker does and then reading every route table and view (as a busy worker
+eventually would), and reports per-worker boot time and memory while all
+of them are alive:
+
+- private:       ROUTING_SNAPSHOT_DIR='' (each worker builds its own tables)
+- shared, cold:  empty snapshot directory (one worker builds, all map it)
+- shared, warm:  snapshot file already present (every worker just maps it)
+
+RSS counts shared pages in full in every worker; PSS splits them between
+the processes mapping them, so its total is the real footprint.  With a
+GRID argument the network is a synthetic GRID x GRID lattice of lines
+(e.g. 30 -> 900 stations), where the tables dominate memory.
+
+Usage (from backend/):
+    python benchmarks/bench_startup.py [workers] [grid]
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORKER = r'''
+import json, sys, time
+start = time.perf_counter()
+import app
+boot = time.perf_counter() - start
+net = app.current_network()
+for profile in app.ROUTE_PROFILES:
+    table = net.route_tables.get(profile)
+    sum(table.pred)
+    sum(x for x in table.dist if x != float('inf'))
+print(json.dumps({'boot': boot}), flush=True)
+sys.stdin.readline()
+memory = {}
+try:
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                memory[parts[0].rstrip(':')] = int(parts[1])
+except OSError:
+    import resource
+    memory['Rss'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps(memory), flush=True)
+'''
+
+
+def grid_network(size):
+    """Synthetic lattice: each row a local line, each column a metro line"""
+    name = lambda r, c: f"R{r:03d}C{c:03d}"
+    lines = []
+    for r in range(size):
+        lines.append({'name': f'Row {r}', 'mode': 'Local Train', 'time': 3, 'cost': 5,
+                      'comfort': 5, 'distance': 2.0,
+                      'stations': [name(r, c) for c in range(size)]})
+    for c in range(size):
+        lines.append({'name': f'Column {c}', 'mode': 'Metro', 'time': 2, 'cost': 20,
+                      'comfort': 10, 'distance': 2.0,
+                      'stations': [name(r, c) for r in range(size)]})
+    return {'format': 1, 'version': f'grid-{size}', 'lines': lines,
+            'interchanges': [], 'overrides': [], 'aliases': {}}
+
+
+def run(workers, env):
+    procs = [
+        subprocess.Popen([sys.executable, '-c', WORKER], cwd=BACKEND, env=env,
+                         stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+        for _ in range(workers)
+    ]
+    boots = [json.loads(p.stdout.readline())['boot'] for p in procs]
+    # Every worker is up and has touched its tables: measure them together
+    for p in procs:
+        p.stdin.write('\n')
+        p.stdin.flush()
+    memory = [json.loads(p.stdout.readline()) for p in procs]
+    for p in procs:
+        p.wait()
+    return boots, memory
+
+
+def main():
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    grid = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+
+    base_env = dict(os.environ)
+    with tempfile.TemporaryDirectory() as tmp:
+        if grid:
+            path = os.path.join(tmp, 'grid.json')
+            with open(path, 'w') as f:
+                json.dump(grid_network(grid), f)
+            base_env['NETWORK_FILE'] = path
+            print(f"Network: {grid}x{grid} grid ({grid * grid} stations)")
+        else:
+            print("Network: data/network.json")
+        shared = os.path.join(tmp, 'snapshots')
+
+        modes = [
+            ('private', {'ROUTING_SNAPSHOT_DIR': ''}),
+            ('shared, cold', {'ROUTING_SNAPSHOT_DIR': shared}),
+            ('shared, warm', {'ROUTING_SNAPSHOT_DIR': shared}),
+        ]
+        print(f"Workers: {workers}")
+        print()
+        print(f"{'mode':<15}{'boot max (s)':>13}{'boot mean (s)':>14}"
+              f"{'RSS/worker (MiB)':>18}{'PSS total (MiB)':>17}")
+        for name, extra in modes:
+            boots, memory = run(workers, {**base_env, **extra})
+            rss = sum(m.get('Rss', 0) for m in memory) / len(memory) / 1024
+            pss = sum(m.get('Pss', 0) for m in memory) / 1024
+            print(f"{name:<15}{max(boots):>13.3f}{sum(boots) / len(boots):>14.3f}"
+                  f"{rss:>18.1f}{pss:>17.1f}")
+        files = [f for f in os.listdir(shared) if f.endswith('.snap')]
+        if files:
+            size = os.path.getsize(os.path.join(shared, files[0])) / 1024
+            print()
+            print(f"Shared snapshot file: {size:.0f} KiB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,439 @@
+"""
+Benchmark suite: load replay plus routing micro-benchmarks, as JSON.
+
+1. Load replay: a seeded trace of API requests, replayed through the Flask
+   test client in this process (default) or against a local gunicorn
+   started with --gunicorn WORKERS (--concurrency client threads).
+   Origins and destinations follow a Zipf distribution over stations
+   ranked by degree, so interchanges (Dadar, Andheri, Thane, ...) get most
+   of the traffic.  Most requests are /api/journey in every routeType,
+   some with include=all or k=3, mixed with timetable queries and station
+   autocomplete.  Reports throughput, p50/p95/p99 latency, status codes
+   and peak RSS.  In gunicorn mode peak RSS is the sum over the master
+   and workers, so shared pages are counted once per process.
+2. Micro: every routing function over every station pair (or a seeded
+   sample with --pairs), then the long pathological pairs (Virar ->
+   Kasara, Versova -> Panvel, ...) --repeat times each.
+
+The results are written to --output as JSON, '-' meaning stdout with the
+table on stderr.  They record the commit, Python version, network version
+and parameters, plus a flat "summary" of the headline figures, so runs on
+different commits can be compared.  The run fails (exit 1) if the
+replay gets any 5xx response.  With --baseline it also fails if a summary
+latency or peak RSS grew, or throughput fell, by more than --threshold
+(default 25%) against the baseline file's summary.  Latency changes
+under NOISE_FLOOR_US are ignored.
+
+Usage (from backend/):
+    python benchmarks/bench_suite.py [--requests N] [--gunicorn WORKERS]
+        [--pairs N] [--output FILE] [--baseline FILE] [--threshold 0.25]
+"""
+import argparse
+from collections import Counter
+import contextlib
+import http.client
+import io
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlencode
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import app
+
+network = app.current_network()
+
+LONG_PAIRS = [
+    ("Virar", "Kasara"), ("Kasara", "Virar"),
+    ("Versova", "Panvel"), ("Panvel", "Versova"),
+]
+
+# Latency differences below this are timer noise, not regressions
+NOISE_FLOOR_US = 2.0
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    k = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def summarize(samples_us):
+    return {
+        'count': len(samples_us),
+        'mean_us': round(sum(samples_us) / len(samples_us), 2),
+        'p50_us': round(percentile(samples_us, 50), 2),
+        'p95_us': round(percentile(samples_us, 95), 2),
+        'p99_us': round(percentile(samples_us, 99), 2),
+    }
+
+
+def commit():
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], cwd=BACKEND,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# ===================== LOAD REPLAY =====================
+
+def make_trace(count, seed, skew):
+    """Seeded (method, path, json body) requests with Zipf-skewed stations"""
+    graph = network.graph
+    stations = sorted(graph.nodes(), key=lambda s: (-graph.degree(s), s))
+    weights = [1 / (rank + 1) ** skew for rank in range(len(stations))]
+    rng = random.Random(seed)
+    trace = []
+    while len(trace) < count:
+        roll = rng.random()
+        if roll < 0.10:
+            name = rng.choices(stations, weights)[0]
+            query = urlencode({'q': name[:rng.randint(2, 5)]})
+            trace.append(('GET', f'/api/stations/search?{query}', None))
+            continue
+        src, dest = rng.choices(stations, weights, k=2)
+        if src == dest:
+            continue
+        if roll < 0.15:
+            depart = f'{rng.randint(6, 22):02d}:{rng.randrange(0, 60, 5):02d}'
+            trace.append(('POST', '/api/journey/timetable',
+                          {'from': src, 'to': dest, 'departAt': depart}))
+            continue
+        body = {'from': src, 'to': dest,
+                'routeType': rng.choices(('fastest', 'cheapest', 'comfortable'), (6, 3, 1))[0]}
+        if rng.random() < 0.3:
+            body['include'] = 'all'
+        if rng.random() < 0.05:
+            body['k'] = 3
+        trace.append(('POST', '/api/journey', body))
+    return trace
+
+
+def replay_client(trace, warmup):
+    client = app.app.test_client()
+    samples, statuses = [], Counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for method, path, body in warmup:
+            client.open(path, method=method, json=body).get_data()
+        start = time.perf_counter()
+        for method, path, body in trace:
+            t = time.perf_counter()
+            response = client.open(path, method=method, json=body)
+            response.get_data()
+            samples.append(time.perf_counter() - t)
+            statuses[response.status_code] += 1
+    wall = time.perf_counter() - start
+    peak_rss = None
+    if resource is not None:
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return samples, statuses, wall, peak_rss
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _process_tree(pid):
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            children = [int(c) for c in f.read().split()]
+    except OSError:
+        children = []
+    return [pid] + [p for c in children for p in _process_tree(c)]
+
+
+def _peak_rss_mib(pids):
+    total = 0
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/status') as f:
+                for line in f:
+                    if line.startswith('VmHWM:'):
+                        total += int(line.split()[1])
+        except OSError:
+            return None
+    return total / 1024
+
+
+def _send(conn, method, path, body):
+    payload = json.dumps(body) if body is not None else None
+    headers = {'Content-Type': 'application/json'} if body is not None else {}
+    conn.request(method, path, body=payload, headers=headers)
+    response = conn.getresponse()
+    response.read()
+    return response.status
+
+
+def replay_gunicorn(trace, warmup, workers, concurrency):
+    port = _free_port()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--workers', str(workers),
+         '--bind', f'127.0.0.1:{port}', '--log-level', 'warning', 'app:app'],
+        cwd=BACKEND, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + 120
+        while True:
+            try:
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+                _send(conn, 'GET', '/api/health', None)
+                break
+            except OSError:
+                if time.monotonic() > deadline or server.poll() is not None:
+                    raise RuntimeError('gunicorn did not start')
+                time.sleep(0.2)
+        for method, path, body in warmup:
+            _send(conn, method, path, body)
+        conn.close()
+
+        samples, statuses = [], Counter()
+        lock = threading.Lock()
+        order = iter(trace)
+
+        def client():
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+            local, codes = [], Counter()
+            while True:
+                with lock:
+                    item = next(order, None)
+                if item is None:
+                    break
+                t = time.perf_counter()
+                codes[_send(conn, *item)] += 1
+                local.append(time.perf_counter() - t)
+            conn.close()
+            with lock:
+                samples.extend(local)
+                statuses.update(codes)
+
+        threads = [threading.Thread(target=client) for _ in range(concurrency)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        wall = time.perf_counter() - start
+        peak_rss = _peak_rss_mib(_process_tree(server.pid))
+    finally:
+        server.terminate()
+        server.wait()
+    return samples, statuses, wall, peak_rss
+
+
+def run_load(args):
+    trace = make_trace(args.warmup + args.requests, args.seed, args.skew)
+    warmup, trace = trace[:args.warmup], trace[args.warmup:]
+    if args.gunicorn:
+        samples, statuses, wall, peak_rss = replay_gunicorn(
+            trace, warmup, args.gunicorn, args.concurrency)
+        target = f'gunicorn x{args.gunicorn}, {args.concurrency} clients'
+    else:
+        samples, statuses, wall, peak_rss = replay_client(trace, warmup)
+        target = 'test client'
+    ms = [s * 1000 for s in samples]
+    return {
+        'target': target,
+        'requests': len(samples),
+        'throughput_rps': round(len(samples) / wall, 1),
+        'p50_ms': round(percentile(ms, 50), 3),
+        'p95_ms': round(percentile(ms, 95), 3),
+        'p99_ms': round(percentile(ms, 99), 3),
+        'peak_rss_mib': round(peak_rss, 1) if peak_rss is not None else None,
+        'status': {str(code): n for code, n in sorted(statuses.items())},
+        'server_errors': sum(n for code, n in statuses.items() if code >= 500),
+    }
+
+
+# ===================== MICRO-BENCHMARKS =====================
+
+def micro_functions(pairs):
+    """(name, fn(src, dest)) for each routing function"""
+    paths, metrics = {}, {}
+    for src, dest in pairs:
+        paths[src, dest] = network.route_tables.path('fastest', src, dest)
+        metrics[src, dest] = app.calculate_path_metrics(paths[src, dest])
+    return [
+        ('find_fastest_route', app.find_fastest_route),
+        ('find_min_fare_route', app.find_min_fare_route),
+        ('find_comfortable_route', app.find_comfortable_route),
+        ('find_pareto_routes', app.find_pareto_routes),
+        ('find_optimal_routes', app.find_optimal_routes),
+        ('find_k_routes', lambda s, d: app.find_k_routes(s, d, 'fastest', 3)),
+        ('calculate_path_metrics', lambda s, d: app.calculate_path_metrics(paths[s, d])),
+        ('format_route_instructions', lambda s, d: app.format_route_instructions(metrics[s, d])),
+    ]
+
+
+def time_calls(fn, pairs, repeat=1):
+    samples = []
+    for src, dest in pairs:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn(src, dest)
+            samples.append((time.perf_counter() - start) * 1e6)
+    return samples
+
+
+def run_micro(args):
+    stations = sorted(network.graph.nodes())
+    pairs = [(s, t) for s in stations for t in stations if s != t]
+    if args.pairs and args.pairs < len(pairs):
+        pairs = random.Random(args.seed).sample(pairs, args.pairs)
+    long_pairs = [(s, t) for s, t in LONG_PAIRS if s in network.graph and t in network.graph]
+
+    functions = micro_functions(pairs + long_pairs)
+    results = {'pairs': len(pairs), 'repeat': args.repeat, 'functions': {}, 'long_pairs': {}}
+    with contextlib.redirect_stdout(io.StringIO()):
+        for name, fn in functions:
+            results['functions'][name] = summarize(time_calls(fn, pairs))
+        for src, dest in long_pairs:
+            results['long_pairs'][f'{src}->{dest}'] = {
+                name: summarize(time_calls(fn, [(src, dest)], args.repeat))
+                for name, fn in functions
+            }
+    return results
+
+
+# ===================== REPORT & REGRESSION CHECK =====================
+
+def flat_summary(results):
+    """{key: value} of every figure the regression check compares (tail
+    percentiles of single calls are too noisy to gate on; they stay in the
+    full results)"""
+    summary = {}
+    load = results['load']
+    for key in ('throughput_rps', 'p50_ms', 'p95_ms', 'peak_rss_mib'):
+        if load[key] is not None:
+            summary[f'load.{key}'] = load[key]
+    for name, stats in results['micro']['functions'].items():
+        summary[f'micro.{name}.p50_us'] = stats['p50_us']
+    for pair, functions in results['micro']['long_pairs'].items():
+        for name, stats in functions.items():
+            summary[f'long.{pair}.{name}.p50_us'] = stats['p50_us']
+    return summary
+
+
+def regressions(summary, baseline, threshold):
+    found = []
+    for key, value in summary.items():
+        base = baseline.get(key)
+        if not base:
+            continue
+        if key.endswith('_rps'):
+            change = (base - value) / base
+        else:
+            change = (value - base) / base
+            if key.endswith('_us') and value - base < NOISE_FLOOR_US:
+                continue
+        if change > threshold:
+            found.append((key, base, value, change))
+    return found
+
+
+def print_report(results, out):
+    load = results['load']
+    print(f"Commit: {results['commit']}  Python {results['python']}  "
+          f"network {results['network_version']}", file=out)
+    print(f"\nLoad replay ({load['target']}): {load['requests']} requests", file=out)
+    print(f"  throughput {load['throughput_rps']} req/s  p50 {load['p50_ms']} ms  "
+          f"p95 {load['p95_ms']} ms  p99 {load['p99_ms']} ms  peak RSS {load['peak_rss_mib']} MiB",
+          file=out)
+    print(f"  status codes: {load['status']}", file=out)
+
+    micro = results['micro']
+    print(f"\nRouting functions over {micro['pairs']} pairs", file=out)
+    print(f"{'function':<28}{'mean (us)':>11}{'p50 (us)':>11}{'p95 (us)':>11}{'p99 (us)':>11}",
+          file=out)
+    for name, stats in micro['functions'].items():
+        print(f"{name:<28}{stats['mean_us']:>11.1f}{stats['p50_us']:>11.1f}"
+              f"{stats['p95_us']:>11.1f}{stats['p99_us']:>11.1f}", file=out)
+    for pair, functions in micro['long_pairs'].items():
+        print(f"\n{pair} (p50 of {micro['repeat']} runs)", file=out)
+        for name, stats in functions.items():
+            print(f"  {name:<26}{stats['p50_us']:>11.1f} us", file=out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Routing benchmark and load-replay suite')
+    parser.add_argument('--requests', type=int, default=3000, help='replayed requests')
+    parser.add_argument('--warmup', type=int, default=200, help='unrecorded requests first')
+    parser.add_argument('--skew', type=float, default=1.0, help='Zipf exponent for stations')
+    parser.add_argument('--gunicorn', type=int, default=0, metavar='WORKERS',
+                        help='replay against a local gunicorn instead of the test client')
+    parser.add_argument('--concurrency', type=int, default=4, help='client threads (gunicorn)')
+    parser.add_argument('--pairs', type=int, default=0, help='sample this many pairs (0 = all)')
+    parser.add_argument('--repeat', type=int, default=50, help='runs per long pair')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', default='-', help="JSON results file ('-' = stdout)")
+    parser.add_argument('--baseline', help='results JSON from an earlier run to compare with')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='allowed relative regression (0.25 = 25%%)')
+    args = parser.parse_args()
+
+    results = {
+        'commit': commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'network_version': network.version,
+        'stations': network.graph.number_of_nodes(),
+        'params': {k: getattr(args, k) for k in
+                   ('requests', 'warmup', 'skew', 'gunicorn', 'concurrency', 'pairs', 'repeat', 'seed')},
+    }
+    # Load first, so peak RSS is what serving needs (not the micro fixtures)
+    results['load'] = run_load(args)
+    results['micro'] = run_micro(args)
+    results['summary'] = flat_summary(results)
+
+    report = sys.stderr if args.output == '-' else sys.stdout
+    print_report(results, report)
+    if args.output == '-':
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}", file=report)
+
+    failed = False
+    if results['load']['server_errors']:
+        print(f"\nFAIL: {results['load']['server_errors']} server errors in the replay",
+              file=report)
+        failed = True
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        found = regressions(results['summary'], baseline.get('summary', {}), args.threshold)
+        print(f"\nCompared with {args.baseline} ({baseline.get('commit')}), "
+              f"threshold {args.threshold:.0%}", file=report)
+        for key in ('params', 'cpus', 'python', 'network_version'):
+            if baseline.get(key) != results[key]:
+                print(f"  warning: {key} differs from the baseline run", file=report)
+        for key, base, value, change in found:
+            print(f"  REGRESSION {key}: {base} -> {value} ({change:+.0%})", file=report)
+        if found:
+            failed = True
+        else:
+            print("  no regressions", file=report)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
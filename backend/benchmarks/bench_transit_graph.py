@@ -0,0 +1,87 @@
+"""
+Benchmark: networkx Dijkstra vs the CSR TransitGraph engine.
+
+Reports per-query CPU time over every station pair and profile, and the
+memory held by each graph form.  That both return the same paths is
+checked by tests/test_transit_graph.py.
+
+Usage (from backend/):
+    python benchmarks/bench_transit_graph.py
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import networkx as nx
+
+import app
+from transit_graph import TransitGraph
+
+network = app.current_network()
+
+
+def nx_profiles():
+    return {
+        'fastest': (network.graph, 'time'),
+        'fare': (network.graph, 'cost'),
+        'comfortable': (network.graph, app.comfort_weight),
+    }
+
+
+def csr_profiles():
+    return {
+        'fastest': (network.views.view('all').graph, 'time'),
+        'fare': (network.views.view('all').graph, 'cost'),
+        'comfortable': (network.views.view('all').graph, 'comfort'),
+    }
+
+
+def nx_path(graph, weight, src, dest):
+    try:
+        return nx.dijkstra_path(graph, src, dest, weight=weight)
+    except (nx.NetworkXNoPath, nx.NodeNotFound):
+        return None
+
+
+def time_queries(fn, pairs):
+    start = time.perf_counter()
+    for src, dest in pairs:
+        fn(src, dest)
+    return (time.perf_counter() - start) / len(pairs) * 1e6
+
+
+def measure_memory(build):
+    tracemalloc.start()
+    obj = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del obj
+    return size / 1024
+
+
+def main():
+    stations = list(network.graph.nodes())
+    pairs = [(s, t) for s in stations for t in stations]
+
+    reference = nx_profiles()
+    engine = csr_profiles()
+    print(f"{'profile':<14}{'networkx (us)':>16}{'csr (us)':>12}")
+    for profile in reference:
+        graph, weight = reference[profile]
+        tg, tg_weight = engine[profile]
+        nx_us = time_queries(lambda s, t: nx_path(graph, weight, s, t), pairs)
+        csr_us = time_queries(lambda s, t: tg.shortest_path(tg_weight, s, t), pairs)
+        print(f"{profile:<14}{nx_us:>16.1f}{csr_us:>12.1f}")
+
+    edges = list(network.graph.edges(data=True))
+    nx_kb = measure_memory(lambda: nx.Graph(edges))
+    csr_kb = measure_memory(lambda: TransitGraph.from_networkx(network.graph, app.ROUTING_WEIGHTS))
+    print()
+    print(f"Graph memory: networkx {nx_kb:.1f} KiB, csr {csr_kb:.1f} KiB")
+
+
+if __name__ == '__main__':
+    main()
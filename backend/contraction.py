@@ -0,0 +1,294 @@
+"""
+Contraction hierarchies for networks too large for all-pairs route tables.
+
+RouteTable keeps every shortest-path tree, which is O(stations^2) memory
+and build time: fine for the ~150-station rail network, impossible once
+bus stops and walking links take it to tens of thousands of nodes.  A
+contraction hierarchy is built once per profile instead.  Stations are
+removed ("contracted") one at a time, least important first, and a
+shortcut edge is added between two neighbours of a removed station
+whenever the only shortest path between them ran through it.  Each
+station keeps its edges to stations contracted after it (its "upward"
+edges, original or shortcut).
+
+A query then runs Dijkstra upward from both ends over those edges only
+and meets at the most important station on the route, settling a few
+hundred nodes where a plain Dijkstra settles most of the graph.  Every
+shortcut remembers the station it bypasses, so the result is unpacked
+back into the full station path calculate_path_metrics expects.
+
+Distances are exact.  When several paths tie, the one returned can differ
+from the plain Dijkstra's choice.
+"""
+from array import array
+from heapq import heapify, heappush, heappop
+
+from transit_graph import INF, NO_STATION
+
+# Nodes a witness search may settle before giving up (adding a shortcut
+# that might not be needed is always safe, just slower to query)
+WITNESS_SETTLE_LIMIT = 60
+
+
+def _witness_distances(adj, source, skip, targets, max_dist, limit):
+    """Distances from source in the remaining graph without ``skip``;
+    stops once every station in ``targets`` is settled"""
+    dist = {source: 0}
+    heap = [(0, source)]
+    settled = 0
+    remaining = len(targets)
+    while heap:
+        d, x = heappop(heap)
+        if d > dist[x]:
+            continue
+        if d > max_dist or settled >= limit:
+            break
+        settled += 1
+        if x in targets:
+            remaining -= 1
+            if not remaining:
+                break
+        for y, (w, _) in adj[x].items():
+            if y == skip:
+                continue
+            nd = d + w
+            if nd < dist.get(y, INF):
+                dist[y] = nd
+                heappush(heap, (nd, y))
+    return dist
+
+
+def _shortcuts(adj, v, limit):
+    """(u, x, weight) shortcuts contracting v would need"""
+    neighbours = list(adj[v].items())
+    needed = []
+    for i, (u, (wu, _)) in enumerate(neighbours):
+        others = neighbours[i + 1:]
+        if not others:
+            break
+        max_dist = wu + max(w for _, (w, _) in others)
+        dist = _witness_distances(adj, u, v, {x for x, _ in others}, max_dist, limit)
+        for x, (wx, _) in others:
+            via = wu + wx
+            if dist.get(x, INF) > via:
+                needed.append((u, x, via))
+    return needed
+
+
+class ContractionHierarchy:
+    """Shortest paths for one weight profile via a contraction hierarchy.
+
+    Answers the same queries as RouteTable (``path``, ``has_path``,
+    ``row``, ``tree``) over the same TransitGraph station IDs.  The
+    upward graph is CSR like TransitGraph: the upward edges of station v
+    are slots ``offsets[v]:offsets[v + 1]`` of ``targets`` / ``weight`` /
+    ``middle`` (the bypassed station of a shortcut, NO_STATION for an
+    original edge).
+    """
+
+    def __init__(self, graph, weight, witness_limit=WITNESS_SETTLE_LIMIT):
+        n = graph.size
+        w = graph.weights[weight]
+        offsets = graph.offsets
+        targets = graph.targets
+
+        # Remaining graph: neighbour -> (weight, bypassed station)
+        adj = [{} for _ in range(n)]
+        for v in range(n):
+            for e in range(offsets[v], offsets[v + 1]):
+                u = targets[e]
+                if u == v:
+                    continue
+                current = adj[v].get(u)
+                if current is None or w[e] < current[0]:
+                    adj[v][u] = (w[e], NO_STATION)
+
+        contracted_neighbours = [0] * n
+
+        def priority(v, shortcuts):
+            # Edge difference plus how much of the neighbourhood is gone,
+            # which spreads contraction evenly over the graph
+            return len(shortcuts) - len(adj[v]) + contracted_neighbours[v]
+
+        heap = [(priority(v, _shortcuts(adj, v, witness_limit)), v) for v in range(n)]
+        heapify(heap)
+
+        rank = array('i', [0]) * n
+        upward = [None] * n
+        order = 0
+        while heap:
+            _, v = heappop(heap)
+            shortcuts = _shortcuts(adj, v, witness_limit)
+            p = priority(v, shortcuts)
+            if heap and p > heap[0][0]:
+                heappush(heap, (p, v))
+                continue
+
+            rank[v] = order
+            order += 1
+            upward[v] = sorted(adj[v].items())
+            for u in adj[v]:
+                del adj[u][v]
+                contracted_neighbours[u] += 1
+            for u, x, via in shortcuts:
+                current = adj[u].get(x)
+                if current is None or via < current[0]:
+                    adj[u][x] = (via, v)
+                    adj[x][u] = (via, v)
+            adj[v] = None
+
+        self.offsets = array('i', [0])
+        self.targets = array('i')
+        self.weight = array('d')
+        self.middle = array('i')
+        for v in range(n):
+            for u, (wu, m) in upward[v]:
+                self.targets.append(u)
+                self.weight.append(wu)
+                self.middle.append(m)
+            self.offsets.append(len(self.targets))
+        self.rank = rank
+        self._attach(graph, weight)
+
+    @classmethod
+    def from_arrays(cls, graph, weight_name, rank, offsets, targets, weight, middle):
+        """Wrap a prebuilt upward graph for graph's ``weight_name`` weight
+        (e.g. views into a memory map)"""
+        hierarchy = cls.__new__(cls)
+        hierarchy.rank = rank
+        hierarchy.offsets = offsets
+        hierarchy.targets = targets
+        hierarchy.weight = weight
+        hierarchy.middle = middle
+        hierarchy._attach(graph, weight_name)
+        return hierarchy
+
+    def _attach(self, graph, weight_name):
+        self.graph = graph
+        self.weight_name = weight_name
+        self.stations = graph.stations
+        self.index = graph.index
+        self.size = graph.size
+        self.component = graph.connected_components()
+
+    @property
+    def shortcuts(self):
+        return sum(1 for m in self.middle if m != NO_STATION)
+
+    def _search(self, s, t):
+        """Bidirectional upward Dijkstra; (distance, meeting station,
+        forward pred, backward pred) with pred mapping a station to
+        (previous station, upward edge slot)"""
+        offsets = self.offsets
+        targets = self.targets
+        weight = self.weight
+
+        dist = ({s: 0}, {t: 0})
+        pred = ({s: None}, {t: None})
+        heaps = ([(0, s)], [(0, t)])
+        best = INF
+        meet = NO_STATION
+        while heaps[0] or heaps[1]:
+            if not heaps[1] or (heaps[0] and heaps[0][0][0] <= heaps[1][0][0]):
+                side = 0
+            else:
+                side = 1
+            d, v = heappop(heaps[side])
+            if d >= best:
+                # Everything left on this side is at least as far
+                heaps[side].clear()
+                continue
+            mine, other = dist[side], dist[1 - side]
+            if d > mine[v]:
+                continue
+            if v in other and d + other[v] < best:
+                best = d + other[v]
+                meet = v
+            # Stall on demand: a higher station already reaches v shorter
+            stalled = False
+            for e in range(offsets[v], offsets[v + 1]):
+                u = targets[e]
+                if u in mine and mine[u] + weight[e] < d:
+                    stalled = True
+                    break
+            if stalled:
+                continue
+            for e in range(offsets[v], offsets[v + 1]):
+                u = targets[e]
+                du = d + weight[e]
+                if du < mine.get(u, INF):
+                    mine[u] = du
+                    pred[side][u] = (v, e)
+                    heappush(heaps[side], (du, u))
+        return best, meet, pred[0], pred[1]
+
+    def _slot(self, v, u):
+        """Upward edge slot v -> u"""
+        for e in range(self.offsets[v], self.offsets[v + 1]):
+            if self.targets[e] == u:
+                return e
+        raise KeyError((v, u))
+
+    def _unpack(self, a, b, e, out):
+        """Append the stations after a up to b along upward edge slot e
+        (an edge between a and b, stored at the lower of the two)"""
+        stack = [(a, b, e)]
+        middle = self.middle
+        while stack:
+            a, b, e = stack.pop()
+            m = middle[e]
+            if m == NO_STATION:
+                out.append(b)
+                continue
+            stack.append((m, b, self._slot(m, b)))
+            stack.append((a, m, self._slot(m, a)))
+
+    def distance(self, src, dest):
+        s = self.index.get(src)
+        t = self.index.get(dest)
+        if s is None or t is None or self.component[s] != self.component[t]:
+            return INF
+        return self._search(s, t)[0] if s != t else 0
+
+    def has_path(self, src, dest):
+        s = self.index.get(src)
+        t = self.index.get(dest)
+        if s is None or t is None:
+            return False
+        return self.component[s] == self.component[t]
+
+    def path(self, src, dest):
+        """Return the station list from src to dest, or None if unreachable"""
+        s = self.index.get(src)
+        t = self.index.get(dest)
+        if s is None or t is None or self.component[s] != self.component[t]:
+            return None
+        if s == t:
+            return [src]
+        best, meet, forward, backward = self._search(s, t)
+        if meet == NO_STATION:
+            return None
+
+        up = []
+        v = meet
+        while forward[v] is not None:
+            up.append((forward[v][0], v, forward[v][1]))
+            v = forward[v][0]
+        ids = [s]
+        for a, b, e in reversed(up):
+            self._unpack(a, b, e, ids)
+        v = meet
+        while backward[v] is not None:
+            previous, e = backward[v]
+            self._unpack(v, previous, e, ids)
+            v = previous
+        return [self.stations[i] for i in ids]
+
+    def row(self, station):
+        """Best weight from station to every station ID (one plain
+        Dijkstra; only for callers that need the whole tree)"""
+        return self.graph.dijkstra(self.weight_name, self.index[station])[0]
+
+    def tree(self, s):
+        """Predecessor row of the shortest-path tree from station ID s"""
+        return self.graph.dijkstra(self.weight_name, s)[1]
@@ -0,0 +1,206 @@
+"""
+Time-of-day crowding: how packed a train is on each segment, by bucket.
+
+A 9 AM fast local towards Churchgate and a 2 PM one cover the same track,
+but they are very different rides.  The network data can list crowding
+periods per line (optionally a stretch of it and one direction) and day
+type.  Each period multiplies the comfort weight of every hop it covers
+(1 = the static comfort_weight, 2.5 = two and a half times as unpleasant).
+Where several entries cover a hop, the largest factor applies.
+
+Periods are expanded into fixed buckets (BUCKET_MINUTES over a weekday
+and a weekend day).  Buckets whose factors are identical on every hop
+share one variant, and every variant keeps its per-slot factor array, so
+crowded comfort weights are one multiplication per slot.  Variant 0 is
+"no crowding" (the static comfort weights).  A query only looks up its
+bucket's variant and uses arrays (and route tables, see app.py) already
+built for it.
+
+Network data layout (optional; no crowding otherwise)::
+
+    "crowding": [{"line": "Western Line", "days": "weekday",
+                  "towards": "Churchgate",            # optional direction
+                  "from": "Virar", "to": "Dadar",     # optional stretch
+                  "periods": [["07:30", "11:00", 2.5], ...]}, ...]
+
+``days`` is "weekday", "weekend" or "all"; a period runs from its start
+up to (not including) its end, "24:00" being midnight.
+"""
+from array import array
+from datetime import datetime
+
+BUCKET_MINUTES = 15
+BUCKETS_PER_DAY = 24 * 60 // BUCKET_MINUTES
+DAY_TYPES = ('weekday', 'weekend')
+DAYS = {'weekday': ('weekday',), 'weekend': ('weekend',), 'all': DAY_TYPES}
+
+NO_CROWDING = 0
+
+
+def parse_minutes(value):
+    """'HH:MM' (00:00 to 24:00) -> minutes after midnight; ValueError if not"""
+    if not isinstance(value, str):
+        raise ValueError(f'{value!r} is not HH:MM')
+    hours, sep, minutes = value.strip().partition(':')
+    if not sep or not hours.isdigit() or not minutes.isdigit() or len(minutes) != 2:
+        raise ValueError(f'{value!r} is not HH:MM')
+    total = int(hours) * 60 + int(minutes)
+    if int(minutes) > 59 or total > 24 * 60:
+        raise ValueError(f'{value!r} is not a time of day')
+    return total
+
+
+def format_minutes(minutes):
+    return f'{minutes // 60:02d}:{minutes % 60:02d}'
+
+
+def crowding_errors(crowding, lines):
+    """Problems with a "crowding" list (a list of strings); ``lines`` maps
+    each line name to its station list"""
+    if not isinstance(crowding, list):
+        return ['crowding must be a list']
+    errors = []
+    for i, entry in enumerate(crowding):
+        where = f'crowding[{i}]'
+        if not isinstance(entry, dict):
+            errors.append(f'{where}: must be an object')
+            continue
+        stations = lines.get(entry.get('line'))
+        if stations is None:
+            errors.append(f"{where}: unknown line {entry.get('line')!r}")
+            continue
+        if entry.get('days', 'all') not in DAYS:
+            errors.append(f"{where}: days must be one of {', '.join(DAYS)}")
+        for key in ('from', 'to', 'towards'):
+            if key in entry and entry[key] not in stations:
+                errors.append(f"{where}: {key} {entry[key]!r} is not on {entry['line']}")
+        periods = entry.get('periods')
+        if not isinstance(periods, list) or not periods:
+            errors.append(f'{where}: periods must list [start, end, factor]')
+            continue
+        for period in periods:
+            try:
+                start, end, factor = period
+                if parse_minutes(start) >= parse_minutes(end):
+                    raise ValueError('a period must end after it starts')
+            except (TypeError, ValueError) as e:
+                errors.append(f'{where}: bad period {period!r} ({e})')
+                continue
+            if isinstance(factor, bool) or not isinstance(factor, (int, float)) or factor <= 0:
+                errors.append(f'{where}: factor of {period!r} must be a positive number')
+    return errors
+
+
+def bucket_at(when):
+    """Bucket of a datetime (local time of the network)"""
+    day = 'weekend' if when.weekday() >= 5 else 'weekday'
+    minute = when.hour * 60 + when.minute
+    return DAY_TYPES.index(day) * BUCKETS_PER_DAY + minute // BUCKET_MINUTES
+
+
+def describe_bucket(bucket):
+    """'weekday 08:45-09:00' for a bucket"""
+    day, index = divmod(bucket, BUCKETS_PER_DAY)
+    start = index * BUCKET_MINUTES
+    return f'{DAY_TYPES[day]} {format_minutes(start)}-{format_minutes(start + BUCKET_MINUTES)}'
+
+
+class CrowdingTable:
+    """Crowding factor per CSR slot of a TransitGraph, per bucket.
+
+    ``graph`` is the all-modes TransitGraph (any graph sharing its CSR
+    arrays, e.g. a disruption overlay, can use the same factors),
+    ``lines`` maps a line name to its station list, ``segment_lines``
+    maps ``frozenset((u, v))`` to every line serving that segment and
+    ``crowding`` is the network data's "crowding" list.
+    """
+
+    def __init__(self, graph, lines, crowding=None, segment_lines=None):
+        self.graph = graph
+        segment_lines = segment_lines or {}
+        stations = graph.stations
+        n_slots = len(graph.targets)
+
+        # Every train slot of each line: (slot, from position, to position)
+        slots = {name: [] for name in lines}
+        position = {name: {s: i for i, s in enumerate(path)} for name, path in lines.items()}
+        for v in range(graph.size):
+            for e in range(graph.offsets[v], graph.offsets[v + 1]):
+                u = graph.targets[e]
+                names = segment_lines.get(frozenset((stations[v], stations[u])), ())
+                for name in names:
+                    here = position[name]
+                    slots[name].append((e, here[stations[v]], here[stations[u]]))
+
+        # Largest factor per (bucket, slot); only crowded slots are stored
+        crowded = [dict() for _ in range(len(DAY_TYPES) * BUCKETS_PER_DAY)]
+        for entry in crowding or []:
+            here = position[entry['line']]
+            path = lines[entry['line']]
+            lo, hi = sorted((here[entry.get('from', path[0])], here[entry.get('to', path[-1])]))
+            towards = here.get(entry.get('towards'))
+            covered = [e for e, a, b in slots[entry['line']]
+                       if lo <= min(a, b) and max(a, b) <= hi
+                       and (towards is None or abs(b - towards) < abs(a - towards))]
+            for day in DAYS[entry.get('days', 'all')]:
+                base = DAY_TYPES.index(day) * BUCKETS_PER_DAY
+                for start, end, factor in entry['periods']:
+                    first = parse_minutes(start) // BUCKET_MINUTES
+                    last = -(-parse_minutes(end) // BUCKET_MINUTES)
+                    for bucket in range(base + first, base + last):
+                        factors = crowded[bucket]
+                        for e in covered:
+                            if factor > factors.get(e, 0):
+                                factors[e] = factor
+
+        self.bucket_variant = array('h')
+        self.factors = [None]
+        self.min_factor = [1.0]
+        variants = {(): NO_CROWDING}
+        for factors in crowded:
+            key = tuple(sorted((e, f) for e, f in factors.items() if f != 1))
+            if key not in variants:
+                variants[key] = len(self.factors)
+                values = array('d', [1.0]) * n_slots
+                for e, f in key:
+                    values[e] = f
+                self.factors.append(values)
+                self.min_factor.append(min(1.0, min(f for _, f in key)))
+            self.bucket_variant.append(variants[key])
+
+    @property
+    def variants(self):
+        return len(self.factors)
+
+    def variant(self, bucket):
+        """Variant of a bucket (NO_CROWDING if nothing is crowded then)"""
+        return self.bucket_variant[bucket]
+
+    def variant_at(self, when):
+        return self.bucket_variant[bucket_at(when)]
+
+    def weights(self, base, variant):
+        """Per-slot weights for a variant: base scaled by its factors"""
+        factors = self.factors[variant]
+        if factors is None:
+            return base
+        return array('d', [w * f for w, f in zip(base, factors)])
+
+
+def parse_depart(value, tz, now=None):
+    """A departAt option -> datetime in tz: 'HH:MM' (today) or ISO 8601
+    (tz if no offset); ValueError if neither"""
+    if not isinstance(value, str):
+        raise ValueError('departAt must be HH:MM or an ISO 8601 date-time')
+    try:
+        minutes = parse_minutes(value)
+    except ValueError:
+        try:
+            when = datetime.fromisoformat(value.strip())
+        except ValueError:
+            raise ValueError('departAt must be HH:MM or an ISO 8601 date-time') from None
+        return when.replace(tzinfo=tz) if when.tzinfo is None else when.astimezone(tz)
+    if minutes == 24 * 60:
+        raise ValueError('departAt must be HH:MM or an ISO 8601 date-time')
+    today = (now or datetime.now(tz)).replace(second=0, microsecond=0)
+    return today.replace(hour=minutes // 60, minute=minutes % 60)
@@ -0,0 +1,401 @@
+"""
+Live disruption overlay: closures, slowdowns and delays on a loaded network.
+
+A block (the Harbour Line between Kurla and Vadala Road) or a slowdown (the
+Western Line in the monsoon) is runtime state, not network data.  Each
+disruption closes, slows (time x factor) or delays (+ minutes) one direct
+connection, a stretch of a line or a whole line until it expires.
+
+apply_overlay turns the disruptions in force into a NetworkSnapshot derived
+from the undisrupted one without rebuilding the graph.  Every view keeps
+its station IDs and CSR arrays and only gets new weight arrays, where a
+closed edge is infinite in all of them.  Route tables are updated rather
+than rebuilt (RouteTable.updated).  The returned OverlayChange names the
+edges whose weights moved and the origin-destination pairs whose route
+changed, so cached responses can be dropped selectively instead of
+flushing the cache in the middle of an incident.
+
+With a ``path``, the set lives in a JSON file shared by every worker
+process.  Updates are serialized with a lock file, and a worker picks up
+another's changes when it next polls the file.
+"""
+from array import array
+from datetime import datetime, timezone
+import json
+import math
+import os
+import secrets
+
+from graph_views import GraphViews, MODE_SETS
+from route_table import RouteTable, SearchTable
+from routing_snapshot import file_lock
+from transit_graph import INF
+
+DISRUPTION_TYPES = ('close', 'slow', 'delay')
+
+_UNSET = object()
+
+
+class DisruptionError(ValueError):
+    """A disruption that cannot be applied; ``errors`` lists why"""
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        super().__init__('; '.join(self.errors))
+
+
+def edge_key(u, v):
+    """Order-independent key of the edge between stations u and v"""
+    return (u, v) if u <= v else (v, u)
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def _timestamp(value):
+    return datetime.fromtimestamp(value, timezone.utc).isoformat()
+
+
+class Disruption:
+    """One closure, slowdown or delay.
+
+    ``line`` alone covers the whole line; with ``start`` and ``end`` only
+    the stretch between those two stations.  ``start`` and ``end``
+    without a line name one direct connection.  Times are epoch seconds.
+    """
+
+    def __init__(self, id, type, line=None, start=None, end=None, factor=None,
+                 minutes=None, reason='', created_at=None, expires_at=INF):
+        self.id = id
+        self.type = type
+        self.line = line
+        self.start = start
+        self.end = end
+        self.factor = factor
+        self.minutes = minutes
+        self.reason = reason
+        self.created_at = created_at
+        self.expires_at = expires_at
+
+    @classmethod
+    def from_request(cls, data, now, tz=timezone.utc):
+        """Validated Disruption from an API request body.  ``until`` may
+        be any ISO 8601 time (``tz`` if it has no offset);
+        ``durationMinutes`` counts from ``now``."""
+        errors = []
+        kind = data.get('type')
+        if kind not in DISRUPTION_TYPES:
+            errors.append(f"type must be one of {', '.join(DISRUPTION_TYPES)}")
+        factor = data.get('factor')
+        if kind == 'slow' and not (_is_number(factor) and factor >= 1):
+            errors.append('factor must be a number >= 1')
+        minutes = data.get('minutes')
+        if kind == 'delay' and not (_is_number(minutes) and minutes > 0):
+            errors.append('minutes must be a positive number')
+
+        line, start, end = data.get('line'), data.get('from'), data.get('to')
+        if (start is None) != (end is None):
+            errors.append('from and to must be given together')
+        elif line is None and start is None:
+            errors.append('give a line, from and to stations, or both')
+        elif start is not None and start == end:
+            errors.append('from and to must be different stations')
+
+        expires_at = None
+        until, duration = data.get('until'), data.get('durationMinutes')
+        if until is not None:
+            try:
+                expires = datetime.fromisoformat(until)
+                if expires.tzinfo is None:
+                    expires = expires.replace(tzinfo=tz)
+                expires_at = expires.timestamp()
+                if expires_at <= now:
+                    errors.append('until is in the past')
+            except (TypeError, ValueError):
+                errors.append('until must be an ISO 8601 time')
+        elif _is_number(duration) and duration > 0:
+            expires_at = now + duration * 60
+        else:
+            errors.append('give an expiry: durationMinutes (> 0) or until')
+
+        reason = data.get('reason', '')
+        if not isinstance(reason, str):
+            errors.append('reason must be a string')
+        if errors:
+            raise DisruptionError(errors)
+        return cls(secrets.token_hex(4), kind, line, start, end,
+                   factor if kind == 'slow' else None,
+                   minutes if kind == 'delay' else None,
+                   reason, now, expires_at)
+
+    @classmethod
+    def from_dict(cls, data):
+        """Inverse of to_dict"""
+        return cls(data['id'], data['type'], data.get('line'), data.get('from'), data.get('to'),
+                   data.get('factor'), data.get('minutes'), data.get('reason', ''),
+                   datetime.fromisoformat(data['createdAt']).timestamp(),
+                   datetime.fromisoformat(data['expiresAt']).timestamp())
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'type': self.type,
+            'line': self.line,
+            'from': self.start,
+            'to': self.end,
+            'factor': self.factor,
+            'minutes': self.minutes,
+            'reason': self.reason,
+            'createdAt': _timestamp(self.created_at),
+            'expiresAt': _timestamp(self.expires_at),
+        }
+
+    def edges(self, net):
+        """Edge keys of net.graph this disruption covers"""
+        if self.line is not None:
+            stations = net.lines.get(self.line)
+            if stations is None:
+                raise DisruptionError([f'unknown line {self.line!r}'])
+            if self.start is not None:
+                missing = [s for s in (self.start, self.end) if s not in stations]
+                if missing:
+                    raise DisruptionError([f'{s!r} is not on the {self.line}' for s in missing])
+                i, j = sorted((stations.index(self.start), stations.index(self.end)))
+                stations = stations[i:j + 1]
+            return [edge_key(u, v) for u, v in zip(stations, stations[1:])]
+        if not net.graph.has_edge(self.start, self.end):
+            raise DisruptionError([f'{self.start!r} - {self.end!r} is not a direct connection '
+                                   '(give the line to disrupt a longer stretch)'])
+        return [edge_key(self.start, self.end)]
+
+
+class DisruptionSet:
+    """The disruptions in force, by ID, optionally kept in a JSON file
+    shared by every worker process (see module docstring)"""
+
+    def __init__(self, path=None):
+        self.path = path
+        self._items = {}
+        self._mtime = None
+        self.sync()
+
+    def active(self, now):
+        return sorted((d for d in self._items.values() if d.expires_at > now),
+                      key=lambda d: d.created_at)
+
+    def next_expiry(self, now):
+        """When the next active disruption expires (INF if none do)"""
+        return min((d.expires_at for d in self._items.values() if d.expires_at > now), default=INF)
+
+    def sync(self):
+        """Re-read the shared file if another process changed it; True if so"""
+        if not self.path:
+            return False
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime == self._mtime:
+            return False
+        self._mtime = mtime
+        self._items = self._read() if mtime is not None else {}
+        return True
+
+    def _read(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                entries = json.load(f)['disruptions']
+            items = {}
+            for entry in entries:
+                disruption = Disruption.from_dict(entry)
+                items[disruption.id] = disruption
+            return items
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Ignoring unreadable disruptions file {self.path}: {e}")
+            return {}
+
+    def add(self, disruption, now):
+        self._update(lambda items: items.__setitem__(disruption.id, disruption), now)
+
+    def remove(self, disruption_id, now):
+        """Remove a disruption before it expires; the removed one, or None"""
+        return self._update(lambda items: items.pop(disruption_id, None), now)
+
+    def _update(self, change, now):
+        if not self.path:
+            result = change(self._items)
+            self._prune(now)
+            return result
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with file_lock(self.path + '.lock'):
+            self._mtime = None
+            self.sync()
+            result = change(self._items)
+            self._prune(now)
+            tmp = f'{self.path}.{os.getpid()}.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({'disruptions': [d.to_dict() for d in self._items.values()]}, f, indent=1)
+            os.replace(tmp, self.path)
+            self._mtime = os.stat(self.path).st_mtime_ns
+        return result
+
+    def _prune(self, now):
+        self._items = {k: d for k, d in self._items.items() if d.expires_at > now}
+
+
+# ===================== OVERLAY =====================
+
+class OverlayChange:
+    """What replacing one snapshot with an overlaid one changed.
+
+    ``edges``: keys of the edges whose weights moved.  ``pairs``:
+    ``(origin, destination)`` pairs whose route changed in some profile,
+    or None when that is not known (every pair may have changed).
+    ``lowered``: some edge got cheaper in some weight (a disruption ended),
+    which can bring routes that no earlier answer used into trade-off
+    options and alternatives, not only into the best routes.
+    """
+
+    def __init__(self, edges=(), pairs=(), lowered=False):
+        self.edges = set(edges)
+        self.pairs = set(pairs) if pairs is not None else None
+        self.lowered = lowered
+
+    def __bool__(self):
+        return bool(self.edges) or self.pairs is None
+
+
+def _minutes(value):
+    value = round(value, 1)
+    return int(value) if value == int(value) else value
+
+
+def edge_times(net, disruptions):
+    """{edge key: travel time on net.graph with disruptions applied, or
+    None if closed}; slowdowns multiply, delays add, a closure wins"""
+    closed, factors, delays = set(), {}, {}
+    for disruption in disruptions:
+        try:
+            keys = disruption.edges(net)
+        except DisruptionError as e:
+            # e.g. a line the reloaded network data no longer has
+            print(f"Disruption {disruption.id} not applied: {e}")
+            continue
+        for key in keys:
+            if disruption.type == 'close':
+                closed.add(key)
+            elif disruption.type == 'slow':
+                factors[key] = factors.get(key, 1) * disruption.factor
+            else:
+                delays[key] = delays.get(key, 0) + disruption.minutes
+    times = {key: None for key in closed}
+    for key in (set(factors) | set(delays)) - closed:
+        times[key] = _minutes(net.graph.edges[key]['time'] * factors.get(key, 1)
+                              + delays.get(key, 0))
+    return times
+
+
+def _view_weights(base, previous, name, times, keys):
+    """New weight arrays and closed slots of one view, plus per weight the
+    slots that went up / down since previous and whether any differ from
+    base"""
+    base_graph = base.views.view(name).graph
+    old = previous.views.view(name).graph
+    weights = {w: array('d', values) for w, values in old.weights.items()}
+    closed = bytearray(old.closed) if old.closed is not None else bytearray(len(old.targets))
+    raised = {w: [] for w in weights}
+    lowered = {w: [] for w in weights}
+    differs = dict.fromkeys(weights, False)
+
+    for key in keys:
+        u, v = key
+        a, b = base_graph.index.get(u), base_graph.index.get(v)
+        if a is None or b is None:
+            continue
+        t = times.get(key, _UNSET)
+        for e in (base_graph.edge_slot(a, b), base_graph.edge_slot(b, a)):
+            if e < 0:
+                # Not in this view (another mode)
+                continue
+            if t is None:
+                values = dict.fromkeys(weights, INF)
+            elif t is _UNSET:
+                values = {w: base_graph.weights[w][e] for w in weights}
+            else:
+                data = dict(base.graph.edges[key], time=t)
+                ends = (base_graph.stations[base_graph.edge_tail(e)], base_graph.stations[base_graph.targets[e]])
+                values = {w: spec(*ends, data) if callable(spec) else data[spec]
+                          for w, spec in base.weights.items()}
+            closed[e] = t is None
+            for w, value in values.items():
+                if value > weights[w][e]:
+                    raised[w].append(e)
+                elif value < weights[w][e]:
+                    lowered[w].append(e)
+                weights[w][e] = value
+                differs[w] = differs[w] or value != base_graph.weights[w][e]
+
+    graph = base_graph.with_weights(weights, closed if any(closed) else None)
+    return graph, raised, lowered, differs
+
+
+def apply_overlay(base, previous, disruptions, revision):
+    """``(snapshot, OverlayChange)`` for base with disruptions applied.
+
+    ``previous`` is the live snapshot being replaced: base itself or an
+    earlier overlay on it.  Only what differs from it is recomputed, and
+    it is returned as is when no edge weight moves.  The new snapshot
+    gets ``revision``.
+    """
+    rebased = previous.base is not base
+    if rebased:
+        previous = base
+    times = edge_times(base, disruptions)
+    moved = {key for key in set(times) | set(previous.overlay)
+             if times.get(key, _UNSET) != previous.overlay.get(key, _UNSET)}
+    if not moved and not rebased:
+        return previous, OverlayChange()
+
+    if times:
+        graph = base.graph.copy()
+        for (u, v), t in times.items():
+            if t is None:
+                graph.remove_edge(u, v)
+            else:
+                graph[u][v]['time'] = t
+        views = GraphViews(graph, base.weights)
+    else:
+        graph, views = base.graph, base.views
+
+    keys = set(times) | moved
+    per_view = {}
+    for name in MODE_SETS:
+        view_graph, raised, lowered, differs = _view_weights(base, previous, name, times, keys)
+        per_view[name] = (raised, lowered, differs)
+        if times:
+            views.preload(name, view_graph)
+
+    snapshot = base.overlaid(graph, views, times, revision)
+    pairs = None if rebased else set()
+    for profile, (view, weight) in base.profiles.items():
+        raised, lowered, differs = (d[weight] for d in per_view[view])
+        table = previous.route_tables.peek(profile)
+        if table is not None and (raised or lowered):
+            new_graph = views.view(view).graph
+            if isinstance(table, RouteTable):
+                table, changed = table.updated(new_graph, weight, raised, lowered)
+                if pairs is not None:
+                    stations = new_graph.stations
+                    pairs.update((stations[s], stations[t]) for s, t in changed)
+            else:
+                # A contraction hierarchy cannot be patched
+                table = SearchTable(new_graph, weight)
+                pairs = None
+        if not differs:
+            # Back on base weights: its own table, which keeps its tie-breaks
+            table = base.route_tables.peek(profile)
+        if table is not None:
+            snapshot.route_tables.preload(profile, table)
+    lowered = any(slots for _, by_weight, _ in per_view.values() for slots in by_weight.values())
+    return snapshot, OverlayChange(moved, pairs, lowered)
@@ -0,0 +1,125 @@
+"""
+Route shards: every /api/journey/all answer, computed ahead of time.
+
+The station set only changes with the network version, so the client does
+not need the API for the common case.  This exporter runs the same search
+as /api/journey/all (find_optimal_routes, all three profiles) for every
+station pair and writes one JSON shard per origin plus a manifest::
+
+    index.json   {"version", "stationTable", "ticketClass", "profiles",
+                  "columns", "origins": {station: file}, "generated"}
+    <n>.json     {"version", "origin", "routes": [[time, cost, ...], ...],
+                  "journeys": {destination: [fastest, cheapest, comfortable]}}
+
+Each journey lists one index into ``routes`` per profile (null if the
+profile has no route); a route shared by several profiles is stored once.
+A route's columns are those of the manifest, the last being its
+instructions, exactly as /api/journey/all returns them.
+
+Shards are built from the network file alone (no live disruptions, the
+default ticket class).  The client compares ``version`` with the
+``network_version`` of /api/health and only trusts a shard while they
+match and no disruption is in force.
+
+Usage (from backend/):
+    python export_shards.py [out_dir]     # default: ../my-app/public/shards
+"""
+import contextlib
+from datetime import datetime, timezone
+import io
+import json
+import os
+import sys
+import time
+
+# Shards describe the network as published, never a disruption overlay
+os.environ['DISRUPTIONS_FILE'] = ''
+os.environ['ROUTE_CACHE_SIZE'] = '0'
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import app
+from fares import DEFAULT_TICKET_CLASS
+
+DEFAULT_OUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                               '..', 'my-app', 'public', 'shards')
+PROFILES = ('fastest', 'cheapest', 'comfortable')
+COLUMNS = ('time', 'cost', 'distance', 'transfers', 'comfort', 'metro_percentage',
+           'instructions')
+
+
+def export_origin(origin, stations):
+    """The shard of one origin: every destination's profile summaries"""
+    routes = []
+    seen = {}
+    journeys = {}
+    for dest in stations:
+        if dest == origin:
+            continue
+        summaries = app.summarize_all_routes(app.find_optimal_routes(origin, dest))
+        refs = []
+        for profile in PROFILES:
+            summary = summaries.get(profile)
+            if summary is None:
+                refs.append(None)
+                continue
+            row = [summary[column] for column in COLUMNS]
+            key = json.dumps(row, ensure_ascii=False)
+            if key not in seen:
+                seen[key] = len(routes)
+                routes.append(row)
+            refs.append(seen[key])
+        if any(ref is not None for ref in refs):
+            journeys[dest] = refs
+    return {'routes': routes, 'journeys': journeys}
+
+
+def write_json(path, data):
+    """Write compact JSON through a temporary file, so a reader never sees
+    half a shard"""
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp, path)
+
+
+def main(argv):
+    out_dir = os.path.abspath(argv[1] if len(argv) > 1 else DEFAULT_OUT_DIR)
+    os.makedirs(out_dir, exist_ok=True)
+    net = app.current_network()
+    table, _ = app.station_table(net)
+    stations = table['stations']
+
+    # Shards of an older export (stations since removed) must not linger
+    for name in os.listdir(out_dir):
+        if name.endswith('.json'):
+            os.remove(os.path.join(out_dir, name))
+
+    start = time.perf_counter()
+    origins = {}
+    total_bytes = 0
+    with app.app.test_request_context():
+        for i, origin in enumerate(stations):
+            shard = export_origin(origin, stations)
+            shard = {'version': net.version, 'origin': origin, **shard}
+            name = f'{i}.json'
+            write_json(os.path.join(out_dir, name), shard)
+            total_bytes += os.path.getsize(os.path.join(out_dir, name))
+            origins[origin] = name
+
+    # The manifest goes last: a client that finds it finds every shard
+    write_json(os.path.join(out_dir, 'index.json'), {
+        'version': net.version,
+        'stationTable': table['version'],
+        'ticketClass': DEFAULT_TICKET_CLASS,
+        'profiles': list(PROFILES),
+        'columns': list(COLUMNS),
+        'origins': origins,
+        'generated': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+    })
+    print(f"Wrote {len(origins)} shards to {out_dir}: network {net.version}, "
+          f"{total_bytes / 1024:.0f} KiB, {time.perf_counter() - start:.1f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
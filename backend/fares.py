@@ -0,0 +1,328 @@
+"""
+Distance-slab fares: what a journey's tickets actually cost.
+
+Suburban and metro fares in Mumbai are not per stop: a ticket is priced
+by the distance it covers, looked up in a slab table (up to 10 km: ₹5, up
+to 25 km: ₹10, ...), and the table depends on the ticket class (second,
+first, AC local; metro smart card).  One ticket covers a continuous ride
+on one mode, across changes of line (Western to Central at Dadar is still
+one suburban ticket).  Walking to another station or switching between
+suburban rail and metro starts a new ticket.
+
+Everything is precomputed when a network loads: each line's cumulative
+distance array (so a segment's length is one subtraction) and each slab
+table as two sorted lists (so a fare is one bisect).  Pricing a journey is
+O(segments), a whole shortest-path tree of journeys (a matrix row) is
+priced in one pass over the tree, and ``cheapest`` searches for the
+journey with the least fare (``labels`` runs the same search from several
+origins to every station).
+
+Network data layout (optional; DEFAULT_FARES otherwise)::
+
+    "fares": {"Local Train": {"second": [[10, 5], [25, 10], ...], "first": ...},
+              "Metro": {"card": [[3, 10], [12, 20], ...]}}
+
+Each table lists ``[up to km, fare]`` slabs in increasing order; beyond
+the last slab its fare applies.  A leg on a mode without a table for the
+requested class uses that mode's first table.
+"""
+from bisect import bisect_left
+from heapq import heappush, heappop
+from itertools import count
+
+from transit_graph import INF, MODES
+
+NO_LEG = -1
+
+DEFAULT_TICKET_CLASS = 'second'
+
+# Approximate 2024 single-journey fares (₹)
+DEFAULT_FARES = {
+    'Local Train': {
+        'second': [[10, 5], [25, 10], [40, 15], [55, 20], [70, 25], [85, 30], [100, 35], [150, 40]],
+        'first': [[10, 50], [25, 100], [40, 140], [55, 175], [70, 210], [85, 240], [100, 265],
+                  [150, 295]],
+        'ac': [[10, 35], [20, 50], [30, 65], [40, 80], [50, 95], [60, 105], [70, 115], [80, 130],
+               [90, 150], [100, 165], [150, 175]],
+    },
+    'Metro': {
+        'card': [[3, 10], [12, 20], [18, 30], [24, 40], [30, 50], [36, 60], [42, 70], [48, 80]],
+    },
+}
+
+
+def slab_errors(fares, modes):
+    """Problems with a "fares" object (a list of strings)"""
+    if not isinstance(fares, dict):
+        return ['fares must be an object']
+    errors = []
+    for mode, tables in fares.items():
+        if mode not in modes:
+            errors.append(f'fares: unknown mode {mode!r}')
+            continue
+        if not isinstance(tables, dict) or not tables:
+            errors.append(f'fares of {mode!r}: must map ticket classes to slab tables')
+            continue
+        for ticket_class, slabs in tables.items():
+            where = f'fares of {mode!r} ({ticket_class})'
+            if not isinstance(slabs, list) or not slabs or not all(
+                    isinstance(slab, list) and len(slab) == 2
+                    and all(isinstance(x, (int, float)) and not isinstance(x, bool) and x >= 0
+                            for x in slab)
+                    for slab in slabs):
+                errors.append(f'{where}: must list [km, fare] slabs')
+                continue
+            if any(a[0] >= b[0] or a[1] > b[1] for a, b in zip(slabs, slabs[1:])):
+                errors.append(f'{where}: slabs must grow in km and never fall in fare')
+    missing = [mode for mode in modes if mode not in fares]
+    if missing:
+        errors.append(f"fares: no table for {', '.join(missing)}")
+    return errors
+
+
+def _whole(value):
+    return int(value) if value == int(value) else value
+
+
+class FareTable:
+    """Slab tables and per-line cumulative distances of one network.
+
+    ``lines`` maps a line name to its station list and ``graph`` is the
+    network's nx.Graph (hop distances, overrides applied); ``fares`` is
+    the network data's "fares" object (default: DEFAULT_FARES).
+    """
+
+    def __init__(self, lines, graph, fares=None):
+        fares = fares or DEFAULT_FARES
+        self.classes = []
+        self.slabs = {}
+        for mode, tables in fares.items():
+            for ticket_class, slabs in tables.items():
+                if ticket_class not in self.classes:
+                    self.classes.append(ticket_class)
+                self.slabs[mode, ticket_class] = ([float(km) for km, _ in slabs],
+                                                  [_whole(fare) for _, fare in slabs])
+        self.default_class = {mode: next(iter(tables)) for mode, tables in fares.items()}
+
+        self.line_mode = {}
+        self.position = {}
+        self.cumulative = {}
+        for name, stations in lines.items():
+            km = [0.0]
+            for u, v in zip(stations, stations[1:]):
+                km.append(km[-1] + graph[u][v]['distance'])
+            self.line_mode[name] = graph[stations[0]][stations[1]]['mode']
+            self.position[name] = {station: i for i, station in enumerate(stations)}
+            self.cumulative[name] = km
+
+    def table(self, mode, ticket_class):
+        """(slab limits, slab fares) for a leg on mode"""
+        slabs = self.slabs.get((mode, ticket_class))
+        if slabs is None:
+            slabs = self.slabs[mode, self.default_class[mode]]
+        return slabs
+
+    @staticmethod
+    def slab_fare(table, km):
+        """Fare of one ticket covering km on a slab table"""
+        limits, fares = table
+        # Distances are given to 0.1 km; rounding keeps float sums from
+        # tipping a journey into the next slab
+        i = bisect_left(limits, round(km, 1))
+        return fares[min(i, len(fares) - 1)]
+
+    def segment_km(self, line, start, end):
+        """Length of a ride on line between two of its stations"""
+        position = self.position[line]
+        km = self.cumulative[line]
+        return abs(km[position[end]] - km[position[start]])
+
+    def price(self, legs, ticket_class=DEFAULT_TICKET_CLASS):
+        """Fare of a journey given as tickets: lists of (line, start, end)
+        segments, one list per continuous ride on one mode"""
+        total = 0
+        for segments in legs:
+            mode = self.line_mode[segments[0][0]]
+            km = sum(self.segment_km(line, start, end) for line, start, end in segments)
+            total += self.slab_fare(self.table(mode, ticket_class), km)
+        return total
+
+    def edge_tables(self, ticket_class):
+        """Slab table per TransitGraph mode ID (None for walking links)"""
+        return [self.table(mode, ticket_class) if mode in self.default_class else None
+                for mode in MODES]
+
+    def tree_fares(self, graph, pred, source, ticket_class=DEFAULT_TICKET_CLASS, edges=None):
+        """Fare of the tree path from source to every station ID of a
+        TransitGraph, given the tree as a predecessor row (None where the
+        tree does not reach).  Each station extends its parent's open
+        ticket by one edge, so the whole tree is priced in one pass
+        (``edges``: the tree's graph.tree_edges(), if already walked)."""
+        n = graph.size
+        tables = self.edge_tables(ticket_class)
+        distance = graph.weights['distance']
+        mode = graph.mode
+        slab_fare = self.slab_fare
+        if edges is None:
+            edges = graph.tree_edges(pred, source)
+        # Per station: fares of finished tickets, open ticket's mode and km
+        closed = [None] * n
+        leg = [NO_LEG] * n
+        km = [0.0] * n
+        fares = [None] * n
+        closed[source] = 0
+        fares[source] = 0
+
+        for x, p, e in edges:
+            m = mode[e]
+            if tables[m] is None:
+                closed[x] = fares[p]
+                leg[x] = NO_LEG
+                km[x] = 0.0
+                fares[x] = closed[x]
+                continue
+            if m == leg[p]:
+                closed[x] = closed[p]
+                km[x] = km[p] + distance[e]
+            else:
+                closed[x] = fares[p]
+                km[x] = distance[e]
+            leg[x] = m
+            fares[x] = closed[x] + slab_fare(tables[m], km[x])
+        return fares
+
+    def cheapest(self, graph, s, t, ticket_class=DEFAULT_TICKET_CLASS, max_labels=16,
+                 below=INF):
+        """Least-fare route from station ID s to t on a TransitGraph, the
+        fastest among equal fares: ``(fare, time, station IDs)`` or
+        ``(INF, INF, None)``.  With ``below`` (e.g. the fare of a route
+        already found) only routes cheaper than that are searched for.
+
+        Fares are not sums of edge weights, so this is a label search.
+        Extending a journey never lowers its fare, so labels are settled
+        in order of (fare so far, time) and the first to reach t is the
+        answer.  Station bags are capped at ``max_labels`` (None: no cap);
+        when full, a label is only admitted if it is cheaper or faster than
+        every label there.
+        """
+        for label in self.labels(graph, {s: 0}, ticket_class, max_labels, below):
+            if label.station == t:
+                return label.fare, label.time, label.path()
+        return INF, INF, None
+
+    def labels(self, graph, sources, ticket_class=DEFAULT_TICKET_CLASS, max_labels=16,
+               below=INF):
+        """Settled labels of the least-fare search, in order of (fare,
+        time), from every station ID in ``sources`` (mapped to its starting
+        time, e.g. a walk to it).  The first label settled at a station is
+        its least-fare journey, the fastest among equal fares; labels of
+        ``below`` or more are never generated."""
+        tables = self.edge_tables(ticket_class)
+        offsets = graph.offsets
+        targets = graph.targets
+        mode = graph.mode
+        distance = graph.weights['distance']
+        w_time = graph.weights['time']
+        slab_fare = self.slab_fare
+
+        bags = [[] for _ in range(graph.size)]
+        c = count()
+        heap = []
+        for s, start_time in sources.items():
+            start = FareLabel(s, 0, NO_LEG, 0.0, 0, start_time, None)
+            if _admit(bags[s], start, max_labels):
+                heappush(heap, (0, start_time, next(c), start))
+        while heap:
+            _, _, _, label = heappop(heap)
+            if not label.alive:
+                continue
+            yield label
+            v = label.station
+            for e in range(offsets[v], offsets[v + 1]):
+                u = targets[e]
+                if u == v or w_time[e] == INF:
+                    continue
+                m = mode[e]
+                table = tables[m]
+                time = label.time + w_time[e]
+                if table is None:
+                    # Walking link: the open ticket ends here
+                    new = FareLabel(u, label.fare, NO_LEG, 0.0, label.fare, time, label, e)
+                else:
+                    if m == label.leg:
+                        closed, km = label.closed, label.km + distance[e]
+                    else:
+                        closed, km = label.fare, distance[e]
+                    new = FareLabel(u, closed, m, km, closed + slab_fare(table, km), time, label, e)
+                if new.fare >= below:
+                    continue
+                if _admit(bags[u], new, max_labels):
+                    heappush(heap, (new.fare, time, next(c), new))
+
+
+class FareLabel:
+    """One partial journey for the least-fare search: fares of finished
+    tickets, the open ticket's mode ID (NO_LEG if none) and km, the fare
+    including it, and the edge slot it arrived by (-1 at its origin)"""
+    __slots__ = ('station', 'closed', 'leg', 'km', 'fare', 'time', 'parent', 'edge', 'alive')
+
+    def __init__(self, station, closed, leg, km, fare, time, parent, edge=-1):
+        self.station = station
+        self.closed = closed
+        self.leg = leg
+        self.km = km
+        self.fare = fare
+        self.time = time
+        self.parent = parent
+        self.edge = edge
+        self.alive = True
+
+    def path(self):
+        """Station IDs from the origin to this label's station"""
+        path = []
+        label = self
+        while label is not None:
+            path.append(label.station)
+            label = label.parent
+        path.reverse()
+        return path
+
+    def edges(self):
+        """Edge slots from the origin to this label's station"""
+        edges = []
+        label = self
+        while label.parent is not None:
+            edges.append(label.edge)
+            label = label.parent
+        edges.reverse()
+        return edges
+
+    def covers(self, other):
+        """At least as good as other for every way on from this station:
+        no slower, no more paid, and no open ticket or a shorter one on
+        the same mode (slab fares never fall with distance)"""
+        return (self.time <= other.time and self.closed <= other.closed
+                and (self.leg == NO_LEG or (self.leg == other.leg and self.km <= other.km)))
+
+
+def _admit(bag, label, max_labels):
+    """Add label to a station bag unless covered; False if rejected"""
+    for other in bag:
+        if other.covers(label):
+            return False
+    survivors = []
+    for other in bag:
+        if label.covers(other):
+            other.alive = False
+        else:
+            survivors.append(other)
+    if max_labels is not None and len(survivors) >= max_labels:
+        if label.fare >= min(l.fare for l in survivors) and \
+           label.time >= min(l.time for l in survivors):
+            return False
+        victim = max(survivors, key=lambda l: (l.fare, l.time))
+        victim.alive = False
+        survivors.remove(victim)
+    survivors.append(label)
+    bag[:] = survivors
+    return True
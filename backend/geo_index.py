@@ -0,0 +1,123 @@
+"""
+Station coordinates and nearest-station lookup on a uniform grid.
+
+Stations are projected onto a flat plane around the network's mean
+latitude (equirectangular; well under 0.1% off at city scale) and bucketed
+into square cells, sized so that a cell holds about one station on average
+over the network's bounding box (or ``cell_meters``).  A k-nearest query scans rings of
+cells outwards from the query point's cell.  It stops once the k-th
+closest station found is nearer than anything in the next ring can be, so
+a query touches a handful of cells however many stops the network has.
+"""
+import math
+
+EARTH_RADIUS_M = 6371008.8
+MIN_CELL_METERS = 100
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """Great-circle distance in metres"""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    a = math.sin((p2 - p1) / 2) ** 2 + \
+        math.cos(p1) * math.cos(p2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+class GeoIndex:
+    """Grid index over ``{station: (lat, lon)}``"""
+
+    def __init__(self, coordinates, cell_meters=None):
+        self.coordinates = dict(coordinates)
+        lats = [lat for lat, _ in self.coordinates.values()]
+        self.lat0 = sum(lats) / len(lats) if lats else 0.0
+        self._kx = math.radians(1) * EARTH_RADIUS_M * math.cos(math.radians(self.lat0))
+        self._ky = math.radians(1) * EARTH_RADIUS_M
+
+        self._points = {station: self.project(lat, lon)
+                        for station, (lat, lon) in self.coordinates.items()}
+        if cell_meters is None and self._points:
+            xs = [x for x, _ in self._points.values()]
+            ys = [y for _, y in self._points.values()]
+            spread = (max(xs) - min(xs) + MIN_CELL_METERS) * (max(ys) - min(ys) + MIN_CELL_METERS)
+            cell_meters = max(MIN_CELL_METERS, math.sqrt(spread / len(self._points)))
+        self.cell = float(cell_meters or MIN_CELL_METERS)
+
+        self.cells = {}
+        for station, (x, y) in self._points.items():
+            self.cells.setdefault(self._cell_of(x, y), []).append((x, y, station))
+        if self.cells:
+            xs = [cx for cx, _ in self.cells]
+            ys = [cy for _, cy in self.cells]
+            self._bounds = (min(xs), max(xs), min(ys), max(ys))
+
+    def __len__(self):
+        return len(self.coordinates)
+
+    def __contains__(self, station):
+        return station in self.coordinates
+
+    def project(self, lat, lon):
+        """Plane coordinates in metres"""
+        return lon * self._kx, lat * self._ky
+
+    def _cell_of(self, x, y):
+        return int(math.floor(x / self.cell)), int(math.floor(y / self.cell))
+
+    def distance(self, lat, lon, station):
+        """Metres from a point to a station (on the projection)"""
+        x, y = self.project(lat, lon)
+        sx, sy = self._points[station]
+        return math.hypot(sx - x, sy - y)
+
+    def nearest(self, lat, lon, k=1, max_meters=None):
+        """Up to k ``(station, metres)`` nearest the point, nearest first.
+
+        Stations further than ``max_meters`` are left out.
+        """
+        if not self.cells or k <= 0:
+            return []
+        x, y = self.project(lat, lon)
+        cx, cy = self._cell_of(x, y)
+        min_x, max_x, min_y, max_y = self._bounds
+        # Rings beyond this one cannot reach any occupied cell
+        last = max(cx - min_x, max_x - cx, cy - min_y, max_y - cy)
+        limit = math.inf if max_meters is None else max_meters
+
+        found = []
+        # Start at the first ring that reaches an occupied cell
+        ring = max(0, min_x - cx, cx - max_x, min_y - cy, cy - max_y)
+        while ring <= last:
+            for cell in self._ring(cx, cy, ring):
+                for sx, sy, station in self.cells.get(cell, ()):
+                    d = math.hypot(sx - x, sy - y)
+                    if d <= limit:
+                        found.append((d, station))
+            # Everything in ring r + 1 is at least r cells away
+            reach = ring * self.cell
+            if reach >= limit:
+                break
+            if len(found) >= k:
+                found.sort()
+                del found[k:]
+                if found[-1][0] <= reach:
+                    break
+            ring += 1
+        found.sort()
+        return [(station, d) for d, station in found[:k]]
+
+    def _ring(self, cx, cy, r):
+        """Cells at Chebyshev distance r, clipped to the occupied bounds"""
+        min_x, max_x, min_y, max_y = self._bounds
+        if r == 0:
+            yield cx, cy
+            return
+        x0, x1 = max(cx - r, min_x), min(cx + r, max_x)
+        for y in (cy - r, cy + r):
+            if min_y <= y <= max_y:
+                for x in range(x0, x1 + 1):
+                    yield x, y
+        y0, y1 = max(cy - r + 1, min_y), min(cy + r - 1, max_y)
+        for x in (cx - r, cx + r):
+            if min_x <= x <= max_x:
+                for y in range(y0, y1 + 1):
+                    yield x, y
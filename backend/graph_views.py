@@ -0,0 +1,80 @@
+"""
+Mode-filtered views of the station graph.
+
+Routing profiles that may only use some transport modes used to rebuild a
+filtered nx.Graph on every request.  GraphViews builds each filtered
+TransitGraph once (every profile now routes on 'all'), together
+with a connected-component label per station so "is there any path at
+all?" is an array lookup.  A snapshot's graph never changes once loaded,
+so views are never rebuilt.
+"""
+import threading
+
+from transit_graph import TransitGraph
+
+# Named mode sets used by the routing profiles
+MODE_SETS = {
+    'all': frozenset(['Local Train', 'Metro', 'Transfer']),
+}
+
+
+class ModeView:
+    """A TransitGraph restricted to some modes, plus component labels"""
+
+    def __init__(self, graph, modes):
+        self.graph = graph
+        self.modes = modes
+        self.component = graph.connected_components()
+
+    def __contains__(self, station):
+        return station in self.graph
+
+    def connected(self, src, dest):
+        """O(1) check that dest is reachable from src inside this view"""
+        s = self.graph.index.get(src)
+        t = self.graph.index.get(dest)
+        if s is None or t is None:
+            return False
+        return self.component[s] == self.component[t]
+
+
+class GraphViews:
+    """Cache of ModeView objects over one base nx graph.
+
+    ``weights`` is passed through to every TransitGraph built.  Views are
+    built on first use; the 'all' view is the full graph with networkx's own
+    neighbour order, the others keep only edges whose mode is in the set.
+    """
+
+    def __init__(self, graph, weights):
+        self.graph = graph
+        self.weights = weights
+        self._views = {}
+        self._lock = threading.Lock()
+
+    def _build(self, modes):
+        if modes == MODE_SETS['all']:
+            return TransitGraph.from_networkx(self.graph, self.weights)
+        # Edges are taken in G.edges() order so Dijkstra breaks ties exactly
+        # as it did on the per-request nx subgraph
+        return TransitGraph.from_edges(
+            ((u, v, d) for u, v, d in self.graph.edges(data=True) if d['mode'] in modes),
+            self.weights,
+        )
+
+    def preload(self, name, graph):
+        """Use an already built TransitGraph for the named view"""
+        modes = MODE_SETS[name]
+        with self._lock:
+            self._views[modes] = ModeView(graph, modes)
+
+    def view(self, name):
+        modes = MODE_SETS[name]
+        view = self._views.get(modes)
+        if view is None:
+            with self._lock:
+                view = self._views.get(modes)
+                if view is None:
+                    view = ModeView(self._build(modes), modes)
+                    self._views[modes] = view
+        return view
@@ -0,0 +1,169 @@
+"""
+Visiting order for a multi-stop itinerary.
+
+"Start at Thane, visit Kurla, Bandra, Vashi and Andheri, end at Thane" is
+a small travelling-salesman problem over the stops.  app.py fills a cost
+matrix between them from one shortest-path tree per stop (a route table
+row), and this module picks the order: every order is scored by the sum
+of the matrix entries along it, never by searching the network again.
+
+Up to EXACT_MAX_STOPS stops the order is exact (Held-Karp dynamic
+programming over subsets, O(2^n n^2)).  Beyond that it is a local search:
+a nearest-neighbour tour improved by segment reversals (2-opt) and segment
+moves (Or-opt), then restarted from shuffled orders until the restarts or
+the time budget run out.  Restarts use a fixed seed, so the same stops
+give the same order whenever the budget is not what stops the search.
+
+The matrix need not be symmetric (every leg is scored in the direction it
+is travelled).  Without an end the itinerary finishes at whichever stop
+comes last; an end equal to the start makes it a round trip.
+"""
+import random
+import time
+
+INF = float('inf')
+
+# Largest number of stops ordered exactly (2^n n^2 steps: ~5 ms at 10,
+# doubling and more with each stop)
+EXACT_MAX_STOPS = 10
+# Local search (more stops): restarts and wall-clock allowance
+LOCAL_SEARCH_RESTARTS = 8
+LOCAL_SEARCH_SECONDS = 0.05
+
+
+def order_cost(cost, start, order, end=None):
+    """Total of the legs start -> order... -> end (end None: no last leg)"""
+    total = 0
+    here = start
+    for stop in order:
+        total += cost[here][stop]
+        here = stop
+    if end is not None:
+        total += cost[here][end]
+    return total
+
+
+def held_karp(cost, start, stops, end=None):
+    """Exact best order of ``stops`` (indices into ``cost``).
+
+    Returns ``(total, order)``; total is INF if no order connects them.
+    """
+    m = len(stops)
+    if m == 0:
+        return order_cost(cost, start, [], end), []
+    # Sub-matrix between the stops, plus the legs from start and to end
+    inner = [[cost[a][b] for b in stops] for a in stops]
+    first = [cost[start][b] for b in stops]
+    last = [0 if end is None else cost[a][end] for a in stops]
+
+    full = (1 << m) - 1
+    # best[mask][j]: least total visiting the stops in mask, ending at j
+    best = [[INF] * m for _ in range(full + 1)]
+    parent = [[-1] * m for _ in range(full + 1)]
+    for j in range(m):
+        best[1 << j][j] = first[j]
+    for mask in range(1, full):
+        row = best[mask]
+        rest = full ^ mask
+        for j in range(m):
+            d = row[j]
+            if d == INF:
+                continue
+            leg = inner[j]
+            free = rest
+            while free:
+                low = free & -free
+                k = low.bit_length() - 1
+                nd = d + leg[k]
+                target = best[mask | low]
+                if nd < target[k]:
+                    target[k] = nd
+                    parent[mask | low][k] = j
+                free ^= low
+
+    row = best[full]
+    j = min(range(m), key=lambda j: row[j] + last[j])
+    total = row[j] + last[j]
+    if total == INF:
+        return INF, list(stops)
+    order = []
+    mask = full
+    while j != -1:
+        order.append(stops[j])
+        j, mask = parent[mask][j], mask ^ (1 << j)
+    order.reverse()
+    return total, order
+
+
+def _nearest_neighbour(cost, start, stops):
+    order = []
+    left = list(stops)
+    here = start
+    while left:
+        stop = min(left, key=lambda s: cost[here][s])
+        left.remove(stop)
+        order.append(stop)
+        here = stop
+    return order
+
+
+def _improve(cost, start, order, end, deadline):
+    """Apply improving 2-opt and Or-opt moves until none is left (or the
+    deadline passes); returns (total, order)"""
+    best = order_cost(cost, start, order, end)
+    n = len(order)
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        # 2-opt: reverse order[i:j]
+        for i in range(n - 1):
+            for j in range(i + 2, n + 1):
+                candidate = order[:i] + order[i:j][::-1] + order[j:]
+                total = order_cost(cost, start, candidate, end)
+                if total < best:
+                    best, order, improved = total, candidate, True
+        # Or-opt: move a run of 1-3 stops elsewhere (either way round)
+        for length in (1, 2, 3):
+            for i in range(n - length + 1):
+                run = order[i:i + length]
+                rest = order[:i] + order[i + length:]
+                for j in range(len(rest) + 1):
+                    if j == i:
+                        continue
+                    for piece in (run, run[::-1]) if length > 1 else (run,):
+                        candidate = rest[:j] + piece + rest[j:]
+                        total = order_cost(cost, start, candidate, end)
+                        if total < best:
+                            best, order, improved = total, candidate, True
+    return best, order
+
+
+def local_search(cost, start, stops, end=None, restarts=LOCAL_SEARCH_RESTARTS,
+                 seconds=LOCAL_SEARCH_SECONDS):
+    """Good (not necessarily best) order of ``stops``: ``(total, order)``"""
+    deadline = time.perf_counter() + seconds
+    best, order = _improve(cost, start, _nearest_neighbour(cost, start, stops), end, deadline)
+    rng = random.Random(0)
+    for _ in range(restarts):
+        if time.perf_counter() >= deadline:
+            break
+        shuffled = list(stops)
+        rng.shuffle(shuffled)
+        total, candidate = _improve(cost, start, shuffled, end, deadline)
+        if total < best:
+            best, order = total, candidate
+    return best, order
+
+
+def plan_order(cost, start, stops, end=None, exact_max=EXACT_MAX_STOPS):
+    """Visiting order of ``stops`` (indices into the square matrix
+    ``cost``) from ``start`` to ``end`` (None: open-ended).
+
+    Returns ``(total, order, exact)``; ``exact`` says the order is
+    guaranteed best.  total is INF when some stop cannot be reached.
+    """
+    if len(stops) <= exact_max:
+        total, order = held_karp(cost, start, stops, end)
+        return total, order, True
+    total, order = local_search(cost, start, stops, end)
+    return total, order, False
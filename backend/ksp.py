@@ -0,0 +1,162 @@
+"""
+K-shortest simple paths (Yen's algorithm) on a TransitGraph.
+
+Yen's algorithm finds the k best loopless paths by repeatedly taking the
+last accepted path, and for every node on it ("spur node") searching for a
+detour that leaves the path there, with the edges used by earlier paths at
+that point blocked.  The spur searches are what make it expensive, so here
+each one is an A* search guided by the exact distance-to-target row of a
+precomputed shortest-path tree (see route_table.RouteTable.row): blocking
+edges only makes paths longer, so the row stays a consistent heuristic and
+most spur searches settle little more than the detour itself.
+
+A budget caps the total number of settled nodes and the wall-clock time;
+when it runs out the paths found so far are returned.  Alternatives whose
+train edges are identical and which differ only in transfer (walking)
+edges are collapsed into one.
+"""
+from heapq import heappush, heappop
+from itertools import count
+import time
+
+from transit_graph import INF, MODES, NO_STATION
+
+TRANSFER = MODES.index('Transfer')
+
+
+class Budget:
+    """Shared expansion/time allowance for one k-shortest query"""
+
+    def __init__(self, max_expansions=20000, max_seconds=0.05):
+        self.expansions_left = max_expansions
+        self.deadline = time.perf_counter() + max_seconds
+        self.exhausted = False
+
+    def spend(self, n):
+        self.expansions_left -= n
+        if self.expansions_left < 0 or time.perf_counter() > self.deadline:
+            self.exhausted = True
+        return not self.exhausted
+
+
+def _astar(graph, weight, source, target, heuristic, blocked_nodes, blocked_edges, budget):
+    """Cheapest source -> target path avoiding blocked nodes/edge slots.
+
+    Returns ``(cost, [station IDs])`` or None.
+    """
+    w = graph.weights[weight]
+    offsets = graph.offsets
+    targets = graph.targets
+
+    g = {source: 0}
+    pred = {source: NO_STATION}
+    done = set()
+    c = count()
+    heap = [(heuristic[source], next(c), source)]
+    settled = 0
+    while heap:
+        _, _, v = heappop(heap)
+        if v in done:
+            continue
+        done.add(v)
+        settled += 1
+        if v == target:
+            break
+        gv = g[v]
+        for e in range(offsets[v], offsets[v + 1]):
+            u = targets[e]
+            if u in done or u in blocked_nodes or e in blocked_edges:
+                continue
+            gu = gv + w[e]
+            if gu < g.get(u, INF):
+                g[u] = gu
+                pred[u] = v
+                heappush(heap, (gu + heuristic[u], next(c), u))
+    budget.spend(settled)
+
+    if target not in done:
+        return None
+    path = [target]
+    while path[-1] != source:
+        path.append(pred[path[-1]])
+    path.reverse()
+    return g[target], path
+
+
+def _signature(graph, path):
+    """Train edges of a path; paths differing only in transfers share it"""
+    return tuple(
+        (u, v) for u, v in zip(path, path[1:])
+        if graph.mode[graph.edge_slot(u, v)] != TRANSFER
+    )
+
+
+def k_shortest_paths(graph, weight, src, dest, k, heuristic=None, budget=None, dedupe=True):
+    """Up to k loopless src -> dest paths in increasing ``weight`` order.
+
+    ``heuristic`` is a lower bound on the remaining weight from every
+    station ID to dest (zeros if omitted, i.e. plain Dijkstra).  Returns
+    ``(paths, complete)`` where paths is a list of ``(cost, [names])`` and
+    complete is False if the budget ran out first.
+    """
+    s = graph.index.get(src)
+    t = graph.index.get(dest)
+    if s is None or t is None or k <= 0:
+        return [], True
+    if heuristic is None:
+        heuristic = [0] * graph.size
+    if budget is None:
+        budget = Budget()
+
+    first = _astar(graph, weight, s, t, heuristic, set(), set(), budget)
+    if first is None:
+        return [], True
+
+    # Every path popped is used for spurring and blocking (as Yen's requires);
+    # only those with a new train-edge signature are reported
+    accepted = [first]
+    reported = [first]
+    signatures = {_signature(graph, first[1])}
+    candidates = []
+    queued = {tuple(first[1])}
+    c = count()
+    w = graph.weights[weight]
+
+    while len(reported) < k and not budget.exhausted:
+        _, prev = accepted[-1]
+        root_cost = 0
+        for i in range(len(prev) - 1):
+            spur = prev[i]
+            root = prev[:i + 1]
+
+            blocked_edges = set()
+            for _, path in accepted:
+                if len(path) > i + 1 and path[:i + 1] == root:
+                    u, v = path[i], path[i + 1]
+                    blocked_edges.add(graph.edge_slot(u, v))
+                    blocked_edges.add(graph.edge_slot(v, u))
+            blocked_nodes = set(root[:-1])
+
+            found = _astar(graph, weight, spur, t, heuristic, blocked_nodes, blocked_edges, budget)
+            if found is not None:
+                spur_cost, spur_path = found
+                path = root[:-1] + spur_path
+                key = tuple(path)
+                if key not in queued:
+                    queued.add(key)
+                    heappush(candidates, (root_cost + spur_cost, next(c), path))
+            if budget.exhausted:
+                break
+            root_cost += w[graph.edge_slot(prev[i], prev[i + 1])]
+
+        if not candidates:
+            break
+        cost, _, path = heappop(candidates)
+        accepted.append((cost, path))
+        signature = _signature(graph, path) if dedupe else len(accepted)
+        if signature not in signatures:
+            signatures.add(signature)
+            reported.append((cost, path))
+
+    paths = [(cost, [graph.stations[i] for i in path]) for cost, path in reported]
+    return paths, not budget.exhausted
@@ -0,0 +1,181 @@
+"""
+Line-aware routing: search states are (station, line being ridden).
+
+The station graph has one node per station, so changing trains at Dadar
+or Kurla is free to a plain Dijkstra: the junction entries of the network
+file are self-loops it never takes.  Here a route also carries the line it
+is on.  Boarding a train on another line at station v costs v's change
+weight, read lazily from v's junction self-loop while relaxing an edge
+(stations where lines meet without a junction entry get a default).  No
+node is copied per line.  A state is one integer ``station * (lines + 1) +
+line + 1``, kept in dicts only when reached.  Most stations see one or two
+lines, so a search touches barely more states than stations.
+
+A segment shared by several lines (CSMT - Masjid on Central and Harbour,
+Juinagar - Panvel on Harbour and Trans-Harbour) can be ridden on any of
+them, so staying on a through train there is not counted as a change.
+Walking links (Transfer edges) end the ride: their own time is the
+change, and the next train is boarded without a further penalty.
+"""
+from array import array
+from heapq import heappush, heappop
+from itertools import count
+
+from transit_graph import INF, MODES
+
+TRANSFER = MODES.index('Transfer')
+NO_LINE = -1
+
+
+class LineModel:
+    """Lines serving each edge slot of a TransitGraph, and the weight of
+    changing lines at each station.
+
+    ``segment_lines`` maps ``frozenset((u, v))`` of station names to every
+    line name serving that segment (default: the edge's own line).
+    ``default_change`` maps a weight name to the change weight at stations
+    with no junction self-loop (default: 0).
+    """
+
+    def __init__(self, graph, segment_lines=None, default_change=None):
+        self.graph = graph
+        self.lines = list(graph.lines)
+        line_ids = {name: i for i, name in enumerate(self.lines)}
+        segment_lines = segment_lines or {}
+        default_change = default_change or {}
+
+        stations = graph.stations
+        offsets = graph.offsets
+        targets = graph.targets
+        mode = graph.mode
+        line = graph.line
+
+        self.edge_lines = []
+        self.change = {name: array('d', [default_change.get(name, 0)]) * graph.size
+                       for name in graph.weights}
+        for v in range(graph.size):
+            for e in range(offsets[v], offsets[v + 1]):
+                u = targets[e]
+                if u == v:
+                    # Junction self-loop: the weight of changing lines here
+                    for name, weights in graph.weights.items():
+                        self.change[name][v] = weights[e]
+                    self.edge_lines.append(())
+                    continue
+                if mode[e] == TRANSFER:
+                    self.edge_lines.append(())
+                    continue
+                names = segment_lines.get(frozenset((stations[v], stations[u])))
+                if not names:
+                    self.edge_lines.append((line[e],))
+                    continue
+                ids = []
+                for name in names:
+                    if name not in line_ids:
+                        line_ids[name] = len(self.lines)
+                        self.lines.append(name)
+                    ids.append(line_ids[name])
+                self.edge_lines.append(tuple(ids))
+
+    def search(self, weight, s, t, heuristic=None, weights=None):
+        """Best route from station ID s to t with line changes charged.
+
+        ``heuristic`` optionally gives a lower bound on the remaining
+        weight from every station ID to t (e.g. the plain route-table row,
+        which never counts a change), turning the Dijkstra into A*.
+        ``weights`` optionally replaces the graph's per-slot ``weight``
+        array (e.g. comfort scaled by crowding); changes still cost the
+        station's ``weight`` change value.
+        Returns ``(total, station IDs, line per hop)`` with NO_LINE for
+        walking hops, or ``(INF, None, None)``.
+        """
+        graph = self.graph
+        w = graph.weights[weight] if weights is None else weights
+        change = self.change[weight]
+        offsets = graph.offsets
+        targets = graph.targets
+        edge_lines = self.edge_lines
+        width = len(self.lines) + 1
+        h = heuristic
+
+        start = s * width
+        best = {start: 0}
+        pred = {}
+        done = set()
+        c = count()
+        heap = [(h[s] if h is not None else 0, next(c), 0, start)]
+        while heap:
+            _, _, d, state = heappop(heap)
+            if state in done:
+                continue
+            done.add(state)
+            v, riding = divmod(state, width)
+            riding -= 1
+            if v == t:
+                return d, *self._unwind(pred, state, start, width)
+            for e in range(offsets[v], offsets[v + 1]):
+                u = targets[e]
+                if u == v:
+                    continue
+                du = d + w[e]
+                if du == INF:
+                    continue
+                bound = h[u] if h is not None else 0
+                if bound == INF:
+                    continue
+                lines = edge_lines[e]
+                if not lines:
+                    moves = ((u * width, du),)
+                else:
+                    moves = [(u * width + l + 1,
+                              du if riding == NO_LINE or l == riding else du + change[v])
+                             for l in lines]
+                for nxt, dn in moves:
+                    if nxt in done or dn >= best.get(nxt, INF):
+                        continue
+                    best[nxt] = dn
+                    pred[nxt] = state
+                    heappush(heap, (dn + bound, next(c), dn, nxt))
+        return INF, None, None
+
+    @staticmethod
+    def _unwind(pred, state, start, width):
+        states = [state]
+        while state != start:
+            state = pred[state]
+            states.append(state)
+        states.reverse()
+        return [x // width for x in states], [x % width - 1 for x in states[1:]]
+
+    def ride(self, path, weight='time'):
+        """Line ridden on each hop of a station ID path (NO_LINE for walking
+        hops): the choice with the least change weight, then the fewest
+        changes, then the most hops on each edge's own line."""
+        graph = self.graph
+        change = self.change[weight]
+        best = {NO_LINE: (0, 0, 0)}
+        back = []
+        for v, u in zip(path, path[1:]):
+            e = graph.edge_slot(v, u)
+            lines = self.edge_lines[e] if e >= 0 else ()
+            own = graph.line[e] if lines else NO_LINE
+            step = {}
+            came = {}
+            for l in lines or (NO_LINE,):
+                for prev, (total, changes, off) in best.items():
+                    if prev != NO_LINE and l != NO_LINE and l != prev:
+                        score = (total + change[v], changes + 1, off + (l != own))
+                    else:
+                        score = (total, changes, off + (l != own))
+                    if l not in step or score < step[l]:
+                        step[l] = score
+                        came[l] = prev
+            best = step
+            back.append(came)
+        riding = min(best, key=best.get)
+        lines = []
+        for came in reversed(back):
+            lines.append(riding)
+            riding = came[riding]
+        lines.reverse()
+        return lines
@@ -0,0 +1,689 @@
+"""
+Network loader: the station graph as versioned data, built into snapshots.
+
+Lines, stations, per-hop weights, interchanges, per-segment overrides,
+station aliases, station coordinates, fare tables and crowding periods
+live in a data file
+(``data/network.json``, or a compact binary build of it) instead of in
+app.py.  A load validates the file, builds the graph and every routing
+structure on it (mode views, route tables, station index) into one
+NetworkSnapshot, and only then swaps it in with a single reference
+assignment.  Requests keep the snapshot they
+started with, so a reload never changes the network under a running query.
+
+JSON layout (``format`` is the schema version, ``version`` the data's)::
+
+    {"format": 1, "version": "2024.1",
+     "lines": [{"name", "mode", "time", "cost", "comfort", "distance",
+                "stations": [...]}],          # weights are per hop
+     "interchanges": [{"from", "to", "time", "cost", "comfort", "name"}],
+     "overrides": [{"from", "to", "time"?, "cost"?, "comfort"?, "distance"?}],
+     "aliases": {"VT": "CSMT", ...},
+     "coordinates": {"CSMT": [18.9401, 72.8355], ...},   # [lat, lon], optional
+     "fares": {"Local Train": {"second": [[10, 5], ...]}, ...},   # optional, see fares.py
+     "crowding": [{"line", "days", "periods": [[start, end, factor]]}]}   # see crowding.py
+
+Build the binary form with ``python network.py build data/network.json
+data/network.bin``; either file can be given as NETWORK_FILE.
+
+Live disruptions (see disruptions.py) are not part of the data: the store
+keeps the snapshot built from the file as ``base`` and serves an overlay of
+the disruptions in force on it, re-derived whenever one starts or ends.
+"""
+from array import array
+import copy
+from datetime import datetime, timezone
+import json
+import math
+import struct
+import sys
+import threading
+import time
+
+import networkx as nx
+
+from disruptions import DisruptionSet, OverlayChange, apply_overlay
+from crowding import crowding_errors, format_minutes, parse_minutes
+from fares import FareTable, slab_errors
+from geo_index import GeoIndex
+from graph_views import GraphViews
+from route_table import RouteTables
+from routing_snapshot import load_or_build, snapshot_key
+from station_index import StationIndex
+
+NETWORK_FORMAT = 1
+LINE_MODES = ('Local Train', 'Metro')
+WEIGHT_FIELDS = ('time', 'cost', 'comfort', 'distance')
+
+BINARY_MAGIC = b'MJNB'
+# String ID of an unset optional field in the binary build
+NO_STRING = 0xFFFFFFFF
+
+
+class NetworkError(ValueError):
+    """A network data file that cannot be loaded; ``errors`` lists why"""
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        super().__init__('; '.join(self.errors))
+
+
+# ===================== READING =====================
+
+def load_network(path):
+    """Read a network spec from a JSON or binary data file (not validated)"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data.startswith(BINARY_MAGIC):
+        return decode_binary(data)
+    try:
+        return json.loads(data.decode('utf-8'))
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise NetworkError([f'{path}: not a network file ({e})'])
+
+
+def _is_number(value, minimum=0):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) \
+        and math.isfinite(value) and value >= minimum
+
+
+def validate(spec):
+    """Raise NetworkError listing every problem in spec"""
+    if not isinstance(spec, dict):
+        raise NetworkError(['network data must be an object'])
+    errors = []
+    if spec.get('format') != NETWORK_FORMAT:
+        errors.append(f"unsupported format {spec.get('format')!r} (expected {NETWORK_FORMAT})")
+    if not isinstance(spec.get('version'), str) or not spec.get('version'):
+        errors.append('version must be a non-empty string')
+
+    lines = spec.get('lines')
+    if not isinstance(lines, list) or not lines:
+        raise NetworkError(errors + ['lines must be a non-empty list'])
+
+    stations = set()
+    segments = set()
+    names = set()
+    for i, line in enumerate(lines):
+        where = f"line {line.get('name', i)!r}" if isinstance(line, dict) else f'line {i}'
+        if not isinstance(line, dict):
+            errors.append(f'{where}: must be an object')
+            continue
+        if not isinstance(line.get('name'), str) or not line['name']:
+            errors.append(f'{where}: name must be a non-empty string')
+        elif line['name'] in names:
+            errors.append(f'{where}: duplicate line name')
+        names.add(line.get('name'))
+        if line.get('mode') not in LINE_MODES:
+            errors.append(f"{where}: mode must be one of {', '.join(LINE_MODES)}")
+        for field in WEIGHT_FIELDS:
+            minimum = 1e-9 if field == 'time' else 0
+            if not _is_number(line.get(field), minimum):
+                errors.append(f'{where}: {field} must be a {"positive" if field == "time" else "non-negative"} number')
+        path = line.get('stations')
+        if not isinstance(path, list) or len(path) < 2 or \
+                not all(isinstance(s, str) and s for s in path):
+            errors.append(f'{where}: stations must list at least two station names')
+            continue
+        if len(set(path)) != len(path):
+            errors.append(f'{where}: a station appears twice')
+        stations.update(path)
+        for u, v in zip(path, path[1:]):
+            segments.add(frozenset((u, v)))
+
+    for i, link in enumerate(spec.get('interchanges', [])):
+        where = f'interchange {i}'
+        if not isinstance(link, dict):
+            errors.append(f'{where}: must be an object')
+            continue
+        for end in ('from', 'to'):
+            if link.get(end) not in stations:
+                errors.append(f'{where}: unknown station {link.get(end)!r}')
+        if not _is_number(link.get('time'), 1e-9):
+            errors.append(f'{where}: time must be a positive number')
+        for field in ('cost', 'comfort'):
+            if not _is_number(link.get(field)):
+                errors.append(f'{where}: {field} must be a non-negative number')
+        if not isinstance(link.get('name'), str):
+            errors.append(f'{where}: name must be a string')
+
+    for i, override in enumerate(spec.get('overrides', [])):
+        where = f'override {i}'
+        if not isinstance(override, dict):
+            errors.append(f'{where}: must be an object')
+            continue
+        if frozenset((override.get('from'), override.get('to'))) not in segments:
+            errors.append(f"{where}: {override.get('from')!r} - {override.get('to')!r} is not a line segment")
+        for field in WEIGHT_FIELDS:
+            if field in override and not _is_number(override[field], 1e-9 if field == 'time' else 0):
+                errors.append(f'{where}: invalid {field}')
+
+    aliases = spec.get('aliases', {})
+    if not isinstance(aliases, dict):
+        errors.append('aliases must be an object')
+    else:
+        for alias, station in aliases.items():
+            if station not in stations:
+                errors.append(f'alias {alias!r}: unknown station {station!r}')
+            elif alias in stations:
+                errors.append(f'alias {alias!r}: is itself a station name')
+
+    coordinates = spec.get('coordinates', {})
+    if not isinstance(coordinates, dict):
+        errors.append('coordinates must be an object')
+    else:
+        for station, point in coordinates.items():
+            if station not in stations:
+                errors.append(f'coordinates: unknown station {station!r}')
+            elif not isinstance(point, list) or len(point) != 2 \
+                    or not all(_is_number(v, -180) for v in point) \
+                    or abs(point[0]) > 90 or abs(point[1]) > 180:
+                errors.append(f'coordinates of {station!r}: must be [lat, lon]')
+
+    if 'fares' in spec:
+        errors.extend(slab_errors(spec['fares'], sorted({line.get('mode') for line in lines
+                                                         if isinstance(line, dict)
+                                                         and line.get('mode') in LINE_MODES})))
+
+    if 'crowding' in spec:
+        errors.extend(crowding_errors(spec['crowding'], {
+            line['name']: line['stations'] for line in lines
+            if isinstance(line, dict) and isinstance(line.get('stations'), list)}))
+
+    if not errors:
+        components = nx.number_connected_components(build_graph(spec))
+        if components > 1:
+            errors.append(f'network is not connected ({components} separate parts)')
+    if errors:
+        raise NetworkError(errors)
+
+
+def _number(value):
+    """Whole numbers as int, so responses look the same for JSON and binary data"""
+    return int(value) if value == int(value) else value
+
+
+def build_graph(spec):
+    """nx.Graph of a (validated) spec.
+
+    Edges are added line by line, then interchanges, which fixes the
+    neighbour order (and so Dijkstra's tie-breaking).  A segment shared by
+    two lines keeps the attributes of the line listed last (every line
+    serving it is in segment_lines).
+    """
+    G = nx.Graph()
+    for line in spec['lines']:
+        path = line['stations']
+        for u, v in zip(path, path[1:]):
+            G.add_edge(
+                u, v,
+                time=_number(line['time']),
+                cost=_number(line['cost']),
+                comfort=_number(line['comfort']),
+                mode=line['mode'],
+                line=line['name'],
+                distance=float(line['distance']),
+                is_metro=(line['mode'] == 'Metro')
+            )
+    for link in spec.get('interchanges', []):
+        G.add_edge(
+            link['from'], link['to'],
+            time=_number(link['time']),
+            cost=_number(link['cost']),
+            comfort=_number(link['comfort']),
+            mode='Transfer',
+            line=link['name'],
+            distance=0,
+            is_metro=False
+        )
+    for override in spec.get('overrides', []):
+        edge = G[override['from']][override['to']]
+        for field in WEIGHT_FIELDS:
+            if field in override:
+                value = override[field]
+                edge[field] = float(value) if field == 'distance' else _number(value)
+    return G
+
+
+def segment_lines(spec):
+    """frozenset((u, v)) -> names of every line serving that segment, in
+    listing order"""
+    served = {}
+    for line in spec['lines']:
+        path = line['stations']
+        for u, v in zip(path, path[1:]):
+            names = served.setdefault(frozenset((u, v)), [])
+            if line['name'] not in names:
+                names.append(line['name'])
+    return {segment: tuple(names) for segment, names in served.items()}
+
+
+# ===================== COMPACT BINARY BUILD =====================
+# Little-endian: magic, u16 format, string table (u32 count, then u16
+# length + UTF-8 per string), u32 version string; then counted records of
+# lines (name, mode, 4 x f64 weights, u32 n, n station string IDs),
+# interchanges (from, to, name, 3 x f64), overrides (from, to, 4 x f64,
+# NaN = unchanged), aliases (alias, station), coordinates (station,
+# 2 x f64), fare tables (mode, ticket class, u32 n, n x (km, fare) f64)
+# and crowding entries (line, days, from, to, towards (NO_STRING if
+# unset), u32 n, n x (u32 start, u32 end minutes, f64 factor)).  Files
+# built before coordinates, fares or crowding existed end before them.
+
+def encode_binary(spec):
+    """Binary bytes for a validated spec"""
+    strings = {}
+
+    def sid(s):
+        if s not in strings:
+            strings[s] = len(strings)
+        return strings[s]
+
+    body = [struct.pack('<I', sid(spec['version']))]
+    lines = spec['lines']
+    body.append(struct.pack('<I', len(lines)))
+    for line in lines:
+        ids = array('I', [sid(s) for s in line['stations']])
+        if sys.byteorder != 'little':
+            ids.byteswap()
+        body.append(struct.pack('<II4dI', sid(line['name']), sid(line['mode']),
+                                *(float(line[f]) for f in WEIGHT_FIELDS), len(ids)))
+        body.append(ids.tobytes())
+    links = spec.get('interchanges', [])
+    body.append(struct.pack('<I', len(links)))
+    for link in links:
+        body.append(struct.pack('<III3d', sid(link['from']), sid(link['to']), sid(link['name']),
+                                link['time'], link['cost'], link['comfort']))
+    overrides = spec.get('overrides', [])
+    body.append(struct.pack('<I', len(overrides)))
+    for override in overrides:
+        body.append(struct.pack('<II4d', sid(override['from']), sid(override['to']),
+                                *(float(override.get(f, math.nan)) for f in WEIGHT_FIELDS)))
+    aliases = spec.get('aliases', {})
+    body.append(struct.pack('<I', len(aliases)))
+    for alias, station in aliases.items():
+        body.append(struct.pack('<II', sid(alias), sid(station)))
+    coordinates = spec.get('coordinates', {})
+    body.append(struct.pack('<I', len(coordinates)))
+    for station, (lat, lon) in coordinates.items():
+        body.append(struct.pack('<I2d', sid(station), lat, lon))
+    if 'fares' in spec or 'crowding' in spec:
+        tables = [(mode, ticket_class, slabs) for mode, classes in spec.get('fares', {}).items()
+                  for ticket_class, slabs in classes.items()]
+        body.append(struct.pack('<I', len(tables)))
+        for mode, ticket_class, slabs in tables:
+            body.append(struct.pack('<III', sid(mode), sid(ticket_class), len(slabs)))
+            for km, fare in slabs:
+                body.append(struct.pack('<2d', km, fare))
+    if 'crowding' in spec:
+        body.append(struct.pack('<I', len(spec['crowding'])))
+        for entry in spec['crowding']:
+            body.append(struct.pack('<5I', sid(entry['line']), sid(entry.get('days', 'all')),
+                                    *(sid(entry[key]) if key in entry else NO_STRING
+                                      for key in ('from', 'to', 'towards'))))
+            body.append(struct.pack('<I', len(entry['periods'])))
+            for start, end, factor in entry['periods']:
+                body.append(struct.pack('<IId', parse_minutes(start), parse_minutes(end), factor))
+
+    table = [struct.pack('<I', len(strings))]
+    for s in strings:
+        encoded = s.encode('utf-8')
+        table.append(struct.pack('<H', len(encoded)) + encoded)
+    return BINARY_MAGIC + struct.pack('<H', NETWORK_FORMAT) + b''.join(table) + b''.join(body)
+
+
+def decode_binary(data):
+    """Spec dict from encode_binary output"""
+    try:
+        pos = len(BINARY_MAGIC)
+
+        def read(fmt):
+            nonlocal pos
+            values = struct.unpack_from(fmt, data, pos)
+            pos += struct.calcsize(fmt)
+            return values
+
+        fmt_version, = read('<H')
+        count, = read('<I')
+        strings = []
+        for _ in range(count):
+            length, = read('<H')
+            strings.append(data[pos:pos + length].decode('utf-8'))
+            pos += length
+
+        spec = {'format': fmt_version, 'version': strings[read('<I')[0]]}
+        spec['lines'] = []
+        for _ in range(read('<I')[0]):
+            name, mode, t, c, k, d, n = read('<II4dI')
+            ids = array('I')
+            ids.frombytes(data[pos:pos + 4 * n])
+            if sys.byteorder != 'little':
+                ids.byteswap()
+            pos += 4 * n
+            spec['lines'].append({'name': strings[name], 'mode': strings[mode],
+                                  'time': t, 'cost': c, 'comfort': k, 'distance': d,
+                                  'stations': [strings[i] for i in ids]})
+        spec['interchanges'] = []
+        for _ in range(read('<I')[0]):
+            u, v, name, t, c, k = read('<III3d')
+            spec['interchanges'].append({'from': strings[u], 'to': strings[v], 'name': strings[name],
+                                         'time': t, 'cost': c, 'comfort': k})
+        spec['overrides'] = []
+        for _ in range(read('<I')[0]):
+            u, v, *weights = read('<II4d')
+            override = {'from': strings[u], 'to': strings[v]}
+            override.update((f, w) for f, w in zip(WEIGHT_FIELDS, weights) if not math.isnan(w))
+            spec['overrides'].append(override)
+        spec['aliases'] = {}
+        for _ in range(read('<I')[0]):
+            alias, station = read('<II')
+            spec['aliases'][strings[alias]] = strings[station]
+        spec['coordinates'] = {}
+        if pos < len(data):
+            for _ in range(read('<I')[0]):
+                station, lat, lon = read('<I2d')
+                spec['coordinates'][strings[station]] = [lat, lon]
+        if pos < len(data):
+            fares = {}
+            for _ in range(read('<I')[0]):
+                mode, ticket_class, n = read('<III')
+                fares.setdefault(strings[mode], {})[strings[ticket_class]] = \
+                    [[_number(km), _number(fare)] for km, fare in
+                     (read('<2d') for _ in range(n))]
+            if fares:
+                spec['fares'] = fares
+        if pos < len(data):
+            spec['crowding'] = []
+            for _ in range(read('<I')[0]):
+                line, days, *stations = read('<5I')
+                entry = {'line': strings[line], 'days': strings[days]}
+                entry.update((key, strings[i]) for key, i in zip(('from', 'to', 'towards'), stations)
+                             if i != NO_STRING)
+                entry['periods'] = [[format_minutes(start), format_minutes(end), _number(factor)]
+                                    for start, end, factor in
+                                    (read('<IId') for _ in range(read('<I')[0]))]
+                spec['crowding'].append(entry)
+        return spec
+    except (struct.error, IndexError, UnicodeDecodeError) as e:
+        raise NetworkError([f'corrupt binary network file ({e})'])
+
+
+# ===================== SNAPSHOTS =====================
+
+class NetworkSnapshot:
+    """One build of the network and every routing structure on it.
+
+    ``profiles`` maps a route-table name to ``(view name, weight)``.
+    Networks with more than ``max_table_stations`` stations route on a
+    contraction hierarchy per profile instead of all-pairs tables
+    (``hierarchical``).  Nothing here is mutated after construction except lazily built caches,
+    so a snapshot can be shared by any number of concurrent requests.
+    A disruption overlay is a separate snapshot (``overlaid``) whose
+    ``base`` is the undisrupted one; ``overlay`` maps the disrupted edges
+    to their travel time (None if closed) and ``revision`` orders overlays.
+    """
+
+    def __init__(self, spec, weights, profiles, generation=0, source=None,
+                 max_table_stations=None):
+        self.spec = spec
+        self.version = spec['version']
+        self.generation = generation
+        self.source = source
+        self.loaded_at = datetime.now(timezone.utc)
+        self.graph = build_graph(spec)
+        self.weights = weights
+        self.profiles = profiles
+        self.routing_file = None
+        self.lines = {line['name']: line['stations'] for line in spec['lines']}
+        self.interchanges = spec.get('interchanges', [])
+        self.segment_lines = segment_lines(spec)
+        self.aliases = spec.get('aliases', {})
+        self.coordinates = spec.get('coordinates', {})
+        self.hierarchical = (max_table_stations is not None
+                             and self.graph.number_of_nodes() > max_table_stations)
+        self.views = GraphViews(self.graph, weights)
+        self.route_tables = RouteTables({
+            name: self._table_source(view, weight) for name, (view, weight) in profiles.items()
+        }, hierarchical=self.hierarchical)
+        self.station_index = StationIndex(self.graph.nodes(), self.aliases)
+        self.geo_index = GeoIndex(self.coordinates)
+        self.fares = FareTable(self.lines, self.graph, spec.get('fares'))
+        self.base = self
+        self.overlay = {}
+        self.revision = 0
+        self._memo = {}
+        self._memo_lock = threading.RLock()
+
+    def overlaid(self, graph, views, overlay, revision):
+        """This network routing on graph and views, copies carrying a
+        disruption overlay (see disruptions.apply_overlay); its route
+        tables are empty until preloaded or first used"""
+        snapshot = copy.copy(self)
+        snapshot.graph = graph
+        snapshot.views = views
+        snapshot.overlay = overlay
+        snapshot.revision = revision
+        snapshot.route_tables = RouteTables({
+            name: snapshot._table_source(view, weight)
+            for name, (view, weight) in self.profiles.items()
+        }, hierarchical=self.hierarchical)
+        snapshot._memo = {}
+        snapshot._memo_lock = threading.RLock()
+        return snapshot
+
+    def _table_source(self, view, weight):
+        return lambda: (self.views.view(view).graph, weight)
+
+    @property
+    def cache_version(self):
+        """Orders every state a response may have been computed against"""
+        return (self.generation, self.revision)
+
+    def memo(self, name, factory):
+        """factory() built once per snapshot (e.g. the timetable); a
+        factory may itself use other memos"""
+        value = self._memo.get(name)
+        if value is None:
+            with self._memo_lock:
+                value = self._memo.get(name)
+                if value is None:
+                    value = self._memo[name] = factory()
+        return value
+
+    def warm(self):
+        """Build every route table now instead of on first use"""
+        self.route_tables.build_all()
+
+    def share(self, directory):
+        """Use the views and route tables of the memory-mapped routing
+        snapshot for this network in directory, building the file first if
+        no process has yet"""
+        def build():
+            self.warm()
+            views = {view: self.views.view(view).graph for view, _ in self.profiles.values()}
+            tables = {profile: (view, self.route_tables.get(profile))
+                      for profile, (view, _) in self.profiles.items()}
+            return views, tables
+
+        key = snapshot_key(self.spec, self.graph, self.weights, self.profiles,
+                           'hierarchies' if self.hierarchical else 'tables')
+        mapped, _ = load_or_build(directory, key, build)
+        for view, graph in mapped.views.items():
+            self.views.preload(view, graph)
+        for profile, table in mapped.tables.items():
+            self.route_tables.preload(profile, table)
+        self.routing_file = mapped.path
+
+class NetworkStore:
+    """Holds the live NetworkSnapshot and replaces it on reload.
+
+    ``current`` is swapped by one assignment after the new snapshot is fully
+    built and warmed; reloads are serialized, and a file that fails to
+    load or validate leaves the live snapshot untouched.  With
+    ``shared_dir`` set, views and route tables come from a routing snapshot
+    file in that directory shared by every process (see routing_snapshot).
+    ``max_table_stations`` is passed to every NetworkSnapshot.
+
+    ``current`` is ``base`` with the ``disruptions`` in force overlaid.
+    ``live()`` re-derives it when one expires or another process changed
+    the shared set (checked at most every ``poll_seconds``).
+    ``on_overlay(snapshot, change)`` is called with each new overlay and
+    its OverlayChange just before it goes live (reloads are not overlay
+    changes: they start a new generation).
+    """
+
+    def __init__(self, path, weights, profiles, warm=True, shared_dir=None,
+                 max_table_stations=None, disruptions=None, poll_seconds=1.0,
+                 on_overlay=None):
+        self.path = path
+        self.weights = weights
+        self.profiles = profiles
+        self.warm = warm
+        self.shared_dir = shared_dir
+        self.max_table_stations = max_table_stations
+        self.disruptions = disruptions if disruptions is not None else DisruptionSet()
+        self.poll_seconds = poll_seconds
+        self.on_overlay = on_overlay
+        self.base = None
+        self.current = None
+        self._next_check = math.inf
+        self.last_error = None
+        self.last_build_seconds = None
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def reload(self, path=None):
+        """Load, validate and build path (default: self.path), then swap it in"""
+        path = path or self.path
+        with self._lock:
+            start = time.perf_counter()
+            try:
+                spec = load_network(path)
+                validate(spec)
+                snapshot = NetworkSnapshot(spec, self.weights, self.profiles,
+                                           self._generation + 1, path,
+                                           self.max_table_stations)
+                if self.shared_dir:
+                    try:
+                        snapshot.share(self.shared_dir)
+                    except OSError as e:
+                        print(f"Routing snapshot unavailable ({e}), building in memory")
+                        snapshot.warm()
+                elif self.warm:
+                    snapshot.warm()
+            except NetworkError as e:
+                self.last_error = str(e)
+                raise
+            except OSError as e:
+                self.last_error = str(e)
+                raise NetworkError([str(e)])
+            self._generation += 1
+            self.last_error = None
+            self.base = snapshot
+            self.disruptions.sync()
+            self._apply_disruptions(snapshot, notify=False)
+            self.last_build_seconds = time.perf_counter() - start
+            return self.current
+
+    def live(self):
+        """The current snapshot, after applying any disruption change due"""
+        if time.time() >= self._next_check:
+            self.refresh()
+        return self.current
+
+    def refresh(self):
+        """Pick up expired disruptions and other processes' changes (skipped
+        while a reload or another update holds the lock: requests never
+        wait on a network build)"""
+        if not self._lock.acquire(blocking=False):
+            return OverlayChange()
+        try:
+            self.disruptions.sync()
+            return self._apply_disruptions()
+        finally:
+            self._lock.release()
+
+    def disrupt(self, disruption):
+        """Put a disruption in force; returns the OverlayChange"""
+        with self._lock:
+            self.disruptions.add(disruption, time.time())
+            return self._apply_disruptions()
+
+    def end_disruption(self, disruption_id):
+        """End a disruption early; ``(disruption or None, OverlayChange)``"""
+        with self._lock:
+            removed = self.disruptions.remove(disruption_id, time.time())
+            return removed, self._apply_disruptions()
+
+    def _apply_disruptions(self, previous=None, notify=True):
+        """Swap in self.base overlaid with the disruptions in force,
+        derived from previous (default: the current snapshot)"""
+        now = time.time()
+        previous = previous or self.current
+        snapshot, change = apply_overlay(self.base, previous,
+                                         self.disruptions.active(now), previous.revision + 1)
+        if snapshot is not self.current:
+            if notify and self.on_overlay is not None:
+                self.on_overlay(snapshot, change)
+            self.current = snapshot
+        self._next_check = min(self.disruptions.next_expiry(now), now + self.poll_seconds)
+        return change if notify else OverlayChange()
+
+    def reload_in_background(self):
+        """Reload on a daemon thread (e.g. from a signal handler)"""
+        def run():
+            try:
+                snapshot = self.reload()
+                print(f"Network reloaded: version {snapshot.version} "
+                      f"(generation {snapshot.generation}, {self.last_build_seconds:.2f}s)")
+            except NetworkError as e:
+                print(f"Network reload failed, keeping current snapshot: {e}")
+        thread = threading.Thread(target=run, name='network-reload', daemon=True)
+        thread.start()
+        return thread
+
+    def status(self):
+        snapshot = self.current
+        return {
+            'version': snapshot.version if snapshot else None,
+            'generation': snapshot.generation if snapshot else None,
+            'source': snapshot.source if snapshot else self.path,
+            'loaded_at': snapshot.loaded_at.isoformat() if snapshot else None,
+            'build_seconds': round(self.last_build_seconds, 3) if self.last_build_seconds else None,
+            'routing_file': snapshot.routing_file if snapshot else None,
+            'routing': ('hierarchies' if snapshot.hierarchical else 'tables') if snapshot else None,
+            'revision': snapshot.revision if snapshot else None,
+            'disruptions': len(self.disruptions.active(time.time())),
+            'disrupted_edges': len(snapshot.overlay) if snapshot else None,
+            'last_error': self.last_error,
+        }
+
+
+def main(argv):
+    """python network.py build SRC DEST | python network.py check FILE"""
+    if len(argv) == 4 and argv[1] == 'build':
+        spec = load_network(argv[2])
+        validate(spec)
+        data = encode_binary(spec)
+        with open(argv[3], 'wb') as f:
+            f.write(data)
+        print(f"Wrote {argv[3]}: version {spec['version']}, {len(data)} bytes")
+    elif len(argv) == 3 and argv[1] == 'check':
+        spec = load_network(argv[2])
+        validate(spec)
+        G = build_graph(spec)
+        print(f"{argv[2]}: version {spec['version']} OK, "
+              f"{G.number_of_nodes()} stations, {G.number_of_edges()} connections")
+    else:
+        print(main.__doc__)
+        return 2
+    return 0
+
+
+if __name__ == '__main__':
+    try:
+        sys.exit(main(sys.argv))
+    except NetworkError as e:
+        print('Invalid network data:')
+        for error in e.errors:
+            print(f'  - {error}')
+        sys.exit(1)
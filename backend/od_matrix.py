@@ -0,0 +1,120 @@
+"""
+Origin-destination matrices for planning workloads.
+
+A matrix request is answered one origin at a time: the origin's row of the
+profile's RouteTable already is its single-source shortest-path tree, so
+the time, fare and distance of the chosen path to every destination are
+accumulated once along that tree (O(stations) per origin) instead of
+searching per pair.  Origins can be fanned out across a forked process
+pool, which inherits the already-built tables copy-on-write.
+"""
+import multiprocessing
+
+from transit_graph import INF
+
+# Totals reported for every origin-destination pair
+MATRIX_WEIGHTS = ('time', 'cost', 'distance')
+
+
+def exact_weights(graph, name):
+    """A weight array as a list of ints when every weight is whole, so
+    sums come out as 42 rather than 42.0 (as in per-journey responses)"""
+    values = graph.weights[name].tolist()
+    # (a closed edge's weight is infinite and stays a float)
+    if all(v == INF or v == int(v) for v in values):
+        return [v if v == INF else int(v) for v in values]
+    return values
+
+
+def tree_totals(graph, pred, source, weights=MATRIX_WEIGHTS, arrays=None, edges=None):
+    """Sum each weight along a shortest-path tree given as a predecessor row.
+
+    ``arrays`` optionally gives the per-edge values of ``weights`` (default:
+    the graph's weight arrays), ``edges`` the tree's graph.tree_edges() if
+    the caller already has them.  Returns ``{weight: [total or None per
+    station ID]}``; None marks stations the tree does not reach.
+    """
+    n = graph.size
+    if arrays is None:
+        arrays = [graph.weights[name] for name in weights]
+    if edges is None:
+        edges = graph.tree_edges(pred, source)
+    totals = []
+    for w in arrays:
+        column = [None] * n
+        column[source] = 0
+        for x, p, e in edges:
+            column[x] = column[p] + w[e]
+        totals.append(column)
+    return dict(zip(weights, totals))
+
+
+class MatrixEngine:
+    """Matrix rows for named profiles.
+
+    ``profiles`` maps a profile name to the RouteTable (or
+    ContractionHierarchy) whose shortest-path trees define that profile's
+    routes.  With ``fares`` (a FareTable) the cost column is the fare in
+    ``ticket_class``; without, the sum of per-hop costs.
+    """
+
+    def __init__(self, profiles, fares=None, ticket_class=None):
+        self.profiles = profiles
+        self.fares = fares
+        self.ticket_class = ticket_class
+        self._arrays = {}
+
+    def _weight_arrays(self, graph):
+        arrays = self._arrays.get(id(graph))
+        if arrays is None:
+            arrays = self._arrays[id(graph)] = [exact_weights(graph, name) for name in MATRIX_WEIGHTS]
+        return arrays
+
+    def origin_rows(self, profile, origin, destinations):
+        """``(origin, dest, profile, time, cost, distance)`` rows for one origin"""
+        table = self.profiles[profile]
+        s = table.index[origin]
+        pred = table.tree(s)
+        # One walk of the tree serves every total and the fares
+        edges = table.graph.tree_edges(pred, s)
+        totals = tree_totals(table.graph, pred, s, arrays=self._weight_arrays(table.graph),
+                             edges=edges)
+        time, cost, distance = (totals[name] for name in MATRIX_WEIGHTS)
+        if self.fares is not None:
+            cost = self.fares.tree_fares(table.graph, pred, s, self.ticket_class, edges)
+
+        rows = []
+        for dest in destinations:
+            t = table.index.get(dest)
+            if t is None or time[t] is None:
+                rows.append((origin, dest, profile, None, None, None))
+            else:
+                rows.append((origin, dest, profile, time[t], cost[t], round(distance[t], 1)))
+        return rows
+
+    def rows(self, profiles, origins, destinations, workers=1):
+        """Yield one list of rows per (origin, profile), in origin order"""
+        jobs = [(profile, origin) for origin in origins for profile in profiles]
+        if workers <= 1 or len(origins) < 2 or 'fork' not in multiprocessing.get_all_start_methods():
+            for profile, origin in jobs:
+                yield self.origin_rows(profile, origin, destinations)
+            return
+
+        global _worker_engine, _worker_destinations
+        _worker_engine = self
+        _worker_destinations = destinations
+        context = multiprocessing.get_context('fork')
+        with context.Pool(workers) as pool:
+            chunksize = max(1, len(jobs) // (workers * 4))
+            for rows in pool.imap(_origin_rows, jobs, chunksize):
+                yield rows
+
+
+# Set in the parent just before forking the pool; read by the children
+_worker_engine = None
+_worker_destinations = None
+
+
+def _origin_rows(job):
+    profile, origin = job
+    return _worker_engine.origin_rows(profile, origin, _worker_destinations)
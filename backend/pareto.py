@@ -0,0 +1,207 @@
+"""
+Multi-criteria (time, cost, transfers, comfort) label search on a TransitGraph.
+
+One search returns the Pareto set of journeys between two stations: every
+journey for which no other is at least as fast, as cheap, needs as few
+changes and scores as well on the comfort weight.  It backs the trade-off
+options of /api/journey (include=options); the fastest, cheapest and most
+comfortable routes come from their own searches.  Labels add up per-hop
+weights, not slab fares or average comfort, so the caller filters the set
+again on the priced metrics it shows.
+
+Each station keeps a small "bag" of non-dominated labels.  A transfer is
+counted when a train edge is boarded on a different line than the label is
+currently riding, or when a rider walks off a train.  Changing lines also
+adds the station's change time, fare and comfort weight (see
+line_routing.LineModel), so labels on different lines are only comparable
+when one is ahead by a whole change.  Bags are capped at ``max_labels``;
+when full, a new label is only admitted if it beats the bag on time, cost
+or comfort, which keeps those three extremes exact.
+"""
+from heapq import heappush, heappop
+from itertools import count
+
+from line_routing import NO_LINE, LineModel
+from transit_graph import MODES
+
+METRO = MODES.index('Metro')
+TRANSFER = MODES.index('Transfer')
+
+INF = float('inf')
+
+
+class Label:
+    """One partial journey ending at ``station``"""
+    __slots__ = ('station', 'time', 'cost', 'transfers', 'line', 'comfort',
+                 'metro_time', 'parent', 'alive')
+
+    def __init__(self, station, time, cost, transfers, line, comfort, metro_time, parent):
+        self.station = station
+        self.time = time
+        self.cost = cost
+        self.transfers = transfers
+        self.line = line
+        self.comfort = comfort
+        self.metro_time = metro_time
+        self.parent = parent
+        self.alive = True
+
+    def dominates(self, other, change):
+        """True if self is at least as good as other in every criterion,
+        allowing for the change (``(time, cost, comfort)`` at this station)
+        self needs to continue on other's line.  A label riding no line
+        boards any train without one."""
+        if self.line == other.line or self.line == NO_LINE:
+            return (self.time <= other.time and self.cost <= other.cost
+                    and self.comfort <= other.comfort and self.transfers <= other.transfers)
+        time, cost, comfort = change
+        return (self.time + time <= other.time and self.cost + cost <= other.cost
+                and self.comfort + comfort <= other.comfort
+                and self.transfers + 1 <= other.transfers)
+
+    def covers(self, other):
+        """Dominance ignoring the current line, used at the target"""
+        return (self.time <= other.time and self.cost <= other.cost
+                and self.transfers <= other.transfers and self.comfort <= other.comfort)
+
+
+def _insert(bag, label, max_labels, change):
+    """Add label to a station bag unless dominated; False if rejected"""
+    for other in bag:
+        if other.dominates(label, change):
+            return False
+    survivors = []
+    for other in bag:
+        if label.dominates(other, change):
+            other.alive = False
+        else:
+            survivors.append(other)
+    if len(survivors) >= max_labels:
+        if label.time >= min(l.time for l in survivors) and \
+           label.cost >= min(l.cost for l in survivors) and \
+           label.comfort >= min(l.comfort for l in survivors):
+            return False
+        # Evict the slowest label that is neither the cheapest nor the most comfortable
+        keep = (min(survivors, key=lambda l: (l.cost, l.time)),
+                min(survivors, key=lambda l: (l.comfort, l.time)))
+        victim = max((l for l in survivors if l not in keep), key=lambda l: l.time)
+        victim.alive = False
+        survivors.remove(victim)
+    survivors.append(label)
+    bag[:] = survivors
+    return True
+
+
+def pareto_search(graph, src, dest, max_labels=8, bounds=None, model=None):
+    """Non-dominated labels at dest (sorted by time), or [] if unreachable.
+
+    ``bounds`` optionally gives ``(time, cost, comfort)`` lower bounds on the
+    remaining weight from every station ID to dest (e.g. rows of the
+    all-pairs route tables); labels that cannot beat the journeys already
+    found even at those bounds are pruned.  ``model`` is the graph's
+    LineModel (default: one from the graph alone, charging only the
+    junction self-loops); label lines are its line IDs.
+    """
+    s = graph.index.get(src)
+    t = graph.index.get(dest)
+    if s is None or t is None:
+        return []
+    max_labels = max(max_labels, 3)
+
+    offsets = graph.offsets
+    targets = graph.targets
+    mode = graph.mode
+    if model is None:
+        model = LineModel(graph)
+    edge_lines = model.edge_lines
+    change_time = model.change['time']
+    change_cost = model.change['cost']
+    change_comfort = model.change['comfort']
+    changes = list(zip(change_time, change_cost, change_comfort))
+    w_time = graph.weights['time']
+    w_cost = graph.weights['cost']
+    w_comfort = graph.weights['comfort']
+
+    if bounds is None:
+        zero = [0] * graph.size
+        bounds = (zero, zero, zero)
+    lb_time, lb_cost, lb_comfort = bounds
+
+    bags = [[] for _ in range(graph.size)]
+    results = []
+    c = count()
+
+    start = Label(s, 0, 0, 0, NO_LINE, 0, 0, None)
+    bags[s].append(start)
+    heap = [(0, 0, 0, next(c), start)]
+
+    while heap:
+        _, _, _, _, label = heappop(heap)
+        if not label.alive:
+            continue
+        v = label.station
+        if v == t:
+            results.append(label)
+            continue
+
+        for e in range(offsets[v], offsets[v + 1]):
+            u = targets[e]
+            if u == v:
+                # Junction self-loops are charged as line changes below
+                continue
+            lines = edge_lines[e]
+            if not lines:
+                # Walking link: ends the ride, the walk itself is the change
+                moves = ((NO_LINE, label.transfers + (label.line != NO_LINE), 0, 0, 0),)
+            elif len(lines) == 1 and (label.line == NO_LINE or lines[0] == label.line):
+                moves = ((lines[0], label.transfers, 0, 0, 0),)
+            else:
+                moves = [(l, label.transfers, 0, 0, 0)
+                         if label.line == NO_LINE or l == label.line else
+                         (l, label.transfers + 1, change_time[v], change_cost[v], change_comfort[v])
+                         for l in lines]
+            m = mode[e]
+            metro_time = label.metro_time + (w_time[e] if m == METRO else 0)
+            for new_line, transfers, extra_time, extra_cost, extra_comfort in moves:
+                time = label.time + w_time[e] + extra_time
+                cost = label.cost + w_cost[e] + extra_cost
+                comfort = label.comfort + w_comfort[e] + extra_comfort
+
+                # Target pruning: even at the lower bounds nothing reachable
+                # from here can beat the journeys already found
+                min_time = time + lb_time[u]
+                min_cost = cost + lb_cost[u]
+                min_comfort = comfort + lb_comfort[u]
+                if min_time == INF:
+                    continue
+                pruned = False
+                for done in bags[t]:
+                    if (done.time <= min_time and done.cost <= min_cost
+                            and done.transfers <= transfers and done.comfort <= min_comfort):
+                        pruned = True
+                        break
+                if pruned:
+                    continue
+
+                new = Label(u, time, cost, transfers, new_line, comfort, metro_time, label)
+                if _insert(bags[u], new, max_labels, changes[u]):
+                    heappush(heap, (time, cost, transfers, next(c), new))
+
+    # At the destination the current line no longer matters
+    results = [label for label in results if label.alive]
+    results.sort(key=lambda l: (l.time, l.cost, l.transfers))
+    front = []
+    for label in results:
+        if not any(kept.covers(label) for kept in front):
+            front.append(label)
+    return front
+
+
+def label_path(graph, label):
+    """Station names from the search source to label.station"""
+    path = []
+    while label is not None:
+        path.append(graph.stations[label.station])
+        label = label.parent
+    path.reverse()
+    return path
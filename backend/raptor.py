@@ -0,0 +1,381 @@
+"""
+Timetable-based earliest-arrival routing (RAPTOR).
+
+Instead of flat per-edge travel times, journeys are planned against actual
+train trips: a query for a departure time returns the earliest arrival,
+honouring headways, fast vs slow patterns and change times at stations.
+
+RAPTOR works in rounds: round k finds the best arrival at every station
+using at most k trips.  Each round scans every route pattern touched by a
+station improved in the previous round, hopping on the earliest catchable
+trip, then relaxes walking transfers.  No priority queue is needed and the
+data lives in flat arrays:
+
+* a *route* is a set of trips sharing one stop sequence (trips that would
+  overtake each other are split into separate routes, so every route is
+  FIFO);
+* stop times are stored position-major per route, so the departures of
+  all trips at one stop are a contiguous sorted run and the earliest
+  catchable trip is a bisect.
+
+Times are integer seconds after midnight of the service day (GTFS style,
+so values past 24:00 are allowed).
+"""
+from array import array
+from bisect import bisect_left
+import csv
+import os
+
+INF = float('inf')
+
+# Minimum time to change trains at a station with no explicit change time
+DEFAULT_CHANGE_SECONDS = 120
+
+
+def parse_time(value):
+    """'HH:MM' or 'HH:MM:SS' (hours may exceed 23) -> seconds"""
+    parts = [int(p) for p in value.strip().split(':')]
+    while len(parts) < 3:
+        parts.append(0)
+    return parts[0] * 3600 + parts[1] * 60 + parts[2]
+
+
+def format_time(seconds):
+    seconds = int(seconds)
+    return f"{(seconds // 3600) % 24:02d}:{(seconds // 60) % 60:02d}"
+
+
+class Timetable:
+    """Compact RAPTOR structures built from a list of trips.
+
+    ``trips`` is an iterable of ``(line, mode, stops, arrivals, departures)``
+    with station names and second offsets; ``footpaths`` is an iterable of
+    directed ``(from_station, to_station, seconds)`` walking links and
+    ``change_times`` maps a station to its minimum change time.
+    """
+
+    def __init__(self, trips, footpaths=(), change_times=None):
+        trips = list(trips)
+        footpaths = list(footpaths)
+        change_times = change_times or {}
+
+        stations = []
+        index = {}
+
+        def intern(name):
+            if name not in index:
+                index[name] = len(stations)
+                stations.append(name)
+            return index[name]
+
+        # Group trips by (line, mode, stop pattern)
+        patterns = {}
+        for line, mode, stops, arrivals, departures in trips:
+            key = (line, mode, tuple(intern(s) for s in stops))
+            patterns.setdefault(key, []).append((list(arrivals), list(departures)))
+        for u, v, _ in footpaths:
+            intern(u)
+            intern(v)
+
+        self.stations = stations
+        self.index = index
+        self.size = n = len(stations)
+
+        self.route_line = []
+        self.route_mode = []
+        self.route_stop_start = array('i')
+        self.route_length = array('i')
+        self.route_trips = array('i')
+        self.route_time_start = array('i')
+        self.route_stops = array('i')
+        self.arr = array('i')
+        self.dep = array('i')
+
+        for (line, mode, stops), pattern_trips in patterns.items():
+            for group in _fifo_groups(pattern_trips):
+                self._add_route(line, mode, stops, group)
+
+        # Routes serving each station: (route, position) pairs in CSR form
+        serving = [[] for _ in range(n)]
+        for r in range(len(self.route_line)):
+            start = self.route_stop_start[r]
+            for pos in range(self.route_length[r]):
+                serving[self.route_stops[start + pos]].append((r, pos))
+        self.stop_route_offsets = array('i', [0])
+        self.stop_route = array('i')
+        self.stop_route_pos = array('i')
+        for entries in serving:
+            for r, pos in entries:
+                self.stop_route.append(r)
+                self.stop_route_pos.append(pos)
+            self.stop_route_offsets.append(len(self.stop_route))
+
+        walks = [[] for _ in range(n)]
+        for u, v, seconds in footpaths:
+            walks[index[u]].append((index[v], int(seconds)))
+        self.foot_offsets = array('i', [0])
+        self.foot_targets = array('i')
+        self.foot_seconds = array('i')
+        for entries in walks:
+            for v, seconds in entries:
+                self.foot_targets.append(v)
+                self.foot_seconds.append(seconds)
+            self.foot_offsets.append(len(self.foot_targets))
+
+        self.change = array('i', [DEFAULT_CHANGE_SECONDS]) * n
+        for name, seconds in change_times.items():
+            if name in index:
+                self.change[index[name]] = int(seconds)
+
+    def _add_route(self, line, mode, stops, trips):
+        trips.sort(key=lambda trip: trip[1][0])
+        self.route_line.append(line)
+        self.route_mode.append(mode)
+        self.route_stop_start.append(len(self.route_stops))
+        self.route_length.append(len(stops))
+        self.route_trips.append(len(trips))
+        self.route_time_start.append(len(self.arr))
+        self.route_stops.extend(stops)
+        for pos in range(len(stops)):
+            self.arr.extend(trip[0][pos] for trip in trips)
+            self.dep.extend(trip[1][pos] for trip in trips)
+
+    @property
+    def num_routes(self):
+        return len(self.route_line)
+
+    @property
+    def num_trips(self):
+        return sum(self.route_trips)
+
+    def earliest_arrival(self, source, target, depart_at, max_rounds=6):
+        """Earliest-arrival journey from source to target leaving at or
+        after ``depart_at`` (seconds), using at most ``max_rounds`` trips.
+
+        Returns a dict with the legs of the journey, or None if the target
+        cannot be reached.
+        """
+        s = self.index.get(source)
+        t = self.index.get(target)
+        if s is None or t is None:
+            return None
+
+        n = self.size
+        route_stops = self.route_stops
+        stop_route = self.stop_route
+        stop_route_pos = self.stop_route_pos
+        stop_route_offsets = self.stop_route_offsets
+        arr_times = self.arr
+        dep_times = self.dep
+        change = self.change
+
+        best = [INF] * n
+        arrival = [INF] * n
+        ready = [INF] * n
+        parent = {}
+        best[s] = arrival[s] = ready[s] = depart_at
+        marked = {s}
+        self._relax_footpaths(marked, arrival, ready, best, parent, t)
+        rounds = [(arrival, parent)]
+
+        for _ in range(max_rounds):
+            prev_ready = ready
+            arrival = [INF] * n
+            ready = [INF] * n
+            parent = {}
+
+            # Earliest marked position on every route touching a marked stop
+            queue = {}
+            for p in marked:
+                for i in range(stop_route_offsets[p], stop_route_offsets[p + 1]):
+                    r = stop_route[i]
+                    pos = stop_route_pos[i]
+                    if pos < queue.get(r, n + 1):
+                        queue[r] = pos
+            marked = set()
+
+            for r, first in queue.items():
+                start = self.route_stop_start[r]
+                base = self.route_time_start[r]
+                trips = self.route_trips[r]
+                trip = -1
+                board = -1
+                for pos in range(first, self.route_length[r]):
+                    p = route_stops[start + pos]
+                    column = base + pos * trips
+                    if trip >= 0:
+                        a = arr_times[column + trip]
+                        if a < best[p] and a < best[t]:
+                            best[p] = arrival[p] = a
+                            ready[p] = a + change[p]
+                            parent[p] = ('ride', r, trip, board, pos)
+                            marked.add(p)
+                    # Can an earlier trip be caught here?
+                    rp = prev_ready[p]
+                    if rp != INF and (trip < 0 or rp <= dep_times[column + trip]):
+                        j = bisect_left(dep_times, rp, column, column + trips) - column
+                        if j < trips and (trip < 0 or j < trip):
+                            trip = j
+                            board = pos
+
+            self._relax_footpaths(marked, arrival, ready, best, parent, t)
+            rounds.append((arrival, parent))
+            if not marked:
+                break
+
+        if best[t] == INF:
+            return None
+        return self._journey(rounds, s, t, depart_at)
+
+    def _relax_footpaths(self, marked, arrival, ready, best, parent, target):
+        for p in list(marked):
+            for i in range(self.foot_offsets[p], self.foot_offsets[p + 1]):
+                q = self.foot_targets[i]
+                a = arrival[p] + self.foot_seconds[i]
+                if a < best[q] and a < best[target]:
+                    best[q] = arrival[q] = ready[q] = a
+                    parent[q] = ('walk', p)
+                    marked.add(q)
+
+    def _journey(self, rounds, s, t, depart_at):
+        k = max(i for i, (arrival, _) in enumerate(rounds) if arrival[t] != INF)
+        legs = []
+        p = t
+        while not (k == 0 and p == s):
+            arrival, parent = rounds[k]
+            step = parent[p]
+            if step[0] == 'walk':
+                q = step[1]
+                legs.append({
+                    'mode': 'Walk',
+                    'line': 'Transfer',
+                    'from': self.stations[q],
+                    'to': self.stations[p],
+                    'depart': arrival[q],
+                    'arrive': arrival[p],
+                    'stops': 0
+                })
+                p = q
+            else:
+                _, r, trip, board, alight = step
+                start = self.route_stop_start[r]
+                base = self.route_time_start[r]
+                trips = self.route_trips[r]
+                q = self.route_stops[start + board]
+                legs.append({
+                    'mode': self.route_mode[r],
+                    'line': self.route_line[r],
+                    'from': self.stations[q],
+                    'to': self.stations[p],
+                    'depart': self.dep[base + board * trips + trip],
+                    'arrive': self.arr[base + alight * trips + trip],
+                    'stops': alight - board
+                })
+                p = q
+                k -= 1
+        legs.reverse()
+
+        rides = [leg for leg in legs if leg['mode'] != 'Walk']
+        arrive = legs[-1]['arrive'] if legs else depart_at
+        return {
+            'legs': legs,
+            'depart_at': depart_at,
+            'arrive_at': arrive,
+            'duration': arrive - depart_at,
+            'transfers': max(len(rides) - 1, 0)
+        }
+
+
+def _fifo_groups(trips):
+    """Split trips of one stop pattern into groups with no overtaking"""
+    groups = []
+    for trip in sorted(trips, key=lambda trip: trip[1][0]):
+        for group in groups:
+            last = group[-1]
+            if all(a >= b for a, b in zip(trip[0], last[0])) and \
+               all(a >= b for a, b in zip(trip[1], last[1])):
+                group.append(trip)
+                break
+        else:
+            groups.append([trip])
+    return groups
+
+
+def synthetic_trips(pattern, full_line, line, mode, minutes_per_stop, service, dwell_seconds=20):
+    """Generate both directions of a line's trips from a headway table.
+
+    ``pattern`` is the list of stations served (all of ``full_line`` for a
+    slow train, a subset for a fast one); running time between served
+    stations is ``minutes_per_stop`` per station of ``full_line`` passed.
+    ``service`` is a list of ``(start_minute, end_minute, headway_minutes)``
+    periods for departures from the first station.
+    """
+    trips = []
+    for stops in (list(pattern), list(reversed(pattern))):
+        positions = [full_line.index(stop) for stop in stops]
+        offsets = [0]
+        for a, b in zip(positions, positions[1:]):
+            offsets.append(offsets[-1] + abs(b - a) * minutes_per_stop * 60 + dwell_seconds)
+        for start, end, headway in service:
+            minute = start
+            while minute < end:
+                first = minute * 60
+                arrivals = [first + o for o in offsets]
+                departures = [a + dwell_seconds if i else a for i, a in enumerate(arrivals)]
+                departures[-1] = arrivals[-1]
+                trips.append((line, mode, stops, arrivals, departures))
+                minute += headway
+    return trips
+
+
+def load_gtfs(directory):
+    """Read a GTFS-like CSV bundle into a Timetable.
+
+    Uses stops.txt (stop_id, stop_name), routes.txt (route_id,
+    route_long_name or route_short_name, route_type), trips.txt
+    (route_id, trip_id), stop_times.txt (trip_id, arrival_time,
+    departure_time, stop_id, stop_sequence) and optionally transfers.txt
+    (from_stop_id, to_stop_id, min_transfer_time).  A transfer from a stop
+    to itself sets that station's change time.
+    """
+    def rows(name):
+        with open(os.path.join(directory, name), newline='', encoding='utf-8') as f:
+            return list(csv.DictReader(f))
+
+    stop_names = {row['stop_id']: row['stop_name'] for row in rows('stops.txt')}
+    route_info = {}
+    for row in rows('routes.txt'):
+        name = row.get('route_long_name') or row.get('route_short_name') or row['route_id']
+        mode = 'Metro' if row.get('route_type') == '1' else 'Local Train'
+        route_info[row['route_id']] = (name, mode)
+    trip_route = {row['trip_id']: row['route_id'] for row in rows('trips.txt')}
+
+    stop_times = {}
+    for row in rows('stop_times.txt'):
+        stop_times.setdefault(row['trip_id'], []).append((
+            int(row['stop_sequence']),
+            stop_names[row['stop_id']],
+            parse_time(row['arrival_time']),
+            parse_time(row['departure_time']),
+        ))
+
+    trips = []
+    for trip_id, times in stop_times.items():
+        times.sort()
+        line, mode = route_info[trip_route[trip_id]]
+        trips.append((line, mode,
+                      [t[1] for t in times], [t[2] for t in times], [t[3] for t in times]))
+
+    footpaths = []
+    change_times = {}
+    if os.path.exists(os.path.join(directory, 'transfers.txt')):
+        for row in rows('transfers.txt'):
+            u = stop_names[row['from_stop_id']]
+            v = stop_names[row['to_stop_id']]
+            seconds = int(row.get('min_transfer_time') or 0)
+            if u == v:
+                change_times[u] = seconds
+            else:
+                footpaths.append((u, v, seconds))
+
+    return Timetable(trips, footpaths, change_times)
@@ -0,0 +1,172 @@
+"""
+Budget-bounded reachability ("isochrone") search on a TransitGraph.
+
+Answers "which stations can I reach from Thane within 45 minutes (or
+₹30)?" with one multi-source Dijkstra instead of one journey query per
+candidate station.  Every origin starts at zero, so each station is
+reached from whichever origin serves it best.  Stations are ordered by
+the routing profile's own weight, and each one's time, fare and number of
+line changes are carried along the search tree.  That is the profile's
+route-table route; its time is ride and walk time, without the
+line-change time /api/journey charges (see line_routing.py).
+
+A budget on the search weight itself (minutes on a time search, rupees on
+a fare search) stops the search as soon as the next station is over it.
+Budgets on any other total are monotone along every path, so stations
+over them are dropped from the result.  They are still expanded, so no
+station is reported with a route other than the profile's own.  A line
+change is boarding a train on another line than the edge last ridden
+(walking links are free of it).
+
+With slab fare tables (see fares.py) the fare is priced per ticket along
+the tree, as FareTable.tree_fares does: the open ticket's mode and km
+travel with each station.  The cheapest profile is not a tree of per-hop
+weights at all: ``reachable_fares`` takes every station's least-fare
+journey from FareTable's label search, which stops at the fare budget.
+"""
+import math
+from heapq import heappush, heappop
+from itertools import count
+
+from fares import NO_LEG, FareTable
+from od_matrix import exact_weights
+from pareto import NO_LINE, TRANSFER
+
+INF = float('inf')
+
+# Totals reported per reachable station
+REACH_WEIGHTS = ('time', 'cost')
+
+
+def reachable(graph, weight, sources, limits, arrays=None, tables=None):
+    """Stations reachable from any of ``sources`` (station IDs).
+
+    ``weight`` is the search weight and ``limits`` maps weights in
+    REACH_WEIGHTS (or ``weight``) to a maximum total.  ``arrays``
+    optionally gives the per-edge values of REACH_WEIGHTS (default:
+    exact_weights of the graph).  ``tables`` optionally gives the slab
+    fare table per mode ID (FareTable.edge_tables, None for walking);
+    without it the cost is the sum of the per-edge values.  Returns a
+    list of ``(station, origin, time, cost, transfers)`` tuples in search
+    order (nearest first).
+    """
+    if arrays is None:
+        arrays = [exact_weights(graph, name) for name in REACH_WEIGHTS]
+    w_time, w_cost = arrays
+    w = graph.weights[weight]
+    offsets = graph.offsets
+    targets = graph.targets
+    mode = graph.mode
+    line = graph.line
+
+    slab_fare = FareTable.slab_fare
+    distance = graph.weights['distance']
+    if tables is not None and weight == 'cost':
+        stop_at = INF
+    else:
+        stop_at = limits.get(weight, INF)
+    max_time = limits.get('time', INF)
+    max_cost = limits.get('cost', INF)
+
+    n = graph.size
+    seen = [INF] * n
+    done = bytearray(n)
+    # Totals of the best label so far per station: origin, time, cost,
+    # transfers, line being ridden
+    state = [None] * n
+    # With slab fares, each station is priced once when settled, from its
+    # tree parent: the edge it was reached by, fares of finished tickets,
+    # the open ticket's mode and km, and the fare including it
+    via = [-1] * n
+    parent = [-1] * n
+    closed = [0] * n
+    leg = [NO_LEG] * n
+    km = [0.0] * n
+    paid = [0] * n
+
+    c = count()
+    heap = []
+    for s in sources:
+        if seen[s] > 0:
+            seen[s] = 0
+            state[s] = (s, 0, 0, 0, NO_LINE)
+            heappush(heap, (0, next(c), s))
+
+    result = []
+    while heap:
+        d, _, v = heappop(heap)
+        if done[v]:
+            continue
+        if d > stop_at:
+            break
+        done[v] = 1
+        origin, t, cost, transfers, riding = state[v]
+        e = via[v]
+        if tables is not None and e >= 0:
+            p = parent[v]
+            m = mode[e]
+            if tables[m] is None:
+                closed[v] = cost = paid[p]
+            else:
+                if m == leg[p]:
+                    closed[v] = closed[p]
+                    km[v] = km[p] + distance[e]
+                else:
+                    closed[v] = paid[p]
+                    km[v] = distance[e]
+                leg[v] = m
+                cost = closed[v] + slab_fare(tables[m], km[v])
+            paid[v] = cost
+        if t <= max_time and cost <= max_cost:
+            result.append((v, origin, t, cost, transfers))
+        for e in range(offsets[v], offsets[v + 1]):
+            u = targets[e]
+            if done[u]:
+                continue
+            du = d + w[e]
+            if du < seen[u]:
+                seen[u] = du
+                via[u] = e
+                parent[u] = v
+                if mode[e] == TRANSFER:
+                    state[u] = (origin, t + w_time[e], cost + w_cost[e], transfers, riding)
+                else:
+                    changes = transfers + (riding != NO_LINE and riding != line[e])
+                    state[u] = (origin, t + w_time[e], cost + w_cost[e], changes, line[e])
+                heappush(heap, (du, next(c), u))
+    return result
+
+
+def reachable_fares(fares, graph, sources, limits, ticket_class):
+    """Stations reachable from any of ``sources`` (station IDs) by their
+    least-fare journey (the fastest among equal fares), as ``reachable``
+    reports them: ``(station, origin, time, cost, transfers)`` tuples,
+    cheapest first.  A fare limit stops the search; a time limit only
+    drops stations."""
+    max_fare = limits.get('cost', INF)
+    max_time = limits.get('time', INF)
+    line = graph.line
+    mode = graph.mode
+
+    settled = bytearray(graph.size)
+    left = graph.size
+    result = []
+    for label in fares.labels(graph, dict.fromkeys(sources, 0), ticket_class,
+                              below=math.nextafter(max_fare, INF)):
+        v = label.station
+        if settled[v]:
+            continue
+        settled[v] = 1
+        left -= 1
+        if label.time <= max_time:
+            riding, transfers = NO_LINE, 0
+            for e in label.edges():
+                if mode[e] != TRANSFER:
+                    transfers += riding != NO_LINE and riding != line[e]
+                    riding = line[e]
+            t = label.time
+            result.append((v, label.path()[0], int(t) if t == int(t) else t, label.fare,
+                           transfers))
+        if not left:
+            break
+    return result
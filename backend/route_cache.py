@@ -0,0 +1,129 @@
+"""
+Bounded LRU cache for journey responses.
+
+Origin/destination demand is heavily skewed, so most requests ask for a
+handful of station pairs.  Entries are keyed on the canonical station names
+(after normalize_station) plus the route type, and tagged with the network
+version they were computed against: when the version moves forward the
+whole cache is dropped, so a stale route is never served, and results from
+requests still running on an older version are not stored.
+
+A disruption overlay moves the version forward without changing most
+routes, so entries can also carry tags (the origin-destination pair, the
+edges their routes use): ``revise`` adopts the new version but drops only
+the entries tagged with something that changed, plus every untagged one.
+"""
+from collections import OrderedDict
+import threading
+
+
+class RouteCache:
+    """Thread-safe LRU mapping of key -> value with hit/miss/eviction/
+    invalidation counters"""
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        # key -> tags (None if untagged), tag -> keys
+        self._tags = {}
+        self._tagged = {}
+        self._lock = threading.Lock()
+
+    def _check_version(self, version):
+        """Adopt a newer network version, dropping every entry.  False if
+        version is older than the cache's (a request still finishing on a
+        replaced network), which must neither read nor write entries."""
+        if version != self.version:
+            if self.version is not None and version < self.version:
+                return False
+            self._entries.clear()
+            self._tags.clear()
+            self._tagged.clear()
+            self.version = version
+        return True
+
+    def get(self, key, version):
+        """Cached value for key under this network version, or None"""
+        with self._lock:
+            if not self._check_version(version):
+                self.misses += 1
+                return None
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, version, tags=None):
+        """Store value; ``tags`` (hashable) let revise() drop it selectively"""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            if not self._check_version(version):
+                return
+            self._discard(key)
+            self._entries[key] = value
+            if tags is not None:
+                tags = frozenset(tags)
+                for tag in tags:
+                    self._tagged.setdefault(tag, set()).add(key)
+            self._tags[key] = tags
+            while len(self._entries) > self.maxsize:
+                self._discard(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _discard(self, key):
+        if self._entries.pop(key, None) is None:
+            return False
+        for tag in self._tags.pop(key, None) or ():
+            keys = self._tagged[tag]
+            keys.discard(key)
+            if not keys:
+                del self._tagged[tag]
+        return True
+
+    def revise(self, version, tags):
+        """Adopt a newer version of the same network, dropping only the
+        entries carrying one of ``tags`` (every entry if tags is None) and
+        the untagged ones.  Returns how many were dropped."""
+        with self._lock:
+            if self.version is not None and version < self.version:
+                return 0
+            self.version = version
+            if tags is None:
+                stale = list(self._entries)
+            else:
+                stale = {key for key, key_tags in self._tags.items() if key_tags is None}
+                for tag in tags:
+                    stale.update(self._tagged.get(tag, ()))
+            for key in stale:
+                self._discard(key)
+            self.invalidations += len(stale)
+            return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+            self._tagged.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0,
+                'network_version': self.version
+            }
@@ -0,0 +1,232 @@
+"""
+Precomputed all-pairs routing tables.
+
+The station graph is static once app.py has built it, so instead of running
+Dijkstra on every request we run it once per source station and keep the
+resulting shortest-path trees.  A query is then just a walk back along the
+predecessor row of the source: O(path length), no heap, no graph traversal.
+Networks too large for O(stations^2) tables use a contraction hierarchy
+per profile instead (see contraction.py), behind the same interface.
+
+When a live disruption changes some edge weights, a table is updated
+rather than rebuilt: only sources whose tree used an edge that got worse,
+or that an edge which got better now shortens, are searched again.
+"""
+from array import array
+import threading
+
+from contraction import ContractionHierarchy
+from transit_graph import INF, NO_STATION
+
+
+class RouteTable:
+    """All-pairs shortest-path trees for one weight profile.
+
+    Built from a TransitGraph, sharing its integer station IDs.  For a
+    table of n stations, ``pred[s * n + t]`` is the station just before
+    ``t`` on the best path from ``s`` (``NO_STATION`` if unreachable) and
+    ``dist[s * n + t]`` is the total weight of that path.
+    """
+
+    def __init__(self, graph, weight):
+        self.graph = graph
+        self.stations = graph.stations
+        self.index = graph.index
+
+        n = graph.size
+        self.size = n
+        self.pred = array('i', [NO_STATION]) * (n * n)
+        self.dist = array('d', [INF]) * (n * n)
+
+        for s in range(n):
+            dist, pred = graph.dijkstra(weight, s)
+            row = s * n
+            self.dist[row:row + n] = array('d', dist)
+            self.pred[row:row + n] = array('i', pred)
+
+    @classmethod
+    def from_arrays(cls, graph, pred, dist):
+        """Wrap prebuilt pred/dist tables for graph (e.g. from a memory map)"""
+        table = cls.__new__(cls)
+        table.graph = graph
+        table.stations = graph.stations
+        table.index = graph.index
+        table.size = graph.size
+        table.pred = pred
+        table.dist = dist
+        return table
+
+    def updated(self, graph, weight, raised, lowered):
+        """This table for graph, the same stations and edges with some
+        weights changed (``raised`` / ``lowered``: CSR slots whose weight
+        went up / down).
+
+        Returns ``(table, changed)``, ``changed`` listing the ``(source,
+        target)`` ID pairs whose path or distance is now different.
+        Distances are exact; a re-run source can break a tie differently
+        than before.
+        """
+        n = self.size
+        pred = self.pred
+        dist = self.dist
+        w = graph.weights[weight]
+
+        sources = set()
+        for e in raised:
+            a, b = graph.edge_tail(e), graph.targets[e]
+            sources.update(s for s in range(n) if pred[s * n + b] == a)
+        for e in lowered:
+            a, b = graph.edge_tail(e), graph.targets[e]
+            sources.update(s for s in range(n) if dist[s * n + a] + w[e] < dist[s * n + b])
+
+        table = RouteTable.from_arrays(graph, array('i', pred), array('d', dist))
+        changed = []
+        for s in sorted(sources):
+            row = s * n
+            new_dist, new_pred = graph.dijkstra(weight, s)
+            changed.extend((s, t) for t in _changed_targets(
+                s, pred[row:row + n], dist[row:row + n], new_pred, new_dist))
+            table.dist[row:row + n] = array('d', new_dist)
+            table.pred[row:row + n] = array('i', new_pred)
+        return table, changed
+
+    def row(self, station):
+        """Best weight from station to every station ID (an array slice)"""
+        s = self.index[station]
+        return self.dist[s * self.size:(s + 1) * self.size]
+
+    def tree(self, s):
+        """Predecessor row of the shortest-path tree from station ID s"""
+        return self.pred[s * self.size:(s + 1) * self.size]
+
+    def has_path(self, src, dest):
+        s = self.index.get(src)
+        t = self.index.get(dest)
+        if s is None or t is None:
+            return False
+        return self.dist[s * self.size + t] != INF
+
+    def path(self, src, dest):
+        """Return the station list from src to dest, or None if unreachable"""
+        s = self.index.get(src)
+        t = self.index.get(dest)
+        if s is None or t is None:
+            return None
+
+        row = s * self.size
+        if self.dist[row + t] == INF:
+            return None
+
+        path = [t]
+        while t != s:
+            t = self.pred[row + t]
+            path.append(t)
+        path.reverse()
+        return [self.stations[i] for i in path]
+
+
+def _changed_targets(s, old_pred, old_dist, pred, dist):
+    """Targets whose path from s differs between two shortest-path trees
+    (a different distance or predecessor anywhere along the new path)"""
+    changed = [None] * len(pred)
+    changed[s] = False
+    for t in range(len(pred)):
+        walked = []
+        v = t
+        while True:
+            if v == NO_STATION:
+                result = False
+                break
+            if changed[v] is not None:
+                result = changed[v]
+                break
+            if pred[v] != old_pred[v] or dist[v] != old_dist[v]:
+                changed[v] = result = True
+                break
+            walked.append(v)
+            v = pred[v]
+        for v in walked:
+            changed[v] = result
+    return [t for t in range(len(pred)) if changed[t]]
+
+
+class SearchTable:
+    """The RouteTable interface answered by one Dijkstra per query.
+
+    Used for a disrupted profile of a network routed on contraction
+    hierarchies: the hierarchy no longer matches the weights, and
+    rebuilding it for an incident that may last an hour is not worth it.
+    """
+
+    def __init__(self, graph, weight):
+        self.graph = graph
+        self.weight = weight
+        self.stations = graph.stations
+        self.index = graph.index
+        self.size = graph.size
+        self.component = graph.connected_components()
+
+    def row(self, station):
+        return self.graph.dijkstra(self.weight, self.index[station])[0]
+
+    def tree(self, s):
+        return self.graph.dijkstra(self.weight, s)[1]
+
+    def has_path(self, src, dest):
+        s = self.index.get(src)
+        t = self.index.get(dest)
+        if s is None or t is None:
+            return False
+        return self.component[s] == self.component[t]
+
+    def path(self, src, dest):
+        if not self.has_path(src, dest):
+            return None
+        return self.graph.shortest_path(self.weight, src, dest)
+
+
+class RouteTables:
+    """Lazily built RouteTable per named profile.
+
+    ``profiles`` maps a profile name to a zero-argument callable returning
+    ``(graph, weight)``; the table is built the first time it is asked for.
+    With ``hierarchical`` set each profile gets a ContractionHierarchy
+    instead of an all-pairs RouteTable.
+    """
+
+    def __init__(self, profiles, hierarchical=False):
+        self.profiles = profiles
+        self.hierarchical = hierarchical
+        self._tables = {}
+        self._lock = threading.Lock()
+
+    def get(self, profile):
+        table = self._tables.get(profile)
+        if table is None:
+            with self._lock:
+                table = self._tables.get(profile)
+                if table is None:
+                    graph, weight = self.profiles[profile]()
+                    if self.hierarchical:
+                        table = ContractionHierarchy(graph, weight)
+                    else:
+                        table = RouteTable(graph, weight)
+                    self._tables[profile] = table
+        return table
+
+    def peek(self, profile):
+        """The table for profile if it is built, else None"""
+        return self._tables.get(profile)
+
+    def preload(self, profile, table):
+        """Use an already built table for profile"""
+        with self._lock:
+            self._tables[profile] = table
+
+    def build_all(self):
+        """Eagerly build every profile (e.g. at worker startup)"""
+        for profile in self.profiles:
+            self.get(profile)
+
+    def path(self, profile, src, dest):
+        return self.get(profile).path(src, dest)
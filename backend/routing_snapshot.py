@@ -0,0 +1,228 @@
+"""
+Routing snapshot shared by every worker process through a memory map.
+
+Each gunicorn worker used to build its own mode views and all-pairs route
+tables, so memory grew with the worker count and every new worker paid for
+the build before serving.  Instead the first worker to need a network
+writes the CSR arrays of every view and the pred/dist arrays of every
+route table to one flat file; every worker (including that one) then
+memory-maps the file read-only and wraps typed memoryviews around it
+(TransitGraph.from_arrays / RouteTable.from_arrays).  The pages live once
+in the OS page cache whatever the number of workers.  On networks routed
+with contraction hierarchies the upward graph of each profile is stored
+instead of pred/dist tables, so the hierarchy is built once, not per worker.
+
+Layout: magic, u16 format, u32 header length, a JSON header (key, byte
+order, per-view station and line names, and the offset/typecode/count of
+every array), then the arrays, each 8-byte aligned.  The file name carries
+a key hashed from the network data, the profiles and every edge weight, so
+a new network or changed weight function gets a new file; concurrent
+builders are serialized with a lock file and publish with an atomic rename.
+A process only ever deletes snapshot files it wrote itself, so another
+app sharing the directory keeps its own.
+"""
+from array import array
+from contextlib import contextmanager
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, last writer wins
+    fcntl = None
+
+from contraction import ContractionHierarchy
+from route_table import RouteTable
+from transit_graph import TransitGraph
+
+SNAPSHOT_MAGIC = b'MJRS'
+SNAPSHOT_FORMAT = 2
+_PREAMBLE = struct.Struct('<4sHI')
+
+# Snapshot files this process wrote (the only ones it may delete)
+_written = set()
+
+
+def snapshot_key(spec, graph, weights, profiles, routing='tables'):
+    """Hex digest identifying everything a snapshot file is built from
+    (``routing``: 'tables' or 'hierarchies')"""
+    digest = hashlib.sha256()
+    digest.update(f'{SNAPSHOT_FORMAT}:{sys.byteorder}:{routing}'.encode())
+    digest.update(json.dumps(spec, sort_keys=True).encode('utf-8'))
+    digest.update(json.dumps(sorted(profiles.items())).encode('utf-8'))
+    values = array('d')
+    for u, v, d in graph.edges(data=True):
+        for weight in weights.values():
+            values.append(weight(u, v, d) if callable(weight) else d[weight])
+    digest.update(values.tobytes())
+    return digest.hexdigest()
+
+
+def write_snapshot(path, key, views, tables):
+    """Write views ({name: TransitGraph}) and tables ({profile: (view name,
+    RouteTable or ContractionHierarchy)}) to path"""
+    sections = []
+    directory = {'views': {}, 'tables': {}}
+    offset = 0
+
+    def add(values):
+        nonlocal offset
+        data = values.tobytes()
+        entry = [offset, values.typecode, len(values)]
+        sections.append((offset, data))
+        offset += len(data) + (-len(data) % 8)
+        return entry
+
+    for name, graph in views.items():
+        directory['views'][name] = {
+            'stations': graph.stations,
+            'lines': graph.lines,
+            'offsets': add(graph.offsets),
+            'targets': add(graph.targets),
+            'mode': add(graph.mode),
+            'line': add(graph.line),
+            'weights': {w: add(values) for w, values in graph.weights.items()},
+        }
+    for profile, (view, table) in tables.items():
+        if isinstance(table, ContractionHierarchy):
+            directory['tables'][profile] = {
+                'view': view,
+                'kind': 'hierarchy',
+                'weight': table.weight_name,
+                'rank': add(table.rank),
+                'offsets': add(table.offsets),
+                'targets': add(table.targets),
+                'weights': add(table.weight),
+                'middle': add(table.middle),
+            }
+        else:
+            directory['tables'][profile] = {
+                'view': view,
+                'kind': 'table',
+                'pred': add(table.pred),
+                'dist': add(table.dist),
+            }
+
+    header = json.dumps({
+        'key': key,
+        'byteorder': sys.byteorder,
+        **directory,
+    }).encode('utf-8')
+    start = _PREAMBLE.size + len(header)
+    start += -start % 8
+
+    with open(path, 'wb') as f:
+        f.write(_PREAMBLE.pack(SNAPSHOT_MAGIC, SNAPSHOT_FORMAT, len(header)))
+        f.write(header)
+        for section_offset, data in sections:
+            f.seek(start + section_offset)
+            f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+class MappedRouting:
+    """Views and route tables backed by a read-only memory map"""
+
+    def __init__(self, path, key=None):
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.path = path
+        buffer = memoryview(self.map)
+
+        magic, fmt, header_len = _PREAMBLE.unpack_from(buffer, 0)
+        if magic != SNAPSHOT_MAGIC or fmt != SNAPSHOT_FORMAT:
+            raise ValueError(f'{path}: not a routing snapshot (format {fmt})')
+        header = json.loads(bytes(buffer[_PREAMBLE.size:_PREAMBLE.size + header_len]))
+        if header['byteorder'] != sys.byteorder:
+            raise ValueError(f'{path}: written on a {header["byteorder"]}-endian machine')
+        if key is not None and header['key'] != key:
+            raise ValueError(f'{path}: built for a different network')
+        self.key = header['key']
+        start = _PREAMBLE.size + header_len
+        start += -start % 8
+
+        def view(entry):
+            offset, typecode, count = entry
+            size = array(typecode).itemsize
+            return buffer[start + offset:start + offset + size * count].cast(typecode)
+
+        self.views = {}
+        for name, v in header['views'].items():
+            self.views[name] = TransitGraph.from_arrays(
+                v['stations'], v['lines'], view(v['offsets']), view(v['targets']),
+                view(v['mode']), view(v['line']),
+                {w: view(entry) for w, entry in v['weights'].items()},
+            )
+        self.tables = {}
+        for profile, t in header['tables'].items():
+            if t['kind'] == 'hierarchy':
+                self.tables[profile] = ContractionHierarchy.from_arrays(
+                    self.views[t['view']], t['weight'], view(t['rank']), view(t['offsets']),
+                    view(t['targets']), view(t['weights']), view(t['middle'])
+                )
+            else:
+                self.tables[profile] = RouteTable.from_arrays(
+                    self.views[t['view']], view(t['pred']), view(t['dist'])
+                )
+        self.size = len(self.map)
+
+
+@contextmanager
+def file_lock(path):
+    """Exclusive cross-process lock held while the block runs (path is
+    the lock file, created if missing)"""
+    with open(path, 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _open(path, key):
+    try:
+        return MappedRouting(path, key)
+    except (OSError, ValueError, KeyError, struct.error):
+        return None
+
+
+def load_or_build(directory, key, build):
+    """Map the snapshot for key from directory, building it first if needed.
+
+    ``build()`` returns ``(views, tables)`` as taken by write_snapshot and
+    is only called by the one process that finds no valid file.  Returns
+    ``(MappedRouting, built)``.
+    """
+    path = os.path.join(directory, f'routing-{key[:16]}.snap')
+    mapped = _open(path, key)
+    if mapped is not None:
+        return mapped, False
+
+    os.makedirs(directory, exist_ok=True)
+    with file_lock(path + '.lock'):
+        mapped = _open(path, key)
+        if mapped is not None:
+            return mapped, False
+        views, tables = build()
+        tmp = f'{path}.{os.getpid()}.tmp'
+        write_snapshot(tmp, key, views, tables)
+        os.replace(tmp, path)
+
+    # Snapshots this process wrote before are no longer needed by new
+    # loads; processes that still map one keep it alive until they let go
+    for old in _written - {path}:
+        for name in (old, old + '.lock'):
+            try:
+                os.remove(name)
+            except OSError:
+                pass
+    _written.clear()
+    _written.add(path)
+    return MappedRouting(path, key), True
@@ -0,0 +1,86 @@
+"""
+Single-flight coalescing of identical concurrent computations.
+
+A burst of identical journey queries (one station pair fired by many
+clients at once) would otherwise run the same route search in every
+thread before the first result reaches the route cache.  Here the first
+caller for a key computes it and later callers wait for that result.  If
+the computation raises, every waiter raises the same error.  A waiter that
+gives up after ``timeout`` seconds computes the value itself, so a stuck
+leader delays a request but never fails it.
+
+Coalescing is per process: it helps threads of one worker (gunicorn's
+gthread class), while separate worker processes each run their own copy.
+"""
+import threading
+
+
+class _Call:
+    """One in-flight computation"""
+    __slots__ = ('done', 'value', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Thread-safe key -> in-flight computation map with counters"""
+
+    def __init__(self, timeout=10.0):
+        self.timeout = timeout
+        self.leaders = 0
+        self.coalesced = 0
+        self.timeouts = 0
+        self.errors = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """fn(), shared with every concurrent call for the same key"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                call.waiters += 1
+
+        if leader:
+            try:
+                call.value = fn()
+                return call.value
+            except BaseException as e:
+                call.error = e
+                raise
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+
+        if not call.done.wait(self.timeout):
+            with self._lock:
+                self.timeouts += 1
+            return fn()
+        with self._lock:
+            if call.error is not None:
+                self.errors += 1
+            else:
+                self.coalesced += 1
+        if call.error is not None:
+            raise call.error
+        return call.value
+
+    def stats(self):
+        with self._lock:
+            return {
+                'in_flight': len(self._calls),
+                'waiting': sum(call.waiters for call in self._calls.values()),
+                'leaders': self.leaders,
+                'coalesced': self.coalesced,
+                'timeouts': self.timeouts,
+                'errors': self.errors,
+            }
@@ -0,0 +1,83 @@
+"""
+Station name index for name resolution and autocomplete.
+
+Exact (case-insensitive) names and aliases resolve through a dict in O(1).
+Prefix queries use a sorted array of lowercase keys (full names, aliases and
+the start of every word in a name) searched with bisect, so "nagar" finds
+"D.N. Nagar" and "vt" finds "CSMT".  A substring scan is only used as a
+last resort when the prefix pass does not fill the result list.
+"""
+from bisect import bisect_left
+import re
+
+# Ranking tiers, best first
+EXACT = 0
+PREFIX = 1
+ALIAS_PREFIX = 2
+WORD_PREFIX = 3
+SUBSTRING = 4
+
+WORD_START = re.compile(r'(?<=[\s.\-(])\w')
+
+
+class StationIndex:
+    """Lookup structure over a fixed set of canonical station names"""
+
+    def __init__(self, stations, aliases=None):
+        stations = list(stations)
+        known = set(stations)
+        aliases = {alias: name for alias, name in (aliases or {}).items() if name in known}
+
+        self.exact = {name.lower(): name for name in stations}
+        for alias, name in aliases.items():
+            self.exact.setdefault(alias.lower(), name)
+
+        entries = []
+        for name in stations:
+            lower = name.lower()
+            entries.append((lower, PREFIX, name))
+            for match in WORD_START.finditer(lower):
+                entries.append((lower[match.start():], WORD_PREFIX, name))
+        for alias, name in aliases.items():
+            entries.append((alias.lower(), ALIAS_PREFIX, name))
+        entries.sort()
+
+        self._keys = [key for key, _, _ in entries]
+        self._entries = entries
+        self._names = [(name.lower(), name) for name in sorted(stations)]
+
+    def resolve(self, name):
+        """Canonical name for an exact name or alias match, else None"""
+        return self.exact.get(name.lower().strip())
+
+    def search(self, query, limit=8):
+        """Up to ``limit`` canonical names matching query, best first.
+
+        Exact/alias hits rank first, then name prefixes, alias prefixes,
+        word prefixes and finally plain substrings; shorter names win ties.
+        """
+        q = query.lower().strip()
+        if not q or limit <= 0:
+            return []
+
+        best = {}
+        exact = self.exact.get(q)
+        if exact:
+            best[exact] = (EXACT, len(exact), exact)
+
+        keys = self._keys
+        i = bisect_left(keys, q)
+        while i < len(keys) and keys[i].startswith(q):
+            _, tier, name = self._entries[i]
+            rank = (tier, len(name), name)
+            if name not in best or rank < best[name]:
+                best[name] = rank
+            i += 1
+
+        if len(best) < limit:
+            for lower, name in self._names:
+                if q in lower and name not in best:
+                    best[name] = (SUBSTRING, len(name), name)
+
+        ranked = sorted(best.items(), key=lambda item: item[1])
+        return [name for name, _ in ranked[:limit]]
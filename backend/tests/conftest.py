@@ -0,0 +1,9 @@
+import os
+import sys
+
+# Tests route on the network file alone: no shared routing snapshot, no
+# disruptions another process may have posted
+os.environ['DISRUPTIONS_FILE'] = ''
+os.environ['ROUTING_SNAPSHOT_DIR'] = ''
+os.environ.setdefault('ROUTE_CACHE_SIZE', '0')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
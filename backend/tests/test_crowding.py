@@ -0,0 +1,85 @@
+"""departAt crowding on the comfortable route"""
+import contextlib
+import io
+import random
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import app
+from crowding import describe_bucket
+
+network = app.current_network()
+client = app.app.test_client()
+PAIRS = 150
+
+
+def depart_at(bucket):
+    """departAt on a Monday or a Saturday that falls in bucket"""
+    day, window = describe_bucket(bucket).split()
+    return f"{'2024-05-06' if day == 'weekday' else '2024-05-04'}T{window[:5]}"
+
+
+def variant_buckets():
+    """{crowding variant: its first bucket}"""
+    first = {}
+    for bucket, variant in enumerate(app.crowding_model(network).bucket_variant):
+        first.setdefault(variant, bucket)
+    first.pop(app.NO_CROWDING)
+    return first
+
+
+def sample_pairs(seed, count):
+    stations = sorted(network.graph.nodes())
+    return random.Random(seed).sample([(s, t) for s in stations for t in stations if s != t], count)
+
+
+def journey(src, dest, **body):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return client.post('/api/journey', json={'from': src, 'to': dest, **body}).get_json()
+
+
+def test_uncrowded_routes_unchanged_by_depart_at():
+    model = app.crowding_model(network)
+    graph = app.line_model(network).graph
+    static = {}
+    for src, dest in sample_pairs(24, PAIRS):
+        route = journey(src, dest, routeType='comfortable').get('alternatives', {}).get('comfortable')
+        if route is not None:
+            path = route['path']
+            slots = [graph.edge_slot(graph.index[u], graph.index[v]) for u, v in zip(path, path[1:])]
+            static[src, dest] = route, slots
+    checked = 0
+    for variant, bucket in variant_buckets().items():
+        factors = model.factors[variant]
+        for (src, dest), (route, slots) in static.items():
+            if any(factors[e] != 1 for e in slots):
+                continue
+            crowded = journey(src, dest, routeType='comfortable', departAt=depart_at(bucket))
+            assert crowded['alternatives']['comfortable'] == route
+            checked += 1
+    assert checked
+
+
+def test_crowded_search_charges_line_changes():
+    lines = app.line_model(network)
+    graph = lines.graph
+    for variant in variant_buckets():
+        weights = app.crowded_comfort(network, variant)
+        for src, dest in sample_pairs(variant, 20):
+            route = app.find_comfortable_route(src, dest, variant=variant)
+            if route is None:
+                continue
+            best, _, _ = lines.search('comfort', graph.index[src], graph.index[dest], weights=weights)
+            ids = [graph.index[s] for s in route['path']]
+            rides = lines.ride(ids, 'comfort')
+            total = sum(weights[graph.edge_slot(u, v)] for u, v in zip(ids, ids[1:]))
+            total += sum(lines.change['comfort'][ids[i]] for i in range(1, len(rides))
+                         if rides[i] != rides[i - 1] and app.NO_LINE not in rides[i - 1:i + 1])
+            assert abs(total - best) < 1e-9
+
+
+def test_depart_at_only_keys_crowded_comfortable_requests():
+    when = depart_at(next(iter(variant_buckets().values())))
+    fastest = journey('Borivali', 'CSMT', routeType='fastest', departAt=when)
+    assert 'crowding' not in fastest
+    assert fastest == journey('Borivali', 'CSMT', routeType='fastest')
+    assert 'crowding' in journey('Borivali', 'CSMT', routeType='comfortable', departAt=when)
@@ -0,0 +1,88 @@
+"""Disruptions change /api/journey and drop only the cached routes they touch"""
+import contextlib
+import io
+
+import pytest
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import app
+from route_cache import RouteCache
+
+client = app.app.test_client()
+TOKEN = 'test-token'
+# A Western line stretch on the fastest Churchgate -> Versova route, and a
+# Harbour line journey nowhere near it
+CLOSED = ('Matunga Road', 'Mahim Junction')
+AFFECTED = {'from': 'Churchgate', 'to': 'Versova'}
+UNRELATED = {'from': 'Panvel', 'to': 'Vashi'}
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    monkeypatch.setattr(app, 'ADMIN_TOKEN', TOKEN)
+    cache = RouteCache(64)
+    monkeypatch.setattr(app, 'route_cache', cache)
+    yield cache
+    # Leave no disruption in force for other tests
+    for disruption in app.network_store.disruptions.active(0):
+        app.network_store.end_disruption(disruption.id)
+
+
+def call(method, url, body=None):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return client.open(url, method=method, json=body, headers={'X-Admin-Token': TOKEN})
+
+
+def fastest(body):
+    return call('POST', '/api/journey', body).get_json()['alternatives']['fastest']['path']
+
+
+def uses(path, edge):
+    hops = set(zip(path, path[1:]))
+    return edge in hops or edge[::-1] in hops
+
+
+def close():
+    response = call('POST', '/api/admin/disruptions',
+                    {'type': 'close', 'from': CLOSED[0], 'to': CLOSED[1], 'durationMinutes': 30})
+    assert response.status_code == 201
+    return response.get_json()['disruption']['id']
+
+
+def test_closure_reroutes_journeys_until_cleared(cache):
+    before = fastest(AFFECTED)
+    assert uses(before, CLOSED)
+
+    disruption = close()
+    during = fastest(AFFECTED)
+    assert during[0] == 'Churchgate' and during[-1] == 'Versova'
+    assert not uses(during, CLOSED)
+
+    assert call('DELETE', f'/api/admin/disruptions/{disruption}').status_code == 200
+    assert fastest(AFFECTED) == before
+
+
+def test_closure_drops_only_the_routes_it_touches(cache):
+    fastest(AFFECTED)
+    fastest(UNRELATED)
+    disruption = close()
+
+    hits = cache.hits
+    fastest(UNRELATED)
+    assert cache.hits == hits + 1
+    fastest(AFFECTED)
+    assert cache.hits == hits + 1
+
+    # Ending it makes edges faster again: every entry goes
+    call('DELETE', f'/api/admin/disruptions/{disruption}')
+    assert cache.stats()['size'] == 0
+    fastest(UNRELATED)
+    assert cache.hits == hits + 1
+
+
+def test_admin_token_is_required(cache):
+    response = client.post('/api/admin/disruptions',
+                           json={'type': 'close', 'from': CLOSED[0], 'to': CLOSED[1],
+                                 'durationMinutes': 30})
+    assert response.status_code == 403
+    assert app.network_store.disruptions.active(0) == []
@@ -0,0 +1,46 @@
+"""POST /api/itinerary on a known round trip"""
+import contextlib
+import io
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import app
+
+client = app.app.test_client()
+TRIP = {'from': 'Thane', 'waypoints': ['Bandra', 'Kurla', 'Vashi'], 'to': 'Thane'}
+
+
+def post(url, body):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return client.post(url, json=body)
+
+
+def test_round_trip_order_and_totals():
+    response = post('/api/itinerary', TRIP)
+    assert response.status_code == 200
+    result = response.get_json()
+    assert result['order'] == ['Thane', 'Vashi', 'Kurla', 'Bandra', 'Thane']
+    assert result['optimal'] is True
+    assert (result['profile'], result['ticketClass'], result['lineChangeTime']) == \
+        ('fastest', 'second', 'legs only')
+
+    legs = result['legs']
+    assert [(leg['from'], leg['to']) for leg in legs] == \
+        list(zip(result['order'], result['order'][1:]))
+    for field in ('total_time', 'total_cost', 'num_transfers'):
+        assert result[field] == sum(leg[field] for leg in legs)
+    assert (result['total_time'], result['total_cost']) == (123, 40)
+
+
+def test_legs_are_the_journey_routes():
+    for leg in post('/api/itinerary', TRIP).get_json()['legs']:
+        route = post('/api/journey', {'from': leg['from'], 'to': leg['to']}).get_json()
+        fastest = route['alternatives']['fastest']
+        assert leg['path'] == fastest['path']
+        assert (leg['total_time'], leg['total_cost']) == (fastest['total_time'], fastest['total_cost'])
+        assert leg['instructions']
+
+
+def test_bad_requests():
+    assert post('/api/itinerary', {**TRIP, 'waypoints': ['Nowhere']}).status_code == 404
+    assert post('/api/itinerary', {**TRIP, 'profile': 'fare'}).status_code == 400
+    assert post('/api/itinerary', {'from': 'Thane', 'waypoints': ['Thane']}).status_code == 400
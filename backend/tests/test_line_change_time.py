@@ -0,0 +1,38 @@
+"""Endpoints on the plain station graph report lower bounds on
+/api/journey's time and say so"""
+import contextlib
+import io
+import json
+import random
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import app
+
+client = app.app.test_client()
+PAIRS = 30
+
+
+def post(url, body):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return client.post(url, json=body)
+
+
+def test_matrix_times_are_lower_bounds():
+    stations = sorted(app.current_network().graph.nodes())
+    for src, dest in random.Random(21).sample([(s, t) for s in stations for t in stations
+                                               if s != t], PAIRS):
+        matrix = post('/api/matrix', {'origins': [src], 'destinations': [dest]})
+        assert matrix.headers['X-Line-Change-Time'] == 'excluded'
+        row = json.loads(matrix.get_data(as_text=True))
+        journey = post('/api/journey', {'from': src, 'to': dest}).get_json()
+        fastest = journey['alternatives']['fastest']
+        assert row['time'] <= fastest['total_time']
+
+
+def test_responses_name_their_time_basis():
+    reach = post('/api/reachable', {'from': 'Dadar', 'maxMinutes': 10}).get_json()
+    assert reach['lineChangeTime'] == 'excluded'
+    journey = post('/api/journey', {'from': 'Borivali', 'to': 'CSMT', 'k': 3}).get_json()
+    assert journey['k_shortest']['lineChangeTime'] == 'routes only'
+    trip = post('/api/itinerary', {'from': 'Thane', 'waypoints': ['Kurla', 'Dadar']}).get_json()
+    assert trip['lineChangeTime'] == 'legs only'
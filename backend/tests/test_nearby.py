@@ -0,0 +1,52 @@
+"""maxWalkMeters and ticketClass on POST /api/journey/nearby"""
+import contextlib
+import io
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import app
+
+client = app.app.test_client()
+# Between two stations, some hundreds of metres from either
+POINT = {'lat': 19.0600, 'lon': 72.8360}
+
+
+def post(**body):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return client.post('/api/journey/nearby', json={'from': POINT, 'to': 'Thane', **body})
+
+
+def test_zero_walk_is_not_the_default():
+    assert post().status_code == 200
+    response = post(maxWalkMeters=0)
+    assert response.status_code == 404
+    assert 'within 0 m' in response.get_json()['error']
+
+
+def test_negative_walk_is_rejected():
+    response = post(maxWalkMeters=-1)
+    assert response.status_code == 400
+    assert 'negative' in response.get_json()['error']
+
+
+def test_fares_follow_the_ticket_class():
+    costs = set()
+    for ticket_class in ('second', 'first', 'ac'):
+        for route_type in ('fastest', 'cheapest', 'comfortable'):
+            body = {'from': 'Churchgate', 'to': 'Versova', 'routeType': route_type,
+                    'ticketClass': ticket_class}
+            with contextlib.redirect_stdout(io.StringIO()):
+                nearby = client.post('/api/journey/nearby', json=body).get_json()
+                journey = client.post('/api/journey', json=body).get_json()
+            assert nearby['ticketClass'] == ticket_class
+            with app.app.test_request_context():
+                priced = app.calculate_path_metrics(nearby['details']['path'], ticket_class)
+            assert nearby['cost'] == f"₹{priced['total_cost']}"
+            if route_type == 'cheapest':
+                # The same least-fare search as /api/journey
+                assert nearby['cost'] == f"₹{journey['alternatives']['cheapest']['total_cost']}"
+                costs.add(nearby['cost'])
+    assert len(costs) == 3
+
+
+def test_unknown_ticket_class_is_rejected():
+    assert post(ticketClass='platinum').status_code == 400
@@ -0,0 +1,21 @@
+"""Trade-off options of find_pareto_routes"""
+import contextlib
+import io
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import app
+
+
+def test_no_option_is_dominated_on_the_shown_metrics():
+    stations = list(app.current_network().graph.nodes())
+    with app.app.test_request_context():
+        for src in stations:
+            for dest in stations:
+                if src == dest:
+                    continue
+                options = [m for _, m in app.find_pareto_routes(src, dest)]
+                assert options, (src, dest)
+                for i, a in enumerate(options):
+                    for b in options[i + 1:]:
+                        assert not app.option_covers(a, b), (src, dest, a['path'], b['path'])
+                        assert not app.option_covers(b, a), (src, dest, a['path'], b['path'])
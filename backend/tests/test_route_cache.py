@@ -0,0 +1,59 @@
+"""Journey responses served from the route cache"""
+import contextlib
+import io
+
+import pytest
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import app
+from route_cache import RouteCache
+
+client = app.app.test_client()
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    # The suite runs with ROUTE_CACHE_SIZE=0: give the app a real cache
+    cache = RouteCache(64)
+    monkeypatch.setattr(app, 'route_cache', cache)
+    return cache
+
+
+def journey(**body):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return client.post('/api/journey', json=body)
+
+
+def test_repeated_journey_is_a_hit(cache):
+    first = journey(**{'from': 'Thane', 'to': 'Dadar'})
+    second = journey(**{'from': 'Thane', 'to': 'Dadar'})
+    assert first.status_code == second.status_code == 200
+    assert second.get_data() == first.get_data()
+    assert (cache.hits, cache.misses, cache.stats()['size']) == (1, 1, 1)
+
+
+def test_station_spelling_shares_an_entry(cache):
+    journey(**{'from': 'Thane', 'to': 'Dadar'})
+    journey(**{'from': 'thane', 'to': 'dadar'})
+    assert cache.hits == 1
+
+
+def test_other_options_are_separate_entries(cache):
+    journey(**{'from': 'Thane', 'to': 'Dadar'})
+    journey(**{'from': 'Thane', 'to': 'Dadar', 'ticketClass': 'first'})
+    journey(**{'from': 'Thane', 'to': 'Dadar', 'routeType': 'cheapest'})
+    assert (cache.hits, cache.stats()['size']) == (0, 3)
+
+
+def test_new_network_version_drops_entries():
+    cache = RouteCache(2)
+    cache.put('a', 1, version=1)
+    cache.put('b', 2, version=1)
+    cache.put('c', 3, version=1)
+    assert cache.get('a', 1) is None
+    assert cache.evictions == 1
+    assert cache.get('c', 2) is None
+    assert cache.stats()['size'] == 0
+    # A request still finishing on the old version stores nothing
+    cache.put('b', 2, version=1)
+    assert cache.get('b', 2) is None
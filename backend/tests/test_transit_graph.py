@@ -0,0 +1,32 @@
+"""The CSR TransitGraph returns the path networkx's Dijkstra returns"""
+import contextlib
+import io
+
+import networkx as nx
+import pytest
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import app
+
+network = app.current_network()
+
+
+def profiles():
+    return {
+        'fastest': (network.graph, 'time', network.views.view('all').graph, 'time'),
+        'fare': (network.graph, 'cost', network.views.view('all').graph, 'cost'),
+        'comfortable': (network.graph, app.comfort_weight, network.views.view('all').graph, 'comfort'),
+    }
+
+
+@pytest.mark.parametrize('profile', ['fastest', 'fare', 'comfortable'])
+def test_paths_match_networkx(profile):
+    graph, weight, csr, csr_weight = profiles()[profile]
+    stations = sorted(graph.nodes())
+    mismatches = []
+    for src in stations:
+        # One tree per source settles each target as nx.dijkstra_path would
+        paths = nx.single_source_dijkstra_path(graph, src, weight=weight)
+        mismatches += [(src, dest) for dest in stations
+                       if csr.shortest_path(csr_weight, src, dest) != paths.get(dest)]
+    assert mismatches == []
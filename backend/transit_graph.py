@@ -0,0 +1,285 @@
+"""
+Compact CSR (compressed sparse row) transit graph with its own Dijkstra.
+
+Stations are interned to integer IDs and adjacency is stored as two flat
+arrays: the neighbours of station i are ``targets[offsets[i]:offsets[i + 1]]``.
+Every per-edge attribute the router needs (time, cost, comfort score,
+distance, ...) is a typed array indexed by the same edge slot, so a search
+never touches a Python dict or calls a weight callback.
+
+Neighbour order and heap tie-breaking follow networkx's Dijkstra exactly,
+so for the same graph this engine returns the same paths nx.dijkstra_path
+does.
+"""
+from array import array
+from bisect import bisect_right
+from heapq import heappush, heappop
+from itertools import count
+
+INF = float('inf')
+NO_STATION = -1
+
+MODES = ['Local Train', 'Metro', 'Transfer']
+
+
+class TransitGraph:
+    """Undirected station graph in CSR form.
+
+    ``weights`` maps a profile weight name to either an edge-attribute name
+    or a ``weight(u, v, data)`` callable (same convention as networkx); each
+    one is evaluated once per edge at build time into ``self.weights[name]``.
+    """
+
+    # Optional bytearray marking unusable edge slots (closed by a live
+    # disruption, see with_weights); their weights are all infinite
+    closed = None
+
+    def __init__(self, stations, adjacency, weights):
+        self.stations = list(stations)
+        self.index = {name: i for i, name in enumerate(self.stations)}
+        self.size = len(self.stations)
+
+        self.lines = []
+        line_ids = {}
+
+        self.offsets = array('i', [0])
+        self.targets = array('i')
+        self.mode = array('b')
+        self.line = array('h')
+        self.weights = {name: array('d') for name in weights}
+
+        for u in self.stations:
+            for v, d in adjacency[u].items():
+                self.targets.append(self.index[v])
+                self.mode.append(MODES.index(d['mode']))
+                if d['line'] not in line_ids:
+                    line_ids[d['line']] = len(self.lines)
+                    self.lines.append(d['line'])
+                self.line.append(line_ids[d['line']])
+                for name, weight in weights.items():
+                    value = weight(u, v, d) if callable(weight) else d[weight]
+                    self.weights[name].append(value)
+            self.offsets.append(len(self.targets))
+
+    @classmethod
+    def from_arrays(cls, stations, lines, offsets, targets, mode, line, weights):
+        """Wrap prebuilt CSR arrays (e.g. views into a shared memory map).
+
+        Any sequence type indexable like ``array`` works; ``weights`` maps a
+        weight name to its per-edge values.
+        """
+        graph = cls.__new__(cls)
+        graph.stations = list(stations)
+        graph.index = {name: i for i, name in enumerate(graph.stations)}
+        graph.size = len(graph.stations)
+        graph.lines = list(lines)
+        graph.offsets = offsets
+        graph.targets = targets
+        graph.mode = mode
+        graph.line = line
+        graph.weights = dict(weights)
+        return graph
+
+    @classmethod
+    def from_networkx(cls, graph, weights):
+        return cls(graph.nodes(), graph.adj, weights)
+
+    @classmethod
+    def from_edges(cls, edges, weights):
+        """Build from (u, v, data) triples, ordering nodes and neighbours
+        exactly as nx.Graph().add_edges_from(edges) would"""
+        adjacency = {}
+        for u, v, d in edges:
+            adjacency.setdefault(u, {})
+            adjacency.setdefault(v, {})
+            adjacency[u][v] = d
+            adjacency[v][u] = d
+        return cls(adjacency.keys(), adjacency, weights)
+
+    def with_weights(self, weights, closed=None):
+        """Same stations and CSR arrays with other per-edge weights (e.g. a
+        disruption overlay); ``closed`` marks edge slots no path may use"""
+        graph = TransitGraph.from_arrays(self.stations, self.lines, self.offsets, self.targets,
+                                         self.mode, self.line, weights)
+        graph.closed = closed
+        return graph
+
+    def edge_tail(self, e):
+        """Station ID whose adjacency holds edge slot e"""
+        return bisect_right(self.offsets, e) - 1
+
+    def __contains__(self, station):
+        return station in self.index
+
+    def edge_slot(self, u, v):
+        """CSR slot of edge u -> v (integer IDs), or -1 if there is none"""
+        targets = self.targets
+        for e in range(self.offsets[u], self.offsets[u + 1]):
+            if targets[e] == v:
+                return e
+        return -1
+
+    def dijkstra(self, weight, source, target=None):
+        """Single-source Dijkstra from integer ID ``source``.
+
+        Returns ``(dist, pred)`` lists indexed by station ID.  Stops early
+        once ``target`` is settled, if given.
+        """
+        w = self.weights[weight]
+        offsets = self.offsets
+        targets = self.targets
+
+        n = self.size
+        dist = [INF] * n
+        seen = [INF] * n
+        pred = [NO_STATION] * n
+        done = bytearray(n)
+
+        c = count()
+        seen[source] = 0
+        heap = [(0, next(c), source)]
+        while heap:
+            d, _, v = heappop(heap)
+            if done[v]:
+                continue
+            done[v] = 1
+            dist[v] = d
+            if v == target:
+                break
+            for e in range(offsets[v], offsets[v + 1]):
+                u = targets[e]
+                if done[u]:
+                    continue
+                du = d + w[e]
+                if du < seen[u]:
+                    seen[u] = du
+                    pred[u] = v
+                    heappush(heap, (du, next(c), u))
+        return dist, pred
+
+    def best_link(self, weight, starts, ends):
+        """Best route from any of several origins to any of several
+        destinations, in one Dijkstra.
+
+        ``starts`` and ``ends`` map station IDs to a weight paid before
+        the first / after the last station (e.g. walking to and from it).
+        Every origin is seeded with its own start weight, and the search
+        stops once nothing left in the heap can beat the best total found.
+        Returns ``(total, path of IDs)``, or ``(INF, None)``.
+        """
+        w = self.weights[weight]
+        offsets = self.offsets
+        targets = self.targets
+
+        n = self.size
+        seen = [INF] * n
+        pred = [NO_STATION] * n
+        done = bytearray(n)
+
+        c = count()
+        heap = []
+        for s, start in starts.items():
+            if start < seen[s]:
+                seen[s] = start
+                heappush(heap, (start, next(c), s))
+
+        best, best_v = INF, NO_STATION
+        while heap:
+            d, _, v = heappop(heap)
+            if d >= best:
+                break
+            if done[v]:
+                continue
+            done[v] = 1
+            end = ends.get(v)
+            if end is not None and d + end < best:
+                best, best_v = d + end, v
+            for e in range(offsets[v], offsets[v + 1]):
+                u = targets[e]
+                if done[u]:
+                    continue
+                du = d + w[e]
+                if du < seen[u]:
+                    seen[u] = du
+                    pred[u] = v
+                    heappush(heap, (du, next(c), u))
+        if best_v == NO_STATION:
+            return INF, None
+        path = [best_v]
+        while pred[path[-1]] != NO_STATION:
+            path.append(pred[path[-1]])
+        path.reverse()
+        return best, path
+
+    def tree_edges(self, pred, source):
+        """``(station, parent, edge slot)`` for every station the
+        shortest-path tree given as a predecessor row reaches from source,
+        each parent listed before its children (source itself excluded)"""
+        offsets = self.offsets
+        targets = self.targets
+        done = bytearray(self.size)
+        done[source] = 1
+        edges = []
+        for v in range(self.size):
+            if done[v]:
+                continue
+            chain = []
+            u = v
+            while not done[u] and pred[u] != NO_STATION:
+                chain.append(u)
+                u = pred[u]
+            if not done[u]:
+                continue
+            for x in reversed(chain):
+                p = pred[x]
+                for e in range(offsets[p], offsets[p + 1]):
+                    if targets[e] == x:
+                        break
+                edges.append((x, p, e))
+                done[x] = 1
+        return edges
+
+    @staticmethod
+    def unwind(pred, source, target):
+        """Station IDs from source to target along a predecessor list"""
+        path = [target]
+        while target != source:
+            target = pred[target]
+            path.append(target)
+        path.reverse()
+        return path
+
+    def shortest_path(self, weight, src, dest):
+        """Station names on the best path from src to dest, or None"""
+        s = self.index.get(src)
+        t = self.index.get(dest)
+        if s is None or t is None:
+            return None
+        dist, pred = self.dijkstra(weight, s, t)
+        if dist[t] == INF:
+            return None
+        return [self.stations[i] for i in self.unwind(pred, s, t)]
+
+    def connected_components(self):
+        """Component label per station ID (array of ints)"""
+        labels = array('i', [NO_STATION]) * self.size
+        offsets = self.offsets
+        targets = self.targets
+        closed = self.closed
+        label = 0
+        for start in range(self.size):
+            if labels[start] != NO_STATION:
+                continue
+            labels[start] = label
+            stack = [start]
+            while stack:
+                v = stack.pop()
+                for e in range(offsets[v], offsets[v + 1]):
+                    if closed is not None and closed[e]:
+                        continue
+                    u = targets[e]
+                    if labels[u] == NO_STATION:
+                        labels[u] = label
+                        stack.append(u)
+            label += 1
+        return labels
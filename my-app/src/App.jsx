@@ -3,13 +3,33 @@ import { BrowserRouter, Routes, Route, useNavigate } from "react-router-dom";
 import Autosuggest from 'react-autosuggest';
 import './App.css';
 import MapView from './MapView';
+import { findShardRoutes, getManifest, prefetchShard, searchStations } from './shards';
 import train from './assets/train.png';
 
 // Use environment variable in production, deployed backend as fallback
 const API_URL = import.meta.env.VITE_API_URL || 'https://mumbai-journey-planner.onrender.com';
 
+// How often the live network version is re-read while the page is open
+const HEALTH_RECHECK_MS = 5 * 60 * 1000;
+
+// Autocomplete results per query, kept for the lifetime of the page
+const suggestionCache = new Map();
+
+// The selected route's card from one profile's summary (/api/journey/all shape)
+function summaryResult(data) {
+  return {
+    route: data.instructions,
+    time: `${data.time} min`,
+    cost: `₹${data.cost}`,
+    distance: `${data.distance} km`,
+    transfers: data.transfers,
+    comfort: data.comfort,
+    metro_percentage: data.metro_percentage
+  };
+}
+
 function Home({
-  stations, setStations,
+  stationCount, setStationCount,
   routeType, setRouteType,
   error, setError,
   loading, setLoading,
@@ -21,54 +41,86 @@ function Home({
   const [fromSuggestions, setFromSuggestions] = useState([]);
   const [toSuggestions, setToSuggestions] = useState([]);
   const [isWakingUp, setIsWakingUp] = useState(false);
+  const [notice, setNotice] = useState('');
+  // Live network version and disruptions from /api/health: undefined until
+  // known, null if the server cannot be reached (route shards are used)
+  const [liveNetwork, setLiveNetwork] = useState(undefined);
   const navigate = useNavigate();
 
   useEffect(() => {
-    // Load stations with retry logic
-    const loadStations = async () => {
+    // Ping the backend (and read the station count and network version)
+    // with retry logic; suggestions come from /api/stations/search, not a
+    // full station list
+    const onHealth = data => {
+      setStationCount(data.stations);
+      setLiveNetwork({
+        version: data.network_version,
+        disruptions: data.network ? data.network.disruptions : 0
+      });
+      setIsWakingUp(false);
+    };
+    // Offline: the route shards still know every station
+    const onOffline = async () => {
+      setLiveNetwork(null);
+      const manifest = await getManifest();
+      if (manifest) setStationCount(Object.keys(manifest.origins).length);
+      setIsWakingUp(false);
+    };
+
+    const loadStationCount = async () => {
       try {
-        const res = await fetch(`${API_URL}/api/stations`);
+        const res = await fetch(`${API_URL}/api/health`);
         if (!res.ok) throw new Error('Failed to fetch');
-        const data = await res.json();
-        setStations(data);
-        setIsWakingUp(false);
+        onHealth(await res.json());
       } catch (err) {
-        console.error('Failed to load stations:', err);
+        console.error('Failed to reach server:', err);
         // If first attempt fails, backend might be waking up
         setIsWakingUp(true);
         // Retry after 5 seconds
         setTimeout(() => {
-          fetch(`${API_URL}/api/stations`)
+          fetch(`${API_URL}/api/health`)
             .then(res => res.json())
-            .then(data => {
-              setStations(data);
-              setIsWakingUp(false);
-            })
-            .catch(() => setIsWakingUp(false));
+            .then(onHealth)
+            .catch(onOffline);
         }, 5000);
       }
     };
     
-    loadStations();
-  }, [setStations]);
+    loadStationCount();
+    // Re-check now and then, so shards stop answering once the network
+    // is reloaded or disrupted
+    const recheck = setInterval(() => {
+      fetch(`${API_URL}/api/health`)
+        .then(res => res.json())
+        .then(onHealth)
+        .catch(onOffline);
+    }, HEALTH_RECHECK_MS);
+    return () => clearInterval(recheck);
+  }, [setStationCount]);
 
-  function getSuggestions(value) {
+  async function getSuggestions(value) {
     const input = value.trim().toLowerCase();
-    return input.length === 0
-      ? []
-      : stations.filter(station =>
-          station.toLowerCase().includes(input)
-        ).slice(0, 8);
+    if (input.length === 0) return [];
+    if (suggestionCache.has(input)) return suggestionCache.get(input);
+    try {
+      const res = await fetch(`${API_URL}/api/stations/search?q=${encodeURIComponent(input)}&limit=8`);
+      const data = await res.json();
+      suggestionCache.set(input, data);
+      return data;
+    } catch (err) {
+      return searchStations(input);
+    }
   }
 
   // Autosuggest handlers for FROM
   const onFromChange = (e, { newValue }) => setFrom(newValue);
-  const onFromSuggestionsFetchRequested = ({ value }) => setFromSuggestions(getSuggestions(value));
+  const onFromSuggestionsFetchRequested = async ({ value }) => setFromSuggestions(await getSuggestions(value));
   const onFromSuggestionsClearRequested = () => setFromSuggestions([]);
+  const onFromSuggestionSelected = (e, { suggestion }) => prefetchShard(suggestion);
   
   // Autosuggest handlers for TO
   const onToChange = (e, { newValue }) => setTo(newValue);
-  const onToSuggestionsFetchRequested = ({ value }) => setToSuggestions(getSuggestions(value));
+  const onToSuggestionsFetchRequested = async ({ value }) => setToSuggestions(await getSuggestions(value));
   const onToSuggestionsClearRequested = () => setToSuggestions([]);
 
   async function handleFindRoute() {
@@ -79,16 +131,27 @@ function Home({
     }
     
     setError('');
+    setNotice('');
     setRouteResult(null);
     setAllRoutes(null);
     setLoading(true);
 
+    // Precomputed shards answer without a request while they match the
+    // live network; the API covers stale or missing shards
+    const local = await findShardRoutes(from, to, liveNetwork);
+    if (local && local[routeType]) {
+      setAllRoutes(local);
+      setRouteResult(summaryResult(local[routeType]));
+      setLoading(false);
+      return;
+    }
+
     try {
-      // Main journey request
+      // One request returns the selected route plus every profile's summary
       const journeyRes = await fetch(`${API_URL}/api/journey`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ from, to, routeType })
+        body: JSON.stringify({ from, to, routeType, include: 'all' })
       });
       
       const journeyData = await journeyRes.json();
@@ -99,26 +162,34 @@ function Home({
         setRouteResult(journeyData);
       }
       
-      // Fetch all routes for comparison
-      const allRoutesRes = await fetch(`${API_URL}/api/journey/all`, {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ from, to })
-      });
-      
-      const allRoutesData = await allRoutesRes.json();
-      if (!allRoutesData.error) {
-        setAllRoutes(allRoutesData);
+      if (journeyData.all_routes) {
+        setAllRoutes(journeyData.all_routes);
       }
       
     } catch (err) {
       console.error('Connection error:', err);
-      setError('⏳ Server is waking up (this takes 30-60 seconds on first load). Please wait a moment and try again!');
+      // No connection: saved shards, even of an older network version,
+      // beat no answer
+      const saved = await findShardRoutes(from, to, null, true);
+      if (saved && saved[routeType]) {
+        setAllRoutes(saved);
+        setRouteResult(summaryResult(saved[routeType]));
+        setNotice('📴 Offline: showing saved routes, which may miss recent changes');
+      } else {
+        setError('⏳ Server is waking up (this takes 30-60 seconds on first load). Please wait a moment and try again!');
+      }
     } finally {
       setLoading(false);
     }
   }
 
+  // Switch to another profile from the comparison list without refetching
+  function selectRoute(type) {
+    setRouteType(type);
+    setError('');
+    setRouteResult(summaryResult(allRoutes[type]));
+  }
+
   function swapStations() {
     const temp = from;
     setFrom(to);
@@ -162,6 +233,7 @@ function Home({
           suggestions={fromSuggestions}
           onSuggestionsFetchRequested={onFromSuggestionsFetchRequested}
           onSuggestionsClearRequested={onFromSuggestionsClearRequested}
+          onSuggestionSelected={onFromSuggestionSelected}
           getSuggestionValue={suggestion => suggestion}
           renderSuggestion={suggestion => <span>{suggestion}</span>}
           inputProps={{
@@ -269,6 +341,21 @@ function Home({
         </div>
       )}
       
+      {notice && (
+        <div style={{
+          background: '#f1f5f9',
+          border: '1px solid #cbd5e1',
+          borderRadius: '8px',
+          padding: '12px',
+          marginTop: '16px',
+          fontSize: '13px',
+          color: '#475569',
+          textAlign: 'center'
+        }}>
+          {notice}
+        </div>
+      )}
+      
       {routeResult && (
         <div className="mumbai-route-result">
           {/* Summary Cards */}
@@ -377,10 +464,7 @@ function Home({
             {Object.entries(allRoutes).map(([type, data]) => (
               <div
                 key={type}
-                onClick={() => {
-                  setRouteType(type);
-                  handleFindRoute();
-                }}
+                onClick={() => selectRoute(type)}
                 style={{
                   padding: '14px',
                   background: routeType === type ? '#dbeafe' : '#f8fafc',
@@ -427,14 +511,14 @@ function Home({
         fontSize: '12px',
         color: '#94a3b8'
       }}>
-        Covers {stations.length}+ stations • Local Trains + Metro
+        Covers {stationCount}+ stations • Local Trains + Metro
       </div>
     </div>
   );
 }
 
 export default function App() {
-  const [stations, setStations] = useState([]);
+  const [stationCount, setStationCount] = useState(0);
   const [routeType, setRouteType] = useState('fastest');
   const [error, setError] = useState('');
   const [loading, setLoading] = useState(false);
@@ -448,8 +532,8 @@ export default function App() {
           path="/"
           element={
             <Home
-              stations={stations}
-              setStations={setStations}
+              stationCount={stationCount}
+              setStationCount={setStationCount}
               routeType={routeType}
               setRouteType={setRouteType}
               error={error}
@@ -467,7 +551,6 @@ export default function App() {
           path="/map"
           element={
             <MapView
-              stations={stations}
               allRoutes={allRoutes}
               routeResult={routeResult}
               onClose={() => window.history.back()}
@@ -0,0 +1,142 @@
+// Precomputed /api/journey/all answers, one shard per origin station,
+// written at build time by backend/export_shards.py into public/shards.
+// Shards are kept in Cache Storage so journeys resolve offline too.
+
+const SHARD_URL = `${import.meta.env.BASE_URL}shards`;
+const CACHE_NAME = 'route-shards';
+
+let manifestPromise = null;
+const shardPromises = new Map();
+
+async function openCache() {
+  if (typeof caches === 'undefined') return null;
+  try {
+    return await caches.open(CACHE_NAME);
+  } catch (err) {
+    return null;
+  }
+}
+
+// Network first (the manifest says which version is current), cached copy
+// when the network is down
+async function fetchFresh(url) {
+  const cache = await openCache();
+  try {
+    const res = await fetch(url, { cache: 'no-cache' });
+    if (!res.ok) throw new Error(`${url}: ${res.status}`);
+    if (cache) await cache.put(url, res.clone());
+    return await res.json();
+  } catch (err) {
+    const hit = cache && await cache.match(url);
+    if (hit) return hit.json();
+    throw err;
+  }
+}
+
+// Cache first: a shard URL carries its network version, so it never changes
+async function fetchVersioned(url) {
+  const cache = await openCache();
+  const hit = cache && await cache.match(url);
+  if (hit) return hit.json();
+  const res = await fetch(url);
+  if (!res.ok) throw new Error(`${url}: ${res.status}`);
+  if (cache) await cache.put(url, res.clone());
+  return res.json();
+}
+
+// Drop cached shards of other network versions
+async function pruneCache(version) {
+  const cache = await openCache();
+  if (!cache) return;
+  for (const request of await cache.keys()) {
+    const url = new URL(request.url);
+    if (url.searchParams.has('v') && url.searchParams.get('v') !== version) {
+      await cache.delete(request);
+    }
+  }
+}
+
+// The shard manifest, or null if this build has no shards
+export function getManifest() {
+  if (!manifestPromise) {
+    manifestPromise = fetchFresh(`${SHARD_URL}/index.json`)
+      .then(manifest => {
+        manifest.byName = new Map(
+          Object.keys(manifest.origins).map(name => [name.toLowerCase(), name])
+        );
+        pruneCache(manifest.version);
+        return manifest;
+      })
+      .catch(() => {
+        manifestPromise = null;
+        return null;
+      });
+  }
+  return manifestPromise;
+}
+
+async function getShard(manifest, origin) {
+  const file = manifest.origins[origin];
+  const url = `${SHARD_URL}/${file}?v=${encodeURIComponent(manifest.version)}`;
+  if (!shardPromises.has(url)) {
+    shardPromises.set(url, fetchVersioned(url).catch(err => {
+      shardPromises.delete(url);
+      throw err;
+    }));
+  }
+  return shardPromises.get(url);
+}
+
+// Shards answer for the network as published: usable while the live
+// network has their version and no disruption in force, or when the API
+// cannot be reached at all (live === null; undefined while unknown)
+export function isCurrent(manifest, live) {
+  if (live === null) return true;
+  return Boolean(live) && live.version === manifest.version && !live.disruptions;
+}
+
+// Station names known to the shards matching a query (offline autocomplete)
+export async function searchStations(query, limit = 8) {
+  const manifest = await getManifest();
+  if (!manifest) return [];
+  const q = query.trim().toLowerCase();
+  const names = Object.keys(manifest.origins);
+  const prefix = names.filter(name => name.toLowerCase().startsWith(q));
+  const inside = names.filter(name => !name.toLowerCase().startsWith(q) && name.toLowerCase().includes(q));
+  return [...prefix, ...inside].slice(0, limit);
+}
+
+// Start loading an origin's shard before the journey is asked for
+export async function prefetchShard(from) {
+  const manifest = await getManifest();
+  const origin = manifest && manifest.byName.get(from.trim().toLowerCase());
+  if (origin) getShard(manifest, origin).catch(() => {});
+}
+
+// Every profile's summary between two stations, in the shape of
+// /api/journey/all, or null if the shards cannot answer (missing, stale
+// unless allowStale, or an unknown station)
+export async function findShardRoutes(from, to, live, allowStale = false) {
+  const manifest = await getManifest();
+  if (!manifest || (!allowStale && !isCurrent(manifest, live))) return null;
+  const origin = manifest.byName.get(from.trim().toLowerCase());
+  const dest = manifest.byName.get(to.trim().toLowerCase());
+  if (!origin || !dest || origin === dest) return null;
+
+  let shard;
+  try {
+    shard = await getShard(manifest, origin);
+  } catch (err) {
+    return null;
+  }
+  const refs = shard.journeys[dest];
+  if (!refs) return null;
+
+  const routes = {};
+  manifest.profiles.forEach((profile, i) => {
+    if (refs[i] === null) return;
+    const row = shard.routes[refs[i]];
+    routes[profile] = Object.fromEntries(manifest.columns.map((column, j) => [column, row[j]]));
+  });
+  return routes;
+}